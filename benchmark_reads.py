@@ -0,0 +1,58 @@
+"""Compare time per datapoint of ORM query and Core read path.
+
+   Fills in-memory database with a synthetic daily series and reads
+   it back as Datapoint objects (old read path) and as Point tuples
+   (db.api.reads). Run as:
+
+       python benchmark_reads.py [number of datapoints]
+"""
+import sys
+import timeit
+from datetime import date
+
+from sqlalchemy.orm import contains_eager
+
+from db import db, get_app
+from db.api import reads
+from db.api.models import Datapoint, Series
+from db.api.queries import DatapointOperations
+
+
+def orm_read():
+    query = Datapoint.query \
+        .join(Datapoint.series) \
+        .options(contains_eager(Datapoint.series)) \
+        .filter(Series.freq == 'd') \
+        .filter(Series.name.in_(['BENCH'])) \
+        .order_by(Datapoint.date)
+    result = [d.serialized for d in query]
+    db.session.expunge_all()
+    return result
+
+
+def core_read():
+    return [p.serialized for p in reads.points('d', ['BENCH'], None, None)]
+
+
+def main(n=100000, repeat=5):
+    app = get_app()
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        start = date(2000, 1, 1).toordinal()
+        DatapointOperations.bulk_insert([
+            dict(name='BENCH', freq='d',
+                 date=date.fromordinal(start + i), value=float(i))
+            for i in range(n)])
+        db.session.commit()
+        assert orm_read() == core_read()
+        for label, func in [('ORM', orm_read), ('Core', core_read)]:
+            seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+            print(f'{label:>5}: {seconds:.3f} s, '
+                  f'{seconds / n * 1e6:.2f} us per datapoint')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main(*[int(arg) for arg in sys.argv[1:2]])
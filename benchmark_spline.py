@@ -0,0 +1,54 @@
+"""Compare time to draw a spline with matplotlib and without it.
+
+   Draws a synthetic monthly series with image.make_png() and with
+   sparkline.render() as png and svg, then SERIES such series as
+   separate png images and as one sprite.make_png() sprite. Series
+   downsampled to MAX_POINTS (see downsample.py) is drawn too. Run as:
+
+       python benchmark_spline.py [number of datapoints]
+"""
+import sys
+import timeit
+from datetime import date
+
+from db.api import downsample, image, sparkline, sprite
+from db.api.models import Point
+
+# series on a dashboard page
+SERIES = 80
+# max_points parameter
+MAX_POINTS = 200
+
+
+def make_points(n):
+    start = date(1999, 1, 31).toordinal()
+    return [Point('BENCH', 'm', date.fromordinal(start + 30 * i),
+                  100.0 + (i % 12))
+            for i in range(n)]
+
+
+def main(n=240, repeat=20):
+    points = make_points(n)
+    renderers = [('matplotlib png', lambda: image.make_png(points)),
+                 ('fast png', lambda: sparkline.render('png', points)),
+                 ('fast svg', lambda: sparkline.render('svg', points)),
+                 (f'matplotlib {MAX_POINTS}', lambda: image.make_png(
+                     downsample.points(points, MAX_POINTS))),
+                 (f'fast svg {MAX_POINTS}', lambda: sparkline.render(
+                     'svg', downsample.points(points, MAX_POINTS)))]
+    keys = [(f'BENCH{i}', 'm') for i in range(SERIES)]
+    data = sprite.group([p._replace(name=name) for name, _ in keys
+                         for p in points], keys)
+    params = image.spline_params()
+    renderers += [
+        (f'{SERIES} png', lambda: b''.join(
+            sparkline.make_png(data[key], params) for key in keys)),
+        (f'{SERIES} sprite', lambda: sprite.make_png(data, keys, params))]
+    for label, func in renderers:
+        seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+        print(f'{label:>15}: {seconds * 1000:.2f} ms, '
+              f'{len(func())} bytes')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -10,6 +10,30 @@ class ProductionConfig(object):
     PORT = int(os.getenv('PORT', 5000))
     # NOTE: must create config var API_TOKEN at heroku
     API_TOKEN = os.getenv('API_TOKEN')
+    # 'rows' keeps datapoints in Datapoint table,
+    # 'blob' packs series into arrays, see db/api/blobs.py
+    STORAGE_ENGINE = os.getenv('STORAGE_ENGINE', 'rows')
+    # store values in blobs as float32 instead of float64
+    BLOB_FLOAT32 = bool(os.getenv('BLOB_FLOAT32'))
+    # serve reads from in-memory arrays, see db/api/replica.py
+    READ_REPLICA = bool(os.getenv('READ_REPLICA'))
+    # size of rendered responses cache, 0 to disable, see db/api/cache.py
+    RESPONSE_CACHE_BYTES = int(os.getenv('RESPONSE_CACHE_BYTES', 0))
+    # seconds clients may keep responses for closed date ranges
+    CLOSED_RANGE_MAX_AGE = 24 * 60 * 60
+    # seconds before names and frequencies are read again from database
+    REGISTRY_MAX_AGE = 60
+    # 'numpy' or 'dict', see views.get_dataframe()
+    FRAME_PIVOT = 'numpy'
+    # 'orjson' or 'json', see db/api/encoders.py
+    JSON_ENCODER = os.getenv('JSON_ENCODER', 'orjson')
+    # number of api/spline images kept in memory, see db/api/image.py
+    SPLINE_CACHE_SIZE = int(os.getenv('SPLINE_CACHE_SIZE', 256))
+    # number of resampled and transformed series kept in memory,
+    # see db/api/resample.py
+    RESAMPLE_CACHE_SIZE = int(os.getenv('RESAMPLE_CACHE_SIZE', 128))
+    # set SWAGGER_UI=0 to start without Swagger UI, see db.make_app()
+    SWAGGER_UI = os.getenv('SWAGGER_UI', '1') != '0'
 
 
 class DevelopmentConfig(object):
@@ -18,6 +42,17 @@ class DevelopmentConfig(object):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///' + \
         os.path.join(basedir, 'database_dev.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    STORAGE_ENGINE = 'rows'
+    BLOB_FLOAT32 = False
+    READ_REPLICA = False
+    RESPONSE_CACHE_BYTES = 0
+    CLOSED_RANGE_MAX_AGE = 24 * 60 * 60
+    REGISTRY_MAX_AGE = 60
+    FRAME_PIVOT = 'numpy'
+    JSON_ENCODER = 'orjson'
+    SPLINE_CACHE_SIZE = 256
+    RESAMPLE_CACHE_SIZE = 128
+    SWAGGER_UI = True
     PORT = 5000
 
 
@@ -29,4 +64,15 @@ class TestingConfig(object):
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     # if set to true, then tests that involes 'jsonify' function fails
     JSONIFY_PRETTYPRINT_REGULAR = False
+    STORAGE_ENGINE = 'rows'
+    BLOB_FLOAT32 = False
+    READ_REPLICA = False
+    RESPONSE_CACHE_BYTES = 0
+    CLOSED_RANGE_MAX_AGE = 24 * 60 * 60
+    REGISTRY_MAX_AGE = 60
+    FRAME_PIVOT = 'numpy'
+    JSON_ENCODER = 'orjson'
+    SPLINE_CACHE_SIZE = 256
+    RESAMPLE_CACHE_SIZE = 128
+    SWAGGER_UI = True
     PORT = 5000
@@ -13,3 +13,20 @@ def create_app(config=None):
     app.config.from_object(config)
     db.init_app(app)
     return app
+
+
+def make_app(config=None):
+    """Return app with API blueprints registered, Swagger UI is added
+       unless SWAGGER_UI is False in config."""
+    # views are imported here, not at top, to avoid circular import
+    from db.api.views import api_bp
+    from db.custom_api.views import custom_api_bp
+    app = create_app(config)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(custom_api_bp)
+    if app.config.get('SWAGGER_UI', True):
+        # flasgger builds spec on first request to /apispec_1.json
+        # and keeps it, unless app is in debug mode
+        from flasgger import Swagger
+        Swagger(app)
+    return app
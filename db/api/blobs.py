@@ -0,0 +1,265 @@
+"""Blob storage engine.
+
+   Each (name, freq) series is kept as a pair of packed arrays:
+   int32 day numbers (see date.toordinal()) and float64 values
+   (or float32, if BLOB_FLOAT32 is set in config). Daily series are
+   split into one blob per year, other series are stored in one blob.
+
+   Reading a series decodes a few blobs straight into numpy arrays,
+   no Datapoint objects are created.
+
+   Engine is enabled by STORAGE_ENGINE = 'blob' in config, see
+   DatapointOperations in queries.py.
+"""
+import heapq
+from collections import namedtuple
+from datetime import date, datetime
+from operator import attrgetter
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import or_
+
+from db import db
+from db.api.models import Point, Series, SeriesBlob
+
+WHOLE_SERIES = 0
+DATE_DTYPE = '<i4'
+VALUE_DTYPE = '<f8'
+VALUE_DTYPE_COMPACT = '<f4'
+# days from 0001-01-01 to 1970-01-01, to convert to numpy datetime64
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def value_dtype():
+    if current_app.config.get('BLOB_FLOAT32'):
+        return VALUE_DTYPE_COMPACT
+    return VALUE_DTYPE
+
+
+def to_ordinal(dt):
+    """Convert datetime.date or YYYY-MM-DD string *dt* to day number."""
+    if isinstance(dt, str):
+        dt = datetime.strptime(dt, "%Y-%m-%d").date()
+    return dt.toordinal()
+
+
+def years(freq: str, dates):
+    """Return array of blob partition keys for day numbers *dates*."""
+    if freq != 'd':
+        return np.full(len(dates), WHOLE_SERIES)
+    days = np.asarray(dates, dtype='int64') - EPOCH_ORDINAL
+    return days.astype('datetime64[D]').astype('datetime64[Y]') \
+               .astype('int64') + 1970
+
+
+def encode(dates, values, dtype):
+    return (np.asarray(dates, dtype=DATE_DTYPE).tobytes(),
+            np.asarray(values, dtype=dtype).tobytes())
+
+
+def decode(blob):
+    """Return (dates, values) arrays for SeriesBlob *blob*."""
+    dates = np.frombuffer(blob.dates, dtype=DATE_DTYPE)
+    values = np.frombuffer(blob.values, dtype=blob.dtype)
+    return dates, values.astype('float64')
+
+
+def merge(dates, values, new_dates, new_values):
+    """Merge two sets of (dates, values) arrays, *new_values* take
+       precedence over *values* on same dates, last one of duplicate
+       *new_dates* wins.
+
+       Returns:
+           sorted unique dates, values and number of dates added
+    """
+    # reversed, so that first occurence found by np.unique is the latest
+    all_dates = np.concatenate([new_dates[::-1], dates])
+    all_values = np.concatenate([new_values[::-1], values])
+    merged_dates, index = np.unique(all_dates, return_index=True)
+    return merged_dates, all_values[index], len(merged_dates) - len(dates)
+
+
+SeriesArrays = namedtuple('SeriesArrays', 'name freq dates values')
+
+
+class BlobSelection:
+    """Result of select() on blob storage. Iterates over Point tuples
+       ordered by date, like Query object iterates over Datapoint.
+    """
+
+    def __init__(self, arrays: list):
+        # list of SeriesArrays
+        self.arrays = arrays
+
+    def columns(self):
+        """Return (series index, dates, values) arrays ordered by date."""
+        if not self.arrays:
+            empty = np.array([], dtype='int64')
+            return empty, empty, np.array([], dtype='float64')
+        index = np.concatenate([np.full(len(a.dates), i)
+                                for i, a in enumerate(self.arrays)])
+        dates = np.concatenate([a.dates for a in self.arrays])
+        values = np.concatenate([a.values for a in self.arrays])
+        order = np.argsort(dates, kind='mergesort')
+        return index[order], dates[order], values[order]
+
+    def __iter__(self):
+        index, dates, values = self.columns()
+        for i, ordinal, value in zip(index.tolist(),
+                                     dates.tolist(),
+                                     values.tolist()):
+            series = self.arrays[i]
+            yield Point(series.name, series.freq,
+                        date.fromordinal(ordinal), value)
+
+    def merged(self):
+        """Iterate over Point tuples ordered by date, merging series
+           one datapoint at a time instead of sorting all of them."""
+        return heapq.merge(*[_points(a) for a in self.arrays],
+                           key=attrgetter('date'))
+
+    def count(self):
+        return sum(len(a.dates) for a in self.arrays)
+
+    def first(self):
+        return next(iter(self), None)
+
+
+def _points(arrays):
+    for ordinal, value in zip(arrays.dates, arrays.values):
+        yield Point(arrays.name, arrays.freq,
+                    date.fromordinal(int(ordinal)), float(value))
+
+
+def _find_series(freq: str, names: list):
+    query = Series.query
+    if freq:
+        query = query.filter(Series.freq == freq)
+    if names:
+        query = query.filter(Series.name.in_(names))
+    return query.order_by(Series.name).all()
+
+
+def _blobs(series, start_date=None, end_date=None):
+    query = SeriesBlob.query.filter(SeriesBlob.series_id == series.id)
+    if start_date:
+        year = datetime.fromordinal(to_ordinal(start_date)).year
+        query = query.filter(or_(SeriesBlob.year == WHOLE_SERIES,
+                                 SeriesBlob.year >= year))
+    if end_date:
+        year = datetime.fromordinal(to_ordinal(end_date)).year
+        query = query.filter(SeriesBlob.year <= year)
+    return query.order_by(SeriesBlob.year).all()
+
+
+def _decode_many(blobs):
+    if not blobs:
+        return (np.array([], dtype=DATE_DTYPE),
+                np.array([], dtype='float64'))
+    pairs = [decode(blob) for blob in blobs]
+    return (np.concatenate([p[0] for p in pairs]),
+            np.concatenate([p[1] for p in pairs]))
+
+
+def read(series, start_date=None, end_date=None):
+    """Return SeriesArrays for *series* between *start_date* and
+       *end_date*, inclusive."""
+    dates, values = _decode_many(_blobs(series, start_date, end_date))
+    mask = np.ones(len(dates), dtype=bool)
+    if start_date:
+        mask &= dates >= to_ordinal(start_date)
+    if end_date:
+        mask &= dates <= to_ordinal(end_date)
+    return SeriesArrays(series.name, series.freq, dates[mask], values[mask])
+
+
+def select(freq: str, names: list, start_date, end_date):
+    arrays = [read(series, start_date, end_date)
+              for series in _find_series(freq, names)]
+    return BlobSelection(arrays)
+
+
+def _store(series, year, dates, values, blob=None):
+    """Save *dates* and *values* to blob for *series* and *year*,
+       delete the blob if arrays are empty."""
+    if blob is None:
+        blob = SeriesBlob(series_id=series.id, year=year)
+        db.session.add(blob)
+    if not len(dates):
+        db.session.delete(blob)
+        return
+    dtype = value_dtype()
+    blob.dtype = dtype
+    blob.count = len(dates)
+    blob.dates, blob.values = encode(dates, values, dtype)
+
+
+def write(series, dates, values):
+    """Upsert *dates* and *values* into blobs of *series*.
+       Returns number of new dates added to series and number of
+       dates with value changed.
+    """
+    dates = np.asarray(dates, dtype='int64')
+    values = np.asarray(values, dtype='float64')
+    partitions = years(series.freq, dates)
+    added, changed = 0, 0
+    for year in np.unique(partitions).tolist():
+        mask = partitions == year
+        blob = SeriesBlob.query.get((series.id, year))
+        if blob is None:
+            old_dates, old_values = _decode_many([])
+        else:
+            old_dates, old_values = decode(blob)
+        new_dates, new_values, n = merge(old_dates, old_values,
+                                         dates[mask], values[mask])
+        _store(series, year, new_dates, new_values, blob)
+        added += n
+        # dates already stored are among merged dates
+        kept = new_values[np.searchsorted(new_dates, old_dates)]
+        changed += int((kept != old_values).sum())
+    return added, changed
+
+
+def delete(freq: str, names: list, start_date, end_date):
+    """Delete datapoints, arguments are same as for select().
+       Returns number of datapoints deleted and list of (name, freq)
+       of series affected.
+    """
+    count, affected = 0, []
+    for series in _find_series(freq, names):
+        for blob in _blobs(series, start_date, end_date):
+            dates, values = decode(blob)
+            keep = np.zeros(len(dates), dtype=bool)
+            if start_date:
+                keep |= dates < to_ordinal(start_date)
+            if end_date:
+                keep |= dates > to_ordinal(end_date)
+            if keep.all():
+                continue
+            _store(series, blob.year, dates[keep], values[keep], blob)
+            count += len(dates) - int(keep.sum())
+            affected.append((series.name, series.freq))
+    return count, affected
+
+
+Stats = namedtuple('Stats', 'series_id first_date last_date count value')
+
+
+def stats(series_ids):
+    """Yield Stats for series with *series_ids*, similar to grouping
+       Datapoint table by series_id."""
+    query = SeriesBlob.query.order_by(SeriesBlob.series_id, SeriesBlob.year)
+    if series_ids is not None:
+        query = query.filter(SeriesBlob.series_id.in_(series_ids))
+    found = {}
+    for blob in query:
+        found.setdefault(blob.series_id, []).append(blob)
+    for series_id, blobs in found.items():
+        first_dates, _ = decode(blobs[0])
+        last_dates, last_values = decode(blobs[-1])
+        yield Stats(series_id,
+                    date.fromordinal(int(first_dates[0])),
+                    date.fromordinal(int(last_dates[-1])),
+                    sum(blob.count for blob in blobs),
+                    float(last_values[-1]))
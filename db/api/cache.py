@@ -0,0 +1,231 @@
+"""In-process cache of rendered CSV and JSON responses.
+
+   Responses are keyed by canonical query: kind of response, frequency,
+   names and YYYY-MM-DD dates, so that equivalent requests, including
+   custom API paths, share an entry. Names are not sorted, their order
+   sets order of columns in frame. Least recently used
+   entries are evicted when total size of bodies exceeds byte budget.
+
+   Entries are dropped after commit of a write that changes any of
+   their (name, freq) series, see changes.py. Like the read replica,
+   cache is per process and only sees writes made through it.
+
+   Bodies compressed for clients accepting gzip or zstd are kept
+   along with entry and count to its size, see compression.py.
+
+   Enabled by RESPONSE_CACHE_BYTES > 0 in config.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date
+
+from flask import Response, current_app, request
+
+from db.api import changes, compression
+
+# *variants* are bodies compressed by encoding
+Entry = namedtuple('Entry', 'body mimetype keys variants')
+
+
+def enabled():
+    return current_app.config.get('RESPONSE_CACHE_BYTES', 0) > 0
+
+
+def current():
+    """Return ResponseCache of current app."""
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        budget = current_app.config.get('RESPONSE_CACHE_BYTES', 0)
+        cache = current_app.extensions.setdefault('response_cache',
+                                                  ResponseCache(budget))
+    return cache
+
+
+@changes.on_commit
+def _invalidate(keys):
+    cache = current_app.extensions.get('response_cache')
+    if cache is not None:
+        cache.invalidate(keys)
+
+
+def _canonical_date(dt):
+    if not dt:
+        return None
+    if isinstance(dt, date):
+        return dt.strftime("%Y-%m-%d")
+    return str(dt)
+
+
+def make_key(kind: str, freq: str, names, start_date, end_date):
+    """Return cache key for query, *names* is a name or list of names."""
+    if isinstance(names, str):
+        names = [names]
+    return (kind, freq, tuple(names or []),
+            _canonical_date(start_date), _canonical_date(end_date))
+
+
+class ResponseCache:
+    """LRU dictionary of response bodies limited by *budget* bytes."""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.size = 0
+        self.entries = OrderedDict()
+        # cache keys by (name, freq) of series they depend on
+        self.index = {}
+        # changed on every invalidation, see put()
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, series_keys, body: bytes, mimetype: str,
+            generation: int):
+        """Store response *body* if there were no writes since
+           *generation* was read, so that response built from data
+           before a write is not cached after it."""
+        if len(body) > self.budget:
+            return
+        with self.lock:
+            if generation != self.generation or key in self.entries:
+                return
+            self.entries[key] = Entry(body, mimetype, frozenset(series_keys),
+                                      {})
+            self.size += len(body)
+            for series_key in series_keys:
+                self.index.setdefault(series_key, set()).add(key)
+            self._evict()
+
+    def variant(self, key, entry, encoding: str):
+        """Return body of *entry* compressed with *encoding*, compress
+           it and keep with entry on first use."""
+        body = entry.variants.get(encoding)
+        if body is None:
+            body = compression.compress(entry.body, encoding)
+            with self.lock:
+                if self.entries.get(key) is entry and \
+                        encoding not in entry.variants:
+                    entry.variants[encoding] = body
+                    self.size += len(body)
+                    self._evict()
+        return body
+
+    def _evict(self):
+        while self.size > self.budget:
+            self._remove(next(iter(self.entries)))
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.size -= len(entry.body)
+        self.size -= sum(len(body) for body in entry.variants.values())
+        for series_key in entry.keys:
+            keys = self.index.get(series_key)
+            keys.discard(key)
+            if not keys:
+                del self.index[series_key]
+
+    def invalidate(self, series_keys):
+        """Drop entries for (name, freq) *series_keys*, all if None."""
+        with self.lock:
+            self.generation += 1
+            if series_keys is None:
+                self.entries.clear()
+                self.index.clear()
+                self.size = 0
+                return
+            for series_key in series_keys:
+                for key in list(self.index.get(series_key, [])):
+                    self._remove(key)
+
+
+def cached_response(kind: str, build, freq: str, names,
+                    start_date=None, end_date=None, as_of=None):
+    """Return cached response for query or call *build()* to make
+       response and store it. Query arguments are same as for
+       DatapointOperations.select_frame(), *names* can be a string.
+    """
+    if not enabled() or as_of or not names:
+        return build()
+    cache = current()
+    key = make_key(kind, freq, names, start_date, end_date)
+    entry = cache.get(key)
+    if entry is not None:
+        encoding = None
+        if compression.is_compressible(entry.mimetype):
+            encoding = compression.negotiate(request.accept_encodings)
+        if encoding is None:
+            return Response(response=entry.body, mimetype=entry.mimetype)
+        response = Response(response=cache.variant(key, entry, encoding),
+                            mimetype=entry.mimetype)
+        response.headers['Content-Encoding'] = encoding
+        return response
+    generation = cache.generation
+    response = build()
+    if response.status_code != 200:
+        return response
+    series_keys = set((name, freq) for name in key[2])
+
+    def store(body):
+        cache.put(key, series_keys, body, response.mimetype, generation)
+
+    if response.is_streamed:
+        response.response = _tee(response.iter_encoded(), cache.budget, store)
+    else:
+        store(response.get_data())
+    return response
+
+
+def _tee(chunks, limit: int, store):
+    """Yield *chunks* of streamed response and *store* its body at end,
+       unless body is longer than *limit*."""
+    body, size = [], 0
+    for chunk in chunks:
+        if body is not None:
+            size += len(chunk)
+            if size > limit:
+                body = None
+            else:
+                body.append(chunk)
+        yield chunk
+    if body is not None:
+        store(b''.join(body))
+
+
+class LRUCache:
+    """Least recently used values made on demand, at most *size* of
+       them. Keeps images (see image.py) and derived series (see
+       resample.py)."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, key, make):
+        """Return value for *key*, call *make()* if it is not found."""
+        with self.lock:
+            value = self.values.get(key)
+            if value is not None:
+                self.values.move_to_end(key)
+                return value
+        value = make()
+        if self.size > 0:
+            with self.lock:
+                self.values[key] = value
+                while len(self.values) > self.size:
+                    self.values.popitem(last=False)
+        return value
+
+    def drop(self, match):
+        """Remove values with keys for which *match(key)* is true."""
+        with self.lock:
+            for key in [key for key in self.values if match(key)]:
+                del self.values[key]
@@ -0,0 +1,49 @@
+"""Notify in-memory structures about series changed by writes.
+
+   Writes mark (name, freq) keys of series they change with
+   mark_changed(). When session commits, functions registered with
+   on_commit() are called with the set of keys, or with None if all
+   series may have changed. Marks of rolled back writes are dropped.
+"""
+from flask import has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from db import db
+
+# session.info key for series changed in current transaction
+CHANGED = 'series_changed'
+# marks that all series may have changed
+ALL = 'all'
+
+listeners = []
+
+
+def on_commit(func):
+    """Register *func(keys)* to be called after commit, decorator."""
+    listeners.append(func)
+    return func
+
+
+def mark_changed(keys):
+    """Mark series with (name, freq) *keys* as changed,
+       all series if *keys* is None."""
+    changed = db.session.info.setdefault(CHANGED, set())
+    if keys is None:
+        changed.add(ALL)
+    else:
+        changed.update(keys)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    changed = session.info.pop(CHANGED, None)
+    if changed and has_app_context():
+        keys = None if ALL in changed else changed
+        for func in listeners:
+            func(keys)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop(CHANGED, None)
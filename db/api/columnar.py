@@ -0,0 +1,77 @@
+"""Apache Arrow IPC and Parquet output.
+
+   Frame is written as a table with 'date' column of date32 type and
+   a float64 column for each name, missing values are nulls. Frequency
+   is kept in table metadata. Clients load the table without parsing
+   text, eg with pandas.read_feather() or pandas.read_parquet().
+
+   Needs pyarrow, which is optional: without it these formats are
+   refused and Accept header asking for them is ignored. pyarrow is
+   imported on first use, not with this module.
+"""
+import importlib.util
+
+import numpy as np
+
+from db.api.errors import CustomError400
+from db.api.frame import EPOCH_ORDINAL
+
+_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+MIMETYPES = {
+    'arrow': 'application/vnd.apache.arrow.file',
+    'parquet': 'application/vnd.apache.parquet',
+}
+FORMATS = tuple(MIMETYPES)
+
+
+def available():
+    return _AVAILABLE
+
+
+def _pyarrow():
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+    return pyarrow
+
+
+def from_accept(accept):
+    """Return format which mime type is listed in *accept* header,
+       None if there is none or pyarrow is not installed."""
+    if not available():
+        return None
+    listed = set(accept.values())
+    for fmt, mimetype in MIMETYPES.items():
+        if mimetype in listed:
+            return fmt
+    return None
+
+
+def make_table(date_index, matrix, names: list, freq: str):
+    """Return pyarrow.Table for day numbers *date_index* and *matrix*
+       with a column of values for each of *names*."""
+    pyarrow = _pyarrow()
+    days = np.asarray(date_index, dtype='int64') - EPOCH_ORDINAL
+    arrays = [pyarrow.array(days.astype('int32'), type=pyarrow.date32())]
+    arrays.extend(pyarrow.array(matrix[:, i], type=pyarrow.float64(),
+                                from_pandas=True)
+                  for i in range(len(names)))
+    return pyarrow.table(arrays, names=['date'] + list(names),
+                         metadata={'freq': freq})
+
+
+def encode(fmt: str, date_index, matrix, names: list, freq: str):
+    """Return table made by make_table() as bytes in *fmt* format."""
+    if not available():
+        raise CustomError400(f'Format {fmt} is not available, '
+                             'pyarrow is not installed')
+    table = make_table(date_index, matrix, names, freq)
+    pyarrow = _pyarrow()
+    sink = pyarrow.BufferOutputStream()
+    if fmt == 'parquet':
+        pyarrow.parquet.write_table(table, sink)
+    else:
+        with pyarrow.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,128 @@
+"""Compression of responses and request bodies.
+
+   Responses with text, json or Arrow bodies are compressed with gzip
+   or zstd, whichever Accept-Encoding header prefers, zstd on a tie.
+   Streamed responses are compressed chunk by chunk as they are sent.
+   Cached responses keep compressed variants of their bodies, so that
+   a body is compressed once, not on every hit (see cache.py).
+
+   ETag of compressed response gets encoding suffix, so that it is not
+   same as ETag of uncompressed one, see etags.conditional().
+
+   Request body with Content-Encoding gzip or zstd is decompressed
+   while it is read.
+
+   zstd needs zstandard package, which is optional and imported on
+   first use.
+"""
+import gzip
+import importlib.util
+import zlib
+
+from flask import request
+
+from db.api.errors import CustomError400
+
+# in order of preference
+ENCODINGS = ('zstd', 'gzip') if importlib.util.find_spec('zstandard') \
+    else ('gzip',)
+COMPRESSIBLE_MIMETYPES = ('application/json',
+                          'application/x-ndjson',
+                          'application/vnd.apache.arrow.file',
+                          'image/svg+xml')
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def negotiate(accept_encodings):
+    """Return encoding preferred by Accept-Encoding header value
+       *accept_encodings*, None if no encoding is acceptable."""
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _zstandard():
+    import zstandard
+    return zstandard
+
+
+def compress(body: bytes, encoding: str):
+    if encoding == 'zstd':
+        return _zstandard().ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def compress_chunks(chunks, encoding: str):
+    """Yield compressed bytes for iterator of bytes *chunks*."""
+    if encoding == 'zstd':
+        compressor = _zstandard().ZstdCompressor(level=ZSTD_LEVEL) \
+            .compressobj()
+    else:
+        # wbits=31 writes gzip header and trailer
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def is_compressible(mimetype: str):
+    return mimetype.startswith('text/') or \
+        mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def tag_etag(response, encoding: str):
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+
+
+def compress_response(response):
+    """Compress *response* body if client accepts it. Used as
+       after_request handler."""
+    response.vary.add('Accept-Encoding')
+    if response.status_code not in (200, 304) or \
+            response.direct_passthrough:
+        return response
+    encoding = response.headers.get('Content-Encoding')
+    if response.status_code == 304:
+        # same ETag as client has
+        etag, _ = response.get_etag()
+        encoding = next((e for e in ENCODINGS if etag and
+                         request.if_none_match.contains(f'{etag}-{e}')),
+                        None)
+    elif encoding is None and is_compressible(response.mimetype):
+        encoding = negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            chunks = response.response
+            response.response = compress_chunks(response.iter_encoded(),
+                                                encoding)
+            if hasattr(chunks, 'close'):
+                response.call_on_close(chunks.close)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(compress(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+    if encoding in ENCODINGS:
+        tag_etag(response, encoding)
+    return response
+
+
+def decompress(stream, encoding: str):
+    """Return file-like object reading *stream* decompressed according
+       to Content-Encoding header value *encoding*."""
+    if not encoding or encoding == 'identity':
+        return stream
+    if encoding == 'gzip':
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    if encoding == 'zstd' and encoding in ENCODINGS:
+        return _zstandard().ZstdDecompressor().stream_reader(stream)
+    raise CustomError400(f'Content-Encoding {encoding} is not supported',
+                         payload=dict(allowed=list(ENCODINGS)))
@@ -0,0 +1,67 @@
+"""Downsampling of a series for charts, see max_points parameter.
+
+   Largest-Triangle-Three-Buckets (LTTB) keeps first and last points
+   and one point from each of max_points - 2 buckets of equal size
+   between them: the point making the largest triangle with point kept
+   from previous bucket and average of next bucket. Peaks and troughs
+   are kept, so a chart of few hundred points looks like chart of all
+   observations.
+
+   Bucket averages and triangle areas are computed with numpy, only
+   the choice of point in each bucket is a loop, as it depends on the
+   point chosen in previous bucket.
+"""
+import numpy as np
+
+# first, last and at least one point between them
+MIN_POINTS = 3
+
+
+def lttb(x, y, max_points: int):
+    """Return indices of at most *max_points* of points *x*, *y*
+       ordered by *x*, all indices if there are not more points."""
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if n <= max_points or max_points < MIN_POINTS:
+        return np.arange(n)
+    buckets = max_points - 2
+    # bucket k is edges[k]:edges[k + 1], first and last points excluded
+    edges = (np.arange(buckets + 1) * (n - 2) // buckets + 1)
+    sum_x = np.concatenate([[0.0], np.cumsum(x)])
+    sum_y = np.concatenate([[0.0], np.cumsum(y)])
+    sizes = np.diff(edges)
+    mean_x = (sum_x[edges[1:]] - sum_x[edges[:-1]]) / sizes
+    mean_y = (sum_y[edges[1:]] - sum_y[edges[:-1]]) / sizes
+    # third vertex: average of next bucket, last point for last bucket
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+    selected = np.empty(max_points, dtype='int64')
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for k in range(buckets):
+        start, end = edges[k], edges[k + 1]
+        # twice the triangle area, sign dropped
+        area = np.abs((x[a] - next_x[k]) * (y[start:end] - y[a]) -
+                      (x[a] - x[start:end]) * (next_y[k] - y[a]))
+        a = start + int(area.argmax())
+        selected[k + 1] = a
+    return selected
+
+
+def points(data, max_points: int):
+    """Return list of at most *max_points* of Point tuples *data*
+       ordered by date."""
+    data = list(data)
+    x = [point.date.toordinal() for point in data]
+    y = [point.value for point in data]
+    return [data[i] for i in lttb(x, y, max_points)]
+
+
+def columns(data, max_points: int):
+    """Return columns of select_columns() for one series with at most
+       *max_points* datapoints, ordered by date."""
+    names, name_index, dates, values = data
+    order = np.argsort(dates, kind='mergesort')
+    keep = order[lttb(dates[order], values[order], max_points)]
+    return names, name_index[keep], dates[keep], values[keep]
@@ -0,0 +1,57 @@
+"""JSON encoders for large responses.
+
+   dumps() uses encoder named by JSON_ENCODER in config. 'orjson' is
+   used if the package is installed, standard library 'json' otherwise.
+   More encoders can be added with register().
+
+   Encoders take numpy arrays as values and write NaN as null.
+"""
+import json
+
+import numpy as np
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+DEFAULT_ENCODER = 'orjson'
+
+_encoders = {}
+
+
+def register(name: str, func):
+    """Make *func(obj)* returning str or bytes available as encoder
+       *name*."""
+    _encoders[name] = func
+
+
+def _plain(obj):
+    """Convert numpy array *obj* to list, NaN to None."""
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'f':
+            values = obj.astype(object)
+            values[np.isnan(obj)] = None
+            return values.tolist()
+        return obj.tolist()
+    raise TypeError(f'{type(obj).__name__} is not JSON serializable')
+
+
+def _dumps_json(obj):
+    return json.dumps(obj, default=_plain, separators=(',', ':'))
+
+
+def _dumps_orjson(obj):
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+register('json', _dumps_json)
+if orjson is not None:
+    register('orjson', _dumps_orjson)
+
+
+def dumps(obj):
+    """Return *obj* encoded as JSON, str or bytes."""
+    name = current_app.config.get('JSON_ENCODER', DEFAULT_ENCODER)
+    return _encoders.get(name, _dumps_json)(obj)
@@ -0,0 +1,100 @@
+"""ETag validators and Cache-Control for data responses.
+
+   ETag is a hash of query and version counters of series in it
+   (Series.version is incremented on every write and does not repeat,
+   even after series is deleted and uploaded again), so it is computed
+   from catalog without reading datapoints. Request with matching
+   If-None-Match header is answered with 304 Not Modified.
+
+   Queries with end_date before last date of every series requested
+   are not affected by new observations and may be kept by clients
+   and proxies for CLOSED_RANGE_MAX_AGE seconds, unless a write has
+   revised history of a series before end_date (Series.revised_from).
+   Other responses must be revalidated on every request.
+"""
+import hashlib
+from datetime import datetime
+
+from flask import Response, current_app, request
+
+from db.api import reads
+from db.api.compression import ENCODINGS
+
+
+def _as_date(dt):
+    if isinstance(dt, str):
+        return datetime.strptime(dt, "%Y-%m-%d").date()
+    return dt
+
+
+def series_versions(freq: str, names: list):
+    """Return (name, version, stable_before) rows for *names* ordered
+       by name, see reads.versions()."""
+    return reads.versions(freq, names)
+
+
+def key_versions(keys: list):
+    """Return ('name:freq', version, stable_before) rows for (name, freq)
+       *keys* ordered by freq and name."""
+    return [(f'{name}:{freq}', version, stable_before) for
+            name, freq, version, stable_before in reads.key_versions(keys)]
+
+
+def make_etag(kind: str, query: tuple, versions):
+    text = repr((kind, query, [(name, version)
+                               for name, version, _ in versions]))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def cache_control(end_date, versions):
+    end_date = _as_date(end_date)
+    if end_date and versions and \
+            all(stable_before and end_date < stable_before
+                for _, _, stable_before in versions):
+        max_age = current_app.config.get('CLOSED_RANGE_MAX_AGE', 0)
+        return f'public, max-age={max_age}'
+    return 'no-cache'
+
+
+def conditional(kind: str, build, freq: str, names,
+                start_date=None, end_date=None, as_of=None):
+    """Return 304 response if client has current version of query
+       result, otherwise call *build()* to make response. Adds ETag and
+       Cache-Control headers. Query arguments are same as for
+       DatapointOperations.select_frame(), *names* can be a string.
+    """
+    if isinstance(names, str):
+        names = [names]
+    names = list(names or [])
+    versions = series_versions(freq, names)
+    query = (freq, names, str(start_date or ''), str(end_date or ''),
+             str(as_of or ''))
+    return _respond(kind, build, query, versions, end_date)
+
+
+def conditional_keys(kind: str, build, keys: list,
+                     start_date=None, end_date=None):
+    """Same as conditional() for series of different frequencies,
+       *keys* are (name, freq) tuples."""
+    versions = key_versions(keys)
+    query = ([list(key) for key in keys], str(start_date or ''),
+             str(end_date or ''))
+    return _respond(kind, build, query, versions, end_date)
+
+
+def _respond(kind, build, query, versions, end_date):
+    etag = make_etag(kind, query, versions)
+    control = cache_control(end_date, versions)
+    # compressed responses have ETag with encoding suffix
+    if any(request.if_none_match.contains(tag) for tag in
+           [etag] + [f'{etag}-{encoding}' for encoding in ENCODINGS]):
+        response = Response(status=304)
+    else:
+        response = build()
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = control
+    # format may be chosen by Accept header, see views.response_format()
+    response.vary.add('Accept')
+    return response
@@ -0,0 +1,124 @@
+"""Frame of several series as CSV, built with numpy or streamed.
+
+   Datapoints are read as columns (series index, day number, value)
+   and scattered into a dense 2-D array with a row per date found in
+   any series and a column per name, NaN marks missing values. CSV is
+   formatted by blocks of rows with numpy string operations.
+
+   stream_csv() makes same CSV from datapoints ordered by date one row
+   at a time, so that memory use depends on number of columns only.
+
+   Output is same as of utils.DictionaryRepresentation.to_csv().
+
+   series_columns() and ArrayRepresentation.to_columns() prepare same
+   data for orient=columns json, with dates formatted as one array.
+"""
+from itertools import groupby
+from operator import attrgetter
+
+import numpy as np
+
+from db.api.blobs import EPOCH_ORDINAL
+
+BLOCK_ROWS = 10000
+
+
+def pivot(series_names, index, dates, values, names):
+    """Return unique sorted day numbers and 2-D array of values with
+       a column for each of *names*.
+
+       *series_names*, *index*, *dates*, *values* are same as returned
+       by DatapointOperations.select_columns().
+    """
+    # first column of each name, *names* may repeat
+    first_column = {}
+    for column, name in enumerate(names):
+        first_column.setdefault(name, column)
+    column_of = np.array([first_column.get(name, -1)
+                          for name in series_names] + [-1], dtype='int64')
+    columns = column_of[np.asarray(index, dtype='int64')]
+    keep = columns >= 0
+    date_index, rows = np.unique(np.asarray(dates)[keep],
+                                 return_inverse=True)
+    matrix = np.full((len(date_index), len(names)), np.nan)
+    matrix[rows, columns[keep]] = np.asarray(values)[keep]
+    for column, name in enumerate(names):
+        if first_column[name] != column:
+            matrix[:, column] = matrix[:, first_column[name]]
+    return date_index, matrix
+
+
+def format_dates(dates):
+    """Return YYYY-MM-DD strings array for day numbers *dates*."""
+    days = np.asarray(dates, dtype='int64') - EPOCH_ORDINAL
+    return np.datetime_as_string(days.astype('datetime64[D]'), unit='D')
+
+
+def format_block(dates, matrix):
+    """Return CSV lines for *dates* and rows of *matrix*."""
+    # str() of numpy float64 is same as of python float
+    cells = np.where(np.isnan(matrix), '', matrix.astype(str))
+    table = np.column_stack([format_dates(dates), cells])
+    return [','.join(row) for row in table.tolist()]
+
+
+def yield_lines(date_index, matrix):
+    for start in range(0, len(date_index), BLOCK_ROWS):
+        end = start + BLOCK_ROWS
+        yield from format_block(date_index[start:end], matrix[start:end])
+
+
+class ArrayRepresentation:
+    """Same interface as utils.DictionaryRepresentation."""
+
+    def __init__(self, columns, names):
+        # *columns* is result of DatapointOperations.select_columns()
+        self.date_index, self.matrix = pivot(*columns, names)
+        self.names = names
+
+    @property
+    def header(self):
+        return ',{}'.format(','.join(self.names))
+
+    def yield_rows(self):
+        yield self.header
+        yield from yield_lines(self.date_index, self.matrix)
+        yield ''
+
+    def to_csv(self):
+        return '\n'.join(self.yield_rows())
+
+    def to_columns(self, freq: str):
+        """Return dictionary with dates and a list of values for each
+           name, NaN for missing values."""
+        return dict(freq=freq,
+                    names=self.names,
+                    dates=format_dates(self.date_index).tolist(),
+                    values=np.ascontiguousarray(self.matrix.T))
+
+
+def series_columns(columns, name: str, freq: str):
+    """Return dictionary with dates and values of series *name* ordered
+       by date, *columns* are result of select_columns() for the series.
+    """
+    _, _, dates, values = columns
+    order = np.argsort(dates, kind='mergesort')
+    return dict(name=name,
+                freq=freq,
+                dates=format_dates(dates[order]).tolist(),
+                values=np.ascontiguousarray(values[order]))
+
+
+def stream_csv(points, names):
+    """Yield CSV text in blocks of BLOCK_ROWS lines for Point tuples
+       *points* ordered by date."""
+    lines = [',{}'.format(','.join(names))]
+    for dt, group in groupby(points, key=attrgetter('date')):
+        values = {point.name: point.value for point in group}
+        cells = [str(values[name]) if name in values else ''
+                 for name in names]
+        lines.append(','.join([dt.strftime("%Y-%m-%d")] + cells))
+        if len(lines) >= BLOCK_ROWS:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    yield ''.join(line + '\n' for line in lines)
@@ -1,23 +1,35 @@
-from io import BytesIO
-import matplotlib
-# Force matplotlib to not use any Xwindows backend.
-matplotlib.use('Agg')
+"""Spline images of time series.
+
+   Figures are made with object-oriented matplotlib API, a new Figure
+   for every image. Figures are not registered with pyplot, so
+   rendering does not change global state, is safe in threads and
+   figure memory is released once image is written.
+
+   Images are kept in PngCache by series version and image parameters,
+   repeated requests for a series not changed are not rendered again.
 
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-import matplotlib.pyplot as plt
+   matplotlib is imported on first render, not with this module.
+"""
 from datetime import date
-import pandas as pd
+from io import BytesIO
+
+from flask import current_app
 
+from db.api.cache import LRUCache
 
 start = date(1998, 12, 31)
 end = date(2017, 12, 31)
 DEFAULT_TIMERANGE = start, end
 SPLINE_GPARAMS = {'timerange': DEFAULT_TIMERANGE,
                   'figsize': (2, 0.6),
-                  'style': 'ggplot',
+                  'dpi': 100,
+                  # first line color of 'ggplot' style
+                  'color': '#E24A33',
                   'facecolor': 'white',
                   'auto_x': False,
                   'axis_on': False}
+# number of images kept in memory, see PngCache
+DEFAULT_CACHE_SIZE = 256
 
 
 def get_data_for_spline(query_data):
@@ -35,15 +47,29 @@ def get_data_for_spline(query_data):
                 y=[item.value for item in query_data])
 
 
-def make_png(query_data):
+def spline_params(width=None, height=None, dpi=None,
+                  start_date=None, end_date=None):
+    """Return SPLINE_GPARAMS with figure size in inches, *dpi* and
+       time range replaced by arguments given."""
+    default_width, default_height = SPLINE_GPARAMS['figsize']
+    default_start, default_end = SPLINE_GPARAMS['timerange']
+    return dict(SPLINE_GPARAMS,
+                figsize=(width or default_width, height or default_height),
+                dpi=dpi or SPLINE_GPARAMS['dpi'],
+                timerange=(start_date or default_start,
+                           end_date or default_end))
+
+
+def make_png(query_data, **options):
     """
     Args:
         DatapointsOperations query.
+        options - arguments of spline_params()
     Returns:
         Png image.
     """
     data_dict = get_data_for_spline(query_data)
-    return create_png_from_dict(data_dict, SPLINE_GPARAMS)
+    return create_png_from_dict(data_dict, spline_params(**options))
 
 
 def create_png_from_dict(data, params):
@@ -57,20 +83,37 @@ def create_png_from_dict(data, params):
     Returns:
         Png image.
     """
-    plt.style.use(params["style"])
-    fig = plt.figure(figsize=params["figsize"])
-    dfm = pd.DataFrame(data)
-    dfm.set_index('x', inplace=True)
-    axes = fig.add_subplot(1, 1, 1, facecolor=params["facecolor"])
-    axes.set_xlim(params['timerange'])
-    axes.plot(dfm)
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=params['figsize'], dpi=params['dpi'],
+                 facecolor='white')
+    canvas = FigureCanvasAgg(fig)
+    axes = fig.add_subplot(1, 1, 1, facecolor=params['facecolor'])
+    x_start, x_end = params['timerange']
+    # one-day range is left to autoscale
+    if x_start < x_end:
+        axes.set_xlim(x_start, x_end)
+    axes.plot(data['x'], data['y'], color=params['color'])
     if params['auto_x']:
         fig.autofmt_xdate()
     if not params['axis_on']:
-        plt.axis('off')
-    fig.autofmt_xdate()
-    plt.axis('off')
-    canvas = FigureCanvas(fig)
+        axes.axis('off')
     png_output = BytesIO()
     canvas.print_png(png_output)
     return png_output.getvalue()
+
+
+class PngCache(LRUCache):
+    """Least recently used images, at most *size* of them."""
+
+
+def current_cache():
+    """Return PngCache of current app."""
+    cache = current_app.extensions.get('png_cache')
+    if cache is None:
+        size = current_app.config.get('SPLINE_CACHE_SIZE',
+                                      DEFAULT_CACHE_SIZE)
+        cache = current_app.extensions.setdefault('png_cache',
+                                                  PngCache(size))
+    return cache
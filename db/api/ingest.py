@@ -0,0 +1,171 @@
+"""Incremental reading of datapoints from upload stream.
+
+   Body of POST /api/datapoints is read in blocks and parsed one
+   datapoint at a time, so that memory use does not depend on size of
+   upload. Two formats are accepted:
+
+     - JSON array of datapoint dictionaries (default)
+     - newline-delimited JSON, one dictionary per line, if request
+       mimetype is 'application/x-ndjson'
+
+   Errors are raised as CustomError400 with index of failing datapoint
+   in payload.
+"""
+import codecs
+import json
+from datetime import datetime
+
+from db.api.errors import CustomError400
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonlines')
+BLOCK_SIZE = 64 * 1024
+# larger datapoint dictionaries are treated as malformed json
+MAX_RECORD_SIZE = 1024 * 1024
+WHITESPACE = ' \t\r\n'
+
+
+def error(message, index):
+    return CustomError400(f'{message} at datapoint {index}',
+                          payload=dict(index=index))
+
+
+def read_blocks(stream):
+    """Yield text blocks decoded from bytes *stream*."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        block = stream.read(BLOCK_SIZE)
+        if not block:
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+            return
+        yield decoder.decode(block)
+
+
+class TextBuffer:
+    """Sliding window over text blocks with JSON decoding."""
+
+    decoder = json.JSONDecoder()
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def more(self):
+        """Drop consumed text and append next block.
+           Returns False at end of stream."""
+        block = next(self.blocks, None)
+        if block is None:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return next non-whitespace character, '' at end of stream."""
+        while True:
+            while self.pos < len(self.text) and \
+                    self.text[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.more():
+                return ''
+
+    def skip(self):
+        self.pos += 1
+
+    def value(self):
+        """Decode next JSON value, reading more blocks if needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if len(self.text) - self.pos > MAX_RECORD_SIZE:
+                    raise
+                if self.more():
+                    continue
+                raise
+            # a number may be cut at block boundary, make sure it is not
+            if end == len(self.text) and not self.eof and self.more():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(stream):
+    """Yield elements of JSON array from bytes *stream* one by one."""
+    buffer = TextBuffer(read_blocks(stream))
+    index = 0
+    if buffer.peek() != '[':
+        raise error('Expected JSON array', index)
+    buffer.skip()
+    if buffer.peek() == ']':
+        buffer.skip()
+    else:
+        while True:
+            try:
+                yield buffer.value()
+            except json.JSONDecodeError:
+                raise error('Invalid JSON', index)
+            index += 1
+            char = buffer.peek()
+            buffer.skip()
+            if char == ']':
+                break
+            if char != ',':
+                raise error('Expected comma or end of array', index)
+    if buffer.peek() != '':
+        raise error('Unexpected data after JSON array', index)
+
+
+def read_lines(stream):
+    """Yield text lines decoded from bytes *stream*. Needs only read()
+       method of *stream*, decompressing readers may not iterate."""
+    rest = ''
+    for block in read_blocks(stream):
+        lines = (rest + block).split('\n')
+        rest = lines.pop()
+        yield from lines
+    if rest:
+        yield rest
+
+
+def iter_ndjson(stream):
+    """Yield JSON values from *stream* with a value per line."""
+    index = 0
+    for line in read_lines(stream):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            raise error('Invalid JSON', index)
+        index += 1
+
+
+def validated(datapoint, index):
+    """Return *datapoint* with date converted to datetime.date,
+       raise error if *datapoint* is malformed."""
+    try:
+        return dict(name=str(datapoint['name']),
+                    freq=str(datapoint['freq']),
+                    date=datetime.strptime(datapoint['date'],
+                                           "%Y-%m-%d").date(),
+                    value=float(datapoint['value']))
+    except (KeyError, TypeError, ValueError):
+        raise error('Invalid datapoint', index)
+
+
+def read_datapoints(stream, mimetype=None):
+    """Yield validated datapoint dictionaries from upload *stream*."""
+    if mimetype in NDJSON_MIMETYPES:
+        values = iter_ndjson(stream)
+    else:
+        values = iter_json_array(stream)
+    for index, datapoint in enumerate(values):
+        yield validated(datapoint, index)
@@ -1,26 +1,102 @@
-from datetime import datetime
+from collections import namedtuple
+from datetime import date, datetime
 from db import db
 
 
-class Datapoint(db.Model):
+class DayOrdinal(db.TypeDecorator):
+    """Date stored as integer day number (see date.toordinal()).
+       Accepts datetime.date or YYYY-MM-DD string on input, returns
+       datetime.date on output.
+    """
+    impl = db.Integer
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = datetime.strptime(value, "%Y-%m-%d").date()
+        return value.toordinal()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return date.fromordinal(value)
+
+
+class Series(db.Model):
+    """Time series identified by (name, freq), also a catalog entry.
+
+       Holds date range, row count and last value of the series. Rows are
+       maintained by DatapointOperations on every write, so that metadata
+       queries do not scan the datapoint table. Series with all datapoints
+       deleted is kept with zero count, revisions refer to it.
+    """
     __table_args__ = (
-        db.UniqueConstraint("name", "freq", "date"),
+        db.UniqueConstraint("name", "freq"),
     )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     freq = db.Column(db.String, nullable=False)
-    date = db.Column(db.Date, nullable=False)
-    value = db.Column(db.Float, nullable=False)
+    # catalog fields are empty until first datapoint is written
+    first_date = db.Column(db.Date, nullable=True)
+    last_date = db.Column(db.Date, nullable=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    last_value = db.Column(db.Float, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True)
+    # earliest date written or deleted at or before last date by any
+    # write, empty if series was only appended to, see etags.py
+    revised_from = db.Column(db.Date, nullable=True)
+    # incremented on every write to series, used for ETag and as key of
+    # in-memory caches; never goes back as series rows are not deleted
+    version = db.Column(db.Integer, nullable=False,
+                        default=0, server_default='0')
 
-    def __init__(self, name, freq, date, value):
+    def __init__(self, name, freq):
         self.name = name
         self.freq = freq
-        self.date = datetime.strptime(date, "%Y-%m-%d").date()
+        self.count = 0
+        self.version = 0
+
+
+class Datapoint(db.Model):
+    """Observation of a series at date. Series name and frequency are
+       kept in Series table, rows are clustered by (series_id, date).
+    """
+    __table_args__ = (
+        # sqlite stores the table as a b-tree on primary key
+        {'sqlite_with_rowid': False},
+    )
+
+    series_id = db.Column(db.Integer, db.ForeignKey('series.id'),
+                          primary_key=True)
+    date = db.Column(DayOrdinal, primary_key=True)
+    value = db.Column(db.Float, nullable=False)
+    # vintage when value was written, 0 for values written before
+    # vintages were introduced
+    vintage_id = db.Column(db.Integer, nullable=False,
+                           default=0, server_default='0')
+    series = db.relationship(Series)
+
+    def __init__(self, name, freq, date, value, series=None):
+        # *series* is a Series row for *name* and *freq* found by caller,
+        # new Series is created if not given
+        self.series = series or Series(name, freq)
+        if isinstance(date, str):
+            date = datetime.strptime(date, "%Y-%m-%d").date()
         # actually, utils.to_date should be called
         # but if we import utils, we get import recursion
+        self.date = date
         self.value = value
 
+    @property
+    def name(self):
+        return self.series.name
+
+    @property
+    def freq(self):
+        return self.series.freq
+
     @property
     def serialized(self):  # Add serialize method for jsonify
         return {
@@ -31,6 +107,72 @@ class Datapoint(db.Model):
         }
 
 
+class Point(namedtuple('Point', 'name freq date value')):
+    """Datapoint read without ORM, behaves like Datapoint."""
+    __slots__ = ()
+
+    @property
+    def serialized(self):
+        return {
+            'freq': self.freq,
+            'name': self.name,
+            # same as strftime("%Y-%m-%d"), but faster
+            'date': self.date.isoformat(),
+            'value': self.value
+        }
+
+
+class Vintage(db.Model):
+    """Upload batch. Datapoint values written by an upload are marked
+       with its vintage, values they replace are kept in Revision."""
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    def __init__(self):
+        self.created_at = datetime.utcnow()
+
+    @property
+    def serialized(self):
+        return {
+            'id': self.id,
+            'created_at': self.created_at.isoformat()
+        }
+
+
+class Revision(db.Model):
+    """Datapoint value replaced or deleted by a later vintage.
+       Value was current from vintage *valid_from* until vintage
+       *valid_to*, exclusive.
+    """
+    __table_args__ = (
+        db.Index('ix_revision_valid_to', 'series_id', 'valid_to'),
+    )
+
+    series_id = db.Column(db.Integer, db.ForeignKey('series.id'),
+                          primary_key=True)
+    date = db.Column(DayOrdinal, primary_key=True)
+    valid_to = db.Column(db.Integer, primary_key=True)
+    valid_from = db.Column(db.Integer, nullable=False)
+    value = db.Column(db.Float, nullable=False)
+
+
+class SeriesBlob(db.Model):
+    """Datapoints of a series packed as arrays of day numbers and values.
+       One row per series, or per series and year for daily series.
+       Used instead of Datapoint table by blob storage engine
+       (see db.api.blobs).
+    """
+    series_id = db.Column(db.Integer, db.ForeignKey('series.id'),
+                          primary_key=True)
+    # 0 for series not split by years
+    year = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+    # numpy dtype of values, '<f8' or '<f4'
+    dtype = db.Column(db.String, nullable=False)
+    dates = db.Column(db.LargeBinary, nullable=False)
+    values = db.Column(db.LargeBinary, nullable=False)
+
+
 class Description(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     abbr = db.Column(db.String, nullable=False)
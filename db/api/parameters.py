@@ -5,7 +5,12 @@ from flask import json
 from webargs.flaskparser import parser
 from webargs import fields, ValidationError
 
-from db.api.queries import Allowed, All
+import db.api.reads as reads
+import db.api.registry as registry
+import db.api.transform as transform
+from db.api.downsample import MIN_POINTS
+from db.api.queries import Allowed
+from db.api.resample import AGGREGATORS, source_frequency
 
 
 class ArgError(ValidationError):
@@ -31,6 +36,27 @@ class ArgError(ValidationError):
         super().__init__(message, status_code=422, load=load)
 
 
+# formats of api/datapoints
+FORMATS = ('json', 'ndjson', 'arrow', 'parquet')
+# formats of api/series
+SERIES_FORMATS = ('csv', 'arrow', 'parquet')
+# formats of api/frame
+FRAME_FORMATS = ('csv', 'arrow', 'parquet')
+# ways to build /api/frame, see views.get_dataframe()
+PIVOT_ENGINES = ('numpy', 'dict', 'stream')
+# json layouts, list of datapoints or arrays of dates and values
+ORIENTS = ('records', 'columns')
+# largest side of api/spline image, pixels
+MAX_IMAGE_PIXELS = 2000
+# formats and renderers of api/spline, see views.spline()
+IMAGE_FORMATS = ('png', 'svg')
+IMAGE_ENGINES = ('matplotlib', 'fast')
+# api/sprite limits: number of series and pixels of png sprite
+MAX_SPRITE_SERIES = 200
+MAX_SPRITE_PIXELS = 4000000
+SPRITE_FORMATS = ('png', 'json')
+
+
 def convert_name_string_to_list(name_str):
     if not name_str:
         return []
@@ -38,6 +64,18 @@ def convert_name_string_to_list(name_str):
         return name_str.split(',')
     else:    
         return [name_str]
+
+
+def convert_series_string_to_keys(series_str):
+    """Return (name, freq) tuples for 'BRENT:d,GDP_yoy:q' string, None
+       for item without frequency. Repeated items are dropped."""
+    keys = []
+    for item in filter(None, (series_str or '').split(',')):
+        name, sep, freq = item.rpartition(':')
+        key = (name, freq) if sep and name and freq else None
+        if key not in keys:
+            keys.append(key)
+    return keys
     
 
 class Check:
@@ -48,6 +86,17 @@ class Check:
         self.freq = args.get('freq')        
         self.start_date = args.get('start_date')
         self.end_date = args.get('end_date')
+        self.as_of = args.get('as_of')
+        self.pivot = args.get('pivot')
+        self.format = args.get('format')
+        self.orient = args.get('orient')
+        self.width = args.get('width')
+        self.height = args.get('height')
+        self.dpi = args.get('dpi')
+        self.engine = args.get('engine')
+        self.max_points = args.get('max_points')
+        self.agg = args.get('agg')
+        self.keys = convert_series_string_to_keys(args.get('series'))
 
     def start_is_not_in_future(self):
         if self.start_date:
@@ -63,23 +112,139 @@ class Check:
                 load = dict(start_date=self.start_date, end_date=self.end_date)
                 raise ArgError('End date must be after start date', load)
 
+    def _possible_names(self):
+        if self.as_of:
+            # series with all datapoints deleted can be read as of
+            # an earlier vintage
+            return set(reads.known_names(self.freq))
+        return registry.current().names(self.freq)
+
     def freq_exist(self):
-        all_freq = All.frequencies()
-        if self.freq not in all_freq:
-            load = dict(freq=self.freq, allowed=all_freq)
+        all_freq = registry.current().frequencies()
+        if self.freq not in all_freq and not \
+                (self.as_of and self._possible_names()):
+            load = dict(freq=self.freq, allowed=list(all_freq))
             raise ArgError('Invalid frequency', load)
 
     def _name_exists(self, name, possible_names):
         if name not in possible_names:
-            load = dict(name=name, freq=self.freq, allowed=possible_names)
+            load = dict(name=name, freq=self.freq,
+                        allowed=sorted(possible_names))
             raise ArgError('Variable name does not exist in this frequency)',
                            load)
                     
     def names_validated(self):                
-        possible_names = Allowed.names(self.freq)
+        # set of names, lookup does not depend on number of names
+        possible_names = self._possible_names()
         for name in self.names:
             self._name_exists(name, possible_names)
 
+    def as_of_is_valid(self):
+        # vintage id or YYYY-MM-DD date
+        if self.as_of and not self.as_of.isdigit():
+            try:
+                datetime.strptime(self.as_of, "%Y-%m-%d")
+            except ValueError:
+                load = dict(as_of=self.as_of)
+                raise ArgError('as_of must be vintage id or YYYY-MM-DD date',
+                               load)
+
+    def format_is_valid(self):
+        if self.format and self.format not in FORMATS:
+            load = dict(format=self.format, allowed=list(FORMATS))
+            raise ArgError('Invalid format', load)
+
+    def series_format_is_valid(self):
+        if self.format and self.format not in SERIES_FORMATS:
+            load = dict(format=self.format, allowed=list(SERIES_FORMATS))
+            raise ArgError('Invalid format', load)
+
+    def frame_format_is_valid(self):
+        if self.format and self.format not in FRAME_FORMATS:
+            load = dict(format=self.format, allowed=list(FRAME_FORMATS))
+            raise ArgError('Invalid format', load)
+
+    def orient_is_valid(self):
+        if self.orient and self.orient not in ORIENTS:
+            load = dict(orient=self.orient, allowed=list(ORIENTS))
+            raise ArgError('Invalid orient', load)
+        if self.orient == 'columns' and self.format == 'ndjson':
+            load = dict(orient=self.orient, format=self.format)
+            raise ArgError('orient=columns is not supported for ndjson',
+                           load)
+
+    def image_size_is_valid(self):
+        dpi = self.dpi or 100
+        for side in (self.width, self.height):
+            if side is not None and not 0 < side * dpi <= MAX_IMAGE_PIXELS:
+                load = dict(width=self.width, height=self.height,
+                            dpi=self.dpi, max_pixels=MAX_IMAGE_PIXELS)
+                raise ArgError('Invalid image size', load)
+        if self.dpi is not None and self.dpi <= 0:
+            raise ArgError('Invalid dpi', dict(dpi=self.dpi))
+
+    def image_format_is_valid(self):
+        if self.format and self.format not in IMAGE_FORMATS:
+            load = dict(format=self.format, allowed=list(IMAGE_FORMATS))
+            raise ArgError('Invalid format', load)
+        if self.engine and self.engine not in IMAGE_ENGINES:
+            load = dict(engine=self.engine, allowed=list(IMAGE_ENGINES))
+            raise ArgError('Invalid engine', load)
+
+    def keys_validated(self):
+        if not 0 < len(self.keys) <= MAX_SPRITE_SERIES:
+            load = dict(count=len(self.keys), max_series=MAX_SPRITE_SERIES)
+            raise ArgError('Invalid number of series', load)
+        catalog = registry.current()
+        for key in self.keys:
+            if key is None:
+                load = dict(example='BRENT:d,GDP_yoy:q')
+                raise ArgError('Series must be given as name:freq', load)
+            name, freq = key
+            if not catalog.has(name, freq):
+                load = dict(name=name, freq=freq)
+                raise ArgError('Series does not exist', load)
+
+    def sprite_is_valid(self):
+        if self.format and self.format not in SPRITE_FORMATS:
+            load = dict(format=self.format, allowed=list(SPRITE_FORMATS))
+            raise ArgError('Invalid format', load)
+        dpi = self.dpi or 100
+        pixels = (self.width or 2) * dpi * (self.height or 0.6) * dpi
+        if pixels * len(self.keys) > MAX_SPRITE_PIXELS:
+            load = dict(count=len(self.keys), width=self.width,
+                        height=self.height, dpi=self.dpi,
+                        max_pixels=MAX_SPRITE_PIXELS)
+            raise ArgError('Sprite is too large', load)
+
+    def series_or_source_exists(self):
+        if not self.agg:
+            self.freq_exist()
+            possible_names = self._possible_names()
+            for name in self.names:
+                # series not stored may be made by transform.py
+                if not transform.source(name, self.freq):
+                    self._name_exists(name, possible_names)
+            return
+        if self.agg not in AGGREGATORS:
+            load = dict(agg=self.agg, allowed=list(AGGREGATORS))
+            raise ArgError('Invalid aggregator', load)
+        for name in self.names:
+            if source_frequency(name, self.freq) is None:
+                load = dict(name=name, freq=self.freq, agg=self.agg)
+                raise ArgError('No series of higher frequency to resample',
+                               load)
+
+    def max_points_is_valid(self):
+        if self.max_points is not None and self.max_points < MIN_POINTS:
+            load = dict(max_points=self.max_points, min_points=MIN_POINTS)
+            raise ArgError('Invalid max_points', load)
+
+    def pivot_is_valid(self):
+        if self.pivot and self.pivot not in PIVOT_ENGINES:
+            load = dict(pivot=self.pivot, allowed=list(PIVOT_ENGINES))
+            raise ArgError('Invalid pivot engine', load)
+
     def not_all_are_none(self):
         is_none = [
             (x is None) for x in [
@@ -90,12 +255,15 @@ class Check:
         return not all(is_none)
 
 
-def get_func(func_name):
-    return lambda args: getattr(Check(args), func_name)()
-
-
 def make_func_list(func_names):
-    return [get_func(foo) for foo in func_names]
+    """Return validators list for webargs parser. Single validator
+       calls Check methods *func_names*, so that Check is created once
+       per request."""
+    def validate(args):
+        check = Check(args)
+        return all(getattr(check, func_name)() is not False
+                   for func_name in func_names)
+    return [validate]
 
 
 class RequestArgs:
@@ -103,16 +271,24 @@ class RequestArgs:
         'freq': fields.Str(required=True),
         'name': fields.Str(required=True),
         'start_date': fields.Date(required=False),
-        'end_date': fields.Date(required=False)
+        'end_date': fields.Date(required=False),
+        'as_of': fields.Str(required=False),
+        'format': fields.Str(required=False),
+        'orient': fields.Str(required=False),
+        'max_points': fields.Int(required=False)
         }
 
     validate_with = make_func_list(
         ['start_is_not_in_future',
          'end_date_after_start_date',
          'freq_exist',
-         'names_validated'])
+         'names_validated',
+         'as_of_is_valid',
+         'format_is_valid',
+         'orient_is_valid',
+         'max_points_is_valid'])
 
-    query_keys = ['name', 'freq', 'start_date', 'end_date']
+    query_keys = ['name', 'freq', 'start_date', 'end_date', 'as_of']
 
     def __init__(self, request=flask.request):
         self.arg_dict = parser.parse(self.schema, req=request,
@@ -127,22 +303,44 @@ class RequestArgs:
     def __getattr__(self, x):
         return self.arg_dict.get(x)
 
+
+class SeriesArgs(RequestArgs):
+    schema = dict(RequestArgs.schema, agg=fields.Str(required=False))
+
+    validate_with = make_func_list(
+        ['start_is_not_in_future',
+         'end_date_after_start_date',
+         'series_or_source_exists',
+         'as_of_is_valid',
+         'series_format_is_valid',
+         'orient_is_valid',
+         'max_points_is_valid'])
+
+
 class RequestFrameArgs(RequestArgs):
     schema = {
         'freq': fields.Str(required=True),
         'name': fields.Str(required=False),
         'start_date': fields.Date(required=False),
-        'end_date': fields.Date(required=False)
+        'end_date': fields.Date(required=False),
+        'as_of': fields.Str(required=False),
+        'pivot': fields.Str(required=False),
+        'orient': fields.Str(required=False),
+        'format': fields.Str(required=False)
         }
 
     validate_with = make_func_list([
         'start_is_not_in_future',
         'end_date_after_start_date',
         'freq_exist',
-        'names_validated'
+        'names_validated',
+        'as_of_is_valid',
+        'pivot_is_valid',
+        'orient_is_valid',
+        'frame_format_is_valid'
     ])
 
-    query_keys = ['names', 'freq', 'start_date', 'end_date']
+    query_keys = ['names', 'freq', 'start_date', 'end_date', 'as_of']
 
 
     def __init__(self, request=flask.request):
@@ -155,6 +353,57 @@ class RequestFrameArgs(RequestArgs):
         self.arg_dict['names'] = names
 
 
+class SplineArgs(RequestArgs):
+    schema = dict(RequestArgs.schema,
+                  width=fields.Float(required=False),
+                  height=fields.Float(required=False),
+                  dpi=fields.Int(required=False),
+                  engine=fields.Str(required=False))
+
+    validate_with = make_func_list(
+        ['start_is_not_in_future',
+         'end_date_after_start_date',
+         'freq_exist',
+         'names_validated',
+         'as_of_is_valid',
+         'image_size_is_valid',
+         'image_format_is_valid',
+         'max_points_is_valid'])
+
+    image_keys = ['width', 'height', 'dpi', 'start_date', 'end_date']
+
+    def get_image_parameters(self):
+        return self._make_dict(self.image_keys)
+
+
+class SpriteArgs(RequestArgs):
+    schema = {
+        'series': fields.Str(required=True),
+        'start_date': fields.Date(required=False),
+        'end_date': fields.Date(required=False),
+        'format': fields.Str(required=False),
+        'width': fields.Float(required=False),
+        'height': fields.Float(required=False),
+        'dpi': fields.Int(required=False)
+        }
+
+    validate_with = make_func_list(
+        ['start_is_not_in_future',
+         'end_date_after_start_date',
+         'keys_validated',
+         'image_size_is_valid',
+         'sprite_is_valid'])
+
+    image_keys = SplineArgs.image_keys
+
+    def __init__(self, request=flask.request):
+        super().__init__(request)
+        self.arg_dict['keys'] = convert_series_string_to_keys(self.series)
+
+    def get_image_parameters(self):
+        return self._make_dict(self.image_keys)
+
+
 class SimplifiedArgs(RequestArgs):
     schema = {
         'freq': fields.Str(required=False),
@@ -165,6 +414,12 @@ class SimplifiedArgs(RequestArgs):
     validate_with = make_func_list(['not_all_are_none'])
     query_keys = ['name', 'freq', 'start_date', 'end_date']
 
+    def __init__(self, request=flask.request):
+        super().__init__(request)
+        # 'name' may list several variables, eg 'BRENT,USDRUR_CB'
+        names = convert_name_string_to_list(self.arg_dict.get('name'))
+        self.arg_dict['name'] = names or None
+
 
 class DescriptionArgs:
 
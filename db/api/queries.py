@@ -1,9 +1,30 @@
-from datetime import datetime
-
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from flask import current_app
+import numpy as np
+from sqlalchemy import and_, event, func, literal, union_all
+from sqlalchemy.orm import Session
+
+import db.api.blobs as blobs
+import db.api.reads as reads
+import db.api.registry as registry
+import db.api.replica as replica
+from db.api import changes
 from db.api.errors import CustomError400
-from db.api.models import Datapoint, Description
+from db.api.models import (Datapoint, Description, Point, Revision,
+                           Series, Vintage)
 from db import db
 
+# max number of names in one IN (...) clause
+CHUNK_SIZE = 500
+# datapoints kept in memory by upsert_many()
+UPSERT_BATCH_SIZE = 10000
+# rows fetched at a time from server-side cursor by select_stream()
+STREAM_BATCH_SIZE = 1000
+# session.info key for vintage of current transaction
+VINTAGE = 'vintage'
+
 
 # TODO: duplicate of util.py fucntion
 def to_date(date_str: str):
@@ -21,19 +42,65 @@ def date_as_str(dt):
     return datetime.strftime(dt, "%Y-%m-%d")
 
 
+def uses_blobs():
+    """Return True if blob storage engine is enabled in config."""
+    return current_app.config.get('STORAGE_ENGINE') == 'blob'
+
+
 class DatapointOperations:
     @staticmethod
-    def _base_select(freq: str, start_date, end_date):
-        data = Datapoint.query.order_by(Datapoint.date)
+    def _series_filter(query, freq: str, names: list):
         if freq:
-            data = data.filter_by(freq=freq)
+            query = query.filter(Series.freq == freq)
+        if names:
+            query = query.filter(Series.name.in_(names))
+        return query
+
+    @staticmethod
+    def _date_filter(query, start_date, end_date, column=Datapoint.date):
         if start_date:
-            data = data.filter(Datapoint.date >= start_date)
+            query = query.filter(column >= start_date)
         if end_date:
-            data = data.filter(Datapoint.date <= end_date)
-        return data
+            query = query.filter(column <= end_date)
+        return query
 
-    def select(freq: str, name: str, start_date, end_date):
+    @staticmethod
+    def _filter(query, freq: str, names: list, start_date, end_date):
+        """Apply *freq*, *names*, *start_date* and *end_date* filters to
+           *query*, which must have Datapoint and Series joined."""
+        query = DatapointOperations._series_filter(query, freq, names)
+        return DatapointOperations._date_filter(query, start_date, end_date)
+
+    @staticmethod
+    def _base_select(freq: str, names: list, start_date, end_date):
+        return reads.points(freq, names, start_date, end_date)
+
+    @staticmethod
+    def _select_as_of(freq: str, names: list, start_date, end_date,
+                      vintage_id: int):
+        """Return Point tuples with values current at *vintage_id*."""
+        current = db.session.query(Series.name.label('name'),
+                                   Series.freq.label('freq'),
+                                   Datapoint.date.label('date'),
+                                   Datapoint.value.label('value')) \
+            .join(Datapoint.series) \
+            .filter(Datapoint.vintage_id <= vintage_id)
+        current = DatapointOperations._filter(current, freq, names,
+                                              start_date, end_date)
+        past = db.session.query(Series.name.label('name'),
+                                Series.freq.label('freq'),
+                                Revision.date.label('date'),
+                                Revision.value.label('value')) \
+            .join(Series, Revision.series_id == Series.id) \
+            .filter(Revision.valid_from <= vintage_id) \
+            .filter(Revision.valid_to > vintage_id)
+        past = DatapointOperations._series_filter(past, freq, names)
+        past = DatapointOperations._date_filter(past, start_date, end_date,
+                                                column=Revision.date)
+        stmt = union_all(current.statement, past.statement).order_by('date')
+        return [Point(*row) for row in db.session.execute(stmt)]
+
+    def select(freq: str, name: str, start_date, end_date, as_of=None):
         """Return dictionaries with datapoints, corresposding to
            *freq*, *name* and *start_date* and *end_date*.
 
@@ -42,53 +109,513 @@ class DatapointOperations:
                select_datapoints('a', None, None, None)
 
            Returns:
-               Iterable Query object <http://docs.sqlalchemy.org/en/latest/orm/query.html>
+               iterable of Point tuples with count() and first() methods
         """
-        data = DatapointOperations._base_select(freq, start_date, end_date)
-        if name:
-            data = data.filter_by(name=name)
-        return data
-
-    def select_frame(freq: str, names: list, start_date, end_date):
-        data = DatapointOperations._base_select(freq, start_date, end_date)
-        if names:
-            data = data.filter(Datapoint.name.in_(names))
-        return data
+        names = [name] if name else None
+        return DatapointOperations.select_frame(freq, names,
+                                                start_date, end_date, as_of)
+
+    def select_frame(freq: str, names: list, start_date, end_date,
+                     as_of=None):
+        """Return datapoints for several *names*. With *as_of* vintage
+           id or date returns list of values as they were at that
+           vintage, see VintageOperations.resolve().
+        """
+        if as_of in (None, ''):
+            as_of = None
+        if as_of is not None and uses_blobs():
+            raise CustomError400('Parameter as_of is not supported '
+                                 'by blob storage')
+        if as_of is not None:
+            vintage_id = VintageOperations.resolve(as_of)
+            return DatapointOperations._select_as_of(freq, names,
+                                                     start_date, end_date,
+                                                     vintage_id)
+        if replica.enabled():
+            return replica.current().select(freq, names,
+                                            start_date, end_date)
+        if uses_blobs():
+            return blobs.select(freq, names, start_date, end_date)
+        return DatapointOperations._base_select(freq, names,
+                                                start_date, end_date)
+
+    def select_keys(keys: list, start_date=None, end_date=None):
+        """Return Point tuples of series with (name, freq) *keys*.
+           Rows engine reads all series in one query, blob storage and
+           replica read them by frequency, see select_frame().
+        """
+        if not (uses_blobs() or replica.enabled()):
+            return reads.key_points(keys, start_date, end_date)
+        names = {}
+        for name, freq in keys:
+            names.setdefault(freq, []).append(name)
+        points = []
+        for freq in sorted(names):
+            points.extend(DatapointOperations.select_frame(
+                freq, names[freq], start_date, end_date))
+        return points
+
+    def select_columns(freq: str, names: list, start_date, end_date,
+                       as_of=None):
+        """Return datapoints as columns, arguments are same as for
+           select_frame().
 
-    def upsert(datapoint):
+           Returns:
+               list of series names and arrays of index in that list,
+               day number and value for every datapoint
+        """
+        if as_of in (None, '') and not (uses_blobs() or replica.enabled()):
+            rows = reads.columns(freq, names, start_date, end_date)
+            if not rows:
+                return [], np.array([], dtype='int64'), \
+                    np.array([], dtype='int64'), np.array([], dtype='float64')
+            row_names, dates, values = zip(*rows)
+            series_names, index = np.unique(row_names, return_inverse=True)
+            return (series_names.tolist(), index,
+                    np.array(dates, dtype='int64'),
+                    np.array(values, dtype='float64'))
+        data = DatapointOperations.select_frame(freq, names,
+                                                start_date, end_date, as_of)
+        if isinstance(data, blobs.BlobSelection):
+            index, dates, values = data.columns()
+            return [a.name for a in data.arrays], index, dates, values
+        series_names = sorted(set(p.name for p in data))
+        positions = {name: i for i, name in enumerate(series_names)}
+        return (series_names,
+                np.array([positions[p.name] for p in data], dtype='int64'),
+                np.array([p.date.toordinal() for p in data], dtype='int64'),
+                np.array([p.value for p in data], dtype='float64'))
+
+    def select_stream(freq: str, names: list, start_date, end_date,
+                      as_of=None):
+        """Return iterator over Point tuples ordered by date, arguments
+           are same as for select_frame(). Rows engine reads datapoints
+           from server-side cursor, so they are not all in memory at once.
+
+           Not a generator: statement is executed and first rows are
+           fetched before response headers are sent, so parameter and
+           database errors are raised by this call.
+        """
+        if as_of in (None, '') and not (uses_blobs() or replica.enabled()):
+            return reads.stream(freq, names, start_date, end_date,
+                                STREAM_BATCH_SIZE)
+        data = DatapointOperations.select_frame(freq, names,
+                                                start_date, end_date, as_of)
+        if isinstance(data, blobs.BlobSelection):
+            return data.merged()
+        return iter(data)
+
+    def upsert(datapoint, vintage=None):
         """Inserts *datapoint* dictionary into the DB if not present, updates its value otherwise.
-           Datapoint's unique constraint on ("name", "freq", "date") columns guarantees
-           there might be only one row found, therefore it is safe to retrieve a single
-           datapoint using .first()
-        """
-        existing_datapoint = Datapoint.query \
-            .filter(Datapoint.freq == datapoint['freq']) \
-            .filter(Datapoint.name == datapoint['name']) \
-            .filter(Datapoint.date == datapoint['date']) \
-            .first()
-        if existing_datapoint:
-            existing_datapoint.value = datapoint['value']
+           Datapoint is looked up by its primary key (series_id, date),
+           there might be only one row found. Value written is marked
+           with *vintage*, see upsert_many().
+        """
+        series = SeriesOperations.get_or_create(datapoint['name'],
+                                                datapoint['freq'])
+        date = datapoint['date']
+        if isinstance(date, str):
+            date = to_date(date)
+        SeriesOperations.revise(series, date)
+        if uses_blobs():
+            added, _ = blobs.write(series, [date.toordinal()],
+                                   [datapoint['value']])
+            is_new = added > 0
+        else:
+            existing_datapoint = Datapoint.query.get((series.id, date))
+            if existing_datapoint:
+                if existing_datapoint.value != datapoint['value']:
+                    vintage_id = _vintage_id(vintage)
+                    if existing_datapoint.vintage_id != vintage_id:
+                        db.session.add(Revision(
+                            series_id=series.id,
+                            date=date,
+                            valid_from=existing_datapoint.vintage_id,
+                            valid_to=vintage_id,
+                            value=existing_datapoint.value))
+                    existing_datapoint.value = datapoint['value']
+                    existing_datapoint.vintage_id = vintage_id
+            else:
+                new_datapoint = Datapoint(series=series, **datapoint)
+                new_datapoint.vintage_id = _vintage_id(vintage)
+                db.session.add(new_datapoint)
+            is_new = existing_datapoint is None
+        SeriesOperations.register(series,
+                                  date=date,
+                                  value=datapoint['value'],
+                                  is_new=is_new)
+
+    @staticmethod
+    def _upsert_batch(datapoints: list, vintage):
+        """Upsert *datapoints* list, see upsert_many().
+           Returns numbers of datapoints inserted and changed and
+           dictionary with dates and values by (name, freq) key.
+        """
+        columns = {}
+        for d in datapoints:
+            date = d['date']
+            if isinstance(date, str):
+                date = to_date(date)
+            columns.setdefault((d['name'], d['freq']), {})[date] = d['value']
+        series = SeriesOperations.get_or_create_many(columns.keys())
+        inserted, changed = 0, 0
+        for key, values in columns.items():
+            dates = sorted(values)
+            SeriesOperations.revise(series[key], dates[0])
+            if uses_blobs():
+                added, updated = blobs.write(series[key],
+                                             [dt.toordinal() for dt in dates],
+                                             [values[dt] for dt in dates])
+                inserted += added
+                changed += updated
+                continue
+            for i in range(0, len(dates), CHUNK_SIZE):
+                chunk = [dict(series_id=series[key].id,
+                              date=dt,
+                              value=values[dt])
+                         for dt in dates[i:i + CHUNK_SIZE]]
+                added, updated = upsert_rows(chunk, vintage)
+                inserted += added
+                changed += updated
+        return inserted, changed, columns
+
+    def upsert_many(datapoints, vintage=None):
+        """Upsert *datapoints* dictionaries in chunks, one statement per
+           chunk instead of a query per datapoint. If same datapoint
+           appears several times in *datapoints*, the last one is used.
+           Does not commit.
+
+           Values written are marked with *vintage*, values replaced
+           are kept as revisions. If *vintage* is None, vintage of
+           current transaction is used, it is created on first value
+           inserted or changed (see VintageOperations.current()).
+
+           *datapoints* can be any iterable, eg a generator reading
+           upload stream, it is consumed UPSERT_BATCH_SIZE datapoints
+           at a time.
+
+           Returns:
+               (inserted, updated) counts, datapoints written with
+               value already stored are not counted
+        """
+        datapoints = iter(datapoints)
+        inserted, updated, keys = 0, 0, set()
+        while True:
+            batch = list(islice(datapoints, UPSERT_BATCH_SIZE))
+            if not batch:
+                break
+            added, changed, columns = DatapointOperations._upsert_batch(
+                batch, vintage)
+            inserted += added
+            updated += changed
+            keys.update(columns.keys())
+        SeriesOperations.refresh(keys)
+        return inserted, updated
+
+    def bulk_insert(datapoints):
+        """Insert *datapoints* dictionaries with datetime.date dates
+           in one go and rebuild catalog entries for affected series.
+
+           Faster than upsert(), but fails if any of datapoints
+           is already in the database.
+        """
+        keys = [(d['name'], d['freq']) for d in datapoints]
+        series = SeriesOperations.get_or_create_many(keys)
+        first_dates = {}
+        for d in datapoints:
+            key = d['name'], d['freq']
+            first_dates[key] = min(d['date'], first_dates.get(key, d['date']))
+        for key, date in first_dates.items():
+            SeriesOperations.revise(series[key], date)
+        if uses_blobs():
+            columns = {}
+            for d in datapoints:
+                dates, values = columns.setdefault((d['name'], d['freq']),
+                                                   ([], []))
+                dates.append(d['date'].toordinal())
+                values.append(d['value'])
+            for key, (dates, values) in columns.items():
+                blobs.write(series[key], dates, values)
         else:
-            db.session.add(Datapoint(**datapoint))
+            mappings = [dict(series_id=series[d['name'], d['freq']].id,
+                             date=d['date'],
+                             value=d['value']) for d in datapoints]
+            db.session.bulk_insert_mappings(Datapoint, mappings)
+        SeriesOperations.refresh(keys)
+
+    def delete(freq: str, name, start_date, end_date, vintage=None):
+        """Delete datapoints with specified arguments in one statement.
+           Arguments is the same as in *select_datapoints()*, *name* can
+           also be a list of names. Deleted values are kept as revisions
+           ending at *vintage*, see upsert_many().
 
-    def delete(freq: str, name: str, start_date, end_date):
-        """Delete datapoints with specified arguments.
-           Arguments is the same as in *select_datapoints()*.
+           Returns:
+               number of datapoints deleted
         """
-        query = DatapointOperations.select(freq, name, start_date, end_date)
-        # WONTFIX: may check length query.count() and raise error if nothing to
-        # delete
-        for item in query:
-            db.session.delete(item)
+        names = [name] if isinstance(name, str) else name
+        if uses_blobs():
+            count, keys = blobs.delete(freq, names, start_date, end_date)
+        else:
+            series = DatapointOperations._series_filter(
+                db.session.query(Series.id, Series.name, Series.freq),
+                freq, names).all()
+            keys = [(s.name, s.freq) for s in series]
+            series_ids = DatapointOperations._series_filter(
+                db.session.query(Series.id), freq, names)
+            query = Datapoint.query.filter(Datapoint.series_id.in_(series_ids))
+            query = DatapointOperations._date_filter(query,
+                                                     start_date, end_date)
+            count = query.count()
+            if count:
+                # keep deleted values as revisions, except values
+                # written in same vintage
+                vintage_id = _vintage_id(vintage)
+                archived = query.with_entities(
+                    Datapoint.series_id,
+                    Datapoint.date,
+                    literal(vintage_id),
+                    Datapoint.vintage_id,
+                    Datapoint.value) \
+                    .filter(Datapoint.vintage_id != vintage_id)
+                db.session.execute(Revision.__table__.insert().from_select(
+                    ['series_id', 'date', 'valid_to', 'valid_from', 'value'],
+                    archived.statement))
+                query.delete(synchronize_session=False)
+        # history is revised from first date deleted
+        for series in SeriesOperations._find_many(set(keys)).values():
+            if series.first_date is not None:
+                SeriesOperations.revise(series,
+                                        start_date or series.first_date)
+        SeriesOperations.refresh(keys)
+        db.session.commit()
+        return count
+
+
+def upsert_rows(rows, vintage=None):
+    """Upsert *rows* of one series into Datapoint table, mark them with
+       *vintage* and keep values replaced as revisions, see upsert_many().
+       Returns numbers of rows inserted and changed.
+    """
+    existing = db.session.query(Datapoint.date,
+                                Datapoint.value,
+                                Datapoint.vintage_id) \
+        .filter(Datapoint.series_id == rows[0]['series_id']) \
+        .filter(Datapoint.date.in_([row['date'] for row in rows]))
+    existing = {dt: (value, written) for dt, value, written in existing}
+    new_rows = [row for row in rows if row['date'] not in existing]
+    changed_rows = [row for row in rows if row['date'] in existing
+                    and existing[row['date']][0] != row['value']]
+    if not (new_rows or changed_rows):
+        return 0, 0
+    vintage_id = _vintage_id(vintage)
+    new_rows = [dict(row, vintage_id=vintage_id) for row in new_rows]
+    changed_rows = [dict(row, vintage_id=vintage_id) for row in changed_rows]
+    revisions = [dict(series_id=row['series_id'],
+                      date=row['date'],
+                      valid_from=existing[row['date']][1],
+                      valid_to=vintage_id,
+                      value=existing[row['date']][0])
+                 for row in changed_rows
+                 # value already written in this vintage is just replaced
+                 if existing[row['date']][1] != vintage_id]
+    db.session.bulk_insert_mappings(Revision, revisions)
+    db.session.bulk_insert_mappings(Datapoint, new_rows)
+    db.session.bulk_update_mappings(Datapoint, changed_rows)
+    return len(new_rows), len(changed_rows)
+
+
+def _vintage_id(vintage):
+    """Return id of *vintage*, of vintage of current transaction
+       if *vintage* is None."""
+    return (vintage or VintageOperations.current()).id
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _forget_vintage(session):
+    session.info.pop(VINTAGE, None)
+
+
+class VintageOperations:
+    def create():
+        vintage = Vintage()
+        db.session.add(vintage)
+        # need vintage.id for datapoints
+        db.session.flush()
+        return vintage
+
+    def current(create=True):
+        """Return vintage of current transaction, all writes made in
+           one transaction share it. Vintage is created on first call,
+           None is returned if there is none yet and *create* is False.
+        """
+        vintage = db.session.info.get(VINTAGE)
+        if vintage is None and create:
+            vintage = VintageOperations.create()
+            db.session.info[VINTAGE] = vintage
+        return vintage
+
+    def all():
+        return Vintage.query.order_by(Vintage.id).all()
+
+    def resolve(as_of):
+        """Return vintage id for *as_of*, which is either vintage id
+           or YYYY-MM-DD date. For a date, the last vintage uploaded
+           on or before that date is used, 0 if there is none.
+        """
+        if isinstance(as_of, int) or as_of.isdigit():
+            return int(as_of)
+        day_after = datetime.combine(to_date(as_of) + timedelta(days=1),
+                                     time())
+        vintage = Vintage.query \
+            .filter(Vintage.created_at < day_after) \
+            .order_by(Vintage.id.desc()) \
+            .first()
+        return vintage.id if vintage else 0
+
+
+class SeriesOperations:
+    """Series lookup and catalog kept consistent with Datapoint table."""
+
+    def get(name: str, freq: str):
+        return Series.query.filter_by(name=name, freq=freq).first()
+
+    def get_or_create(name: str, freq: str):
+        """Return Series for *name* and *freq*, create one if not found."""
+        series = SeriesOperations.get(name, freq)
+        if series is None:
+            series = Series(name, freq)
+            db.session.add(series)
+            # need series.id for datapoints
+            db.session.flush()
+        return series
+
+    @staticmethod
+    def _find_many(keys: set):
+        """Return dictionary of Series found for (name, freq) *keys*."""
+        names = sorted(set(name for name, _ in keys))
+        found = {}
+        # keep number of bound parameters under sqlite limit
+        for i in range(0, len(names), CHUNK_SIZE):
+            chunk = names[i:i + CHUNK_SIZE]
+            for series in Series.query.filter(Series.name.in_(chunk)):
+                key = series.name, series.freq
+                if key in keys:
+                    found[key] = series
+        return found
+
+    def get_or_create_many(keys):
+        """Return dictionary of Series for (name, freq) *keys*,
+           creates series not found.
+        """
+        keys = set(keys)
+        found = SeriesOperations._find_many(keys)
+        for name, freq in keys - set(found):
+            found[name, freq] = series = Series(name, freq)
+            db.session.add(series)
+        db.session.flush()
+        return found
+
+    def revise(series, date):
+        """Account for a write to *series* at *date* or later dates.
+           Write at or before last date of series revises its history,
+           earliest date revised is kept as Series.revised_from.
+        """
+        if isinstance(date, str):
+            date = to_date(date)
+        if series.last_date is not None and date <= series.last_date and \
+                (series.revised_from is None or date < series.revised_from):
+            series.revised_from = date
+
+    def register(series, date, value, is_new: bool):
+        """Account for a single datapoint written to *series*.
+           Does not query Datapoint table.
+        """
+        if series.first_date is None or date < series.first_date:
+            series.first_date = date
+        if series.last_date is None or date >= series.last_date:
+            series.last_date = date
+            series.last_value = value
+        if is_new:
+            series.count += 1
+        series.updated_at = datetime.utcnow()
+        series.version += 1
+        changes.mark_changed([(series.name, series.freq)])
+
+    @staticmethod
+    def _stats(series_ids):
+        if uses_blobs():
+            return blobs.stats(series_ids)
+        return SeriesOperations._datapoint_stats(series_ids)
+
+    @staticmethod
+    def _datapoint_stats(series_ids):
+        """Return query with (series_id, first_date, last_date, count, value)
+           rows for series with *series_ids*, or for all series if
+           *series_ids* is None.
+        """
+        stats = db.session.query(
+            Datapoint.series_id.label('series_id'),
+            func.min(Datapoint.date).label('first_date'),
+            func.max(Datapoint.date).label('last_date'),
+            func.count().label('count'))
+        if series_ids is not None:
+            stats = stats.filter(Datapoint.series_id.in_(series_ids))
+        stats = stats.group_by(Datapoint.series_id).subquery()
+        return db.session.query(stats, Datapoint.value) \
+            .join(Datapoint, and_(Datapoint.series_id == stats.c.series_id,
+                                  Datapoint.date == stats.c.last_date))
+
+    def refresh(keys):
+        """Recalculate catalog entries for (name, freq) *keys* from
+           Datapoint table. Series with no datapoints are kept with zero
+           count, their revisions refer to them. Pass *keys* as None
+           to recalculate whole catalog.
+        """
+        if keys is None:
+            catalog = {s.id: s for s in Series.query}
+            rows = list(SeriesOperations._stats(None))
+        else:
+            found = SeriesOperations._find_many(set(keys))
+            catalog = {s.id: s for s in found.values()}
+            ids = sorted(catalog)
+            rows = []
+            for i in range(0, len(ids), CHUNK_SIZE):
+                chunk = ids[i:i + CHUNK_SIZE]
+                rows.extend(SeriesOperations._stats(chunk))
+        now = datetime.utcnow()
+        for row in rows:
+            series = catalog.pop(row.series_id)
+            series.first_date = row.first_date
+            series.last_date = row.last_date
+            series.count = row.count
+            series.last_value = row.value
+            series.updated_at = now
+            series.version += 1
+        # series left in catalog have no datapoints anymore
+        for series in catalog.values():
+            if series.count == 0 and series.first_date is None:
+                continue
+            series.first_date = series.last_date = None
+            series.count = 0
+            series.last_value = None
+            series.updated_at = now
+            series.version += 1
+        changes.mark_changed(keys)
+
+    def rebuild():
+        """Recalculate whole catalog, eg after direct writes to Datapoint."""
+        SeriesOperations.refresh(None)
         db.session.commit()
 
 
 class All:
     def frequencies():
-        return select_unique_frequencies()
+        return list(registry.current().frequencies())
 
     def names():
-        return name_values(freq=None)
+        snapshot = registry.current().get()
+        return sorted(set().union(*snapshot.names.values()))
 
 
 class Allowed(object):
@@ -96,7 +623,7 @@ class Allowed(object):
         return select_unique_frequencies(name)
 
     def names(freq):
-        return name_values(freq)
+        return sorted(registry.current().names(freq))
 
 
 def select_unique_frequencies(name=None):
@@ -104,15 +631,7 @@ def select_unique_frequencies(name=None):
        Returns:
            list of strings, likely a subset of ['a', 'q', 'm', 'w', 'd'].
     """
-    query = Datapoint.query
-    if name:
-        query = query.filter_by(name=name)
-    query = query.group_by(Datapoint.freq) \
-                 .order_by(Datapoint.freq) \
-                 .values(Datapoint.freq)
-    # the query result will be undefined without .values(...)
-    # it passes on sqlite, but fails on postgres
-    return [row.freq for row in query]
+    return reads.frequencies(name)
 
 
 def name_values(freq=None):
@@ -122,15 +641,7 @@ def name_values(freq=None):
        Returns:
            list of strings
     """
-    query = Datapoint.query
-    if freq:
-        query = query.filter_by(freq=freq)
-    query = query.group_by(Datapoint.name) \
-                 .order_by(Datapoint.name) \
-                 .values(Datapoint.name)
-    # the query result will be undefined without .values(...)
-    # it passes on sqlite, but fails on postgres
-    return [row.name for row in query]
+    return reads.names(freq)
 
 
 class DateRange:
@@ -149,17 +660,32 @@ class DateRange:
         return self.get_boundary(direction='end')
 
 
+def series_summary(name, freq):
+    """Return (first date, last date, last value) for series,
+       None if series is not found."""
+    if replica.enabled():
+        return replica.current().summary(name, freq)
+    row = reads.summary(name, freq)
+    return row and tuple(row)
+
+
+def series_not_found(name, freq):
+    """Return error for series *name* at *freq* not in the catalog."""
+    return CustomError400(f'Variable <{name}> not found '
+                          f'at frequency <{freq}>')
+
+
 def get_boundary_date(freq, name, direction):
     """Get first or last date for timeseries  *freq*, *name*.
        Returns:
-           SQLA own date object (?)
+           YYYY-MM-DD string
     """
-    sorter = dict(start=Datapoint.date,
-                  end=Datapoint.date.desc())[direction]
-    dt = Datapoint.query.filter_by(freq=freq, name=name) \
-        .order_by(sorter) \
-        .first()
-    return date_as_str(dt.date)
+    summary = series_summary(name, freq)
+    if summary is None:
+        raise series_not_found(name, freq)
+    first_date, last_date, _ = summary
+    dt = dict(start=first_date, end=last_date)[direction]
+    return date_as_str(dt)
 
 
 class DescriptionOperations:
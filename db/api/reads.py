@@ -0,0 +1,278 @@
+"""Read path on SQLAlchemy Core, without ORM.
+
+   Read endpoints need only (name, freq, date, value) tuples, so
+   datapoints and catalog are read with Core statements instead of
+   Query objects: no Datapoint or Series objects are made and nothing
+   is put into identity map of the session.
+
+   Statements are built once for each shape of query (which of freq,
+   names, start_date and end_date are given) with bound parameters and
+   executed with a compiled cache, so SQL is not compiled again on
+   every request. Compiled cache is bounded and kept by app, so every
+   engine has its own.
+
+   Statements run on connection of current session and see writes of
+   current transaction. Core statements do not autoflush; a session
+   with pending writes is flushed before a read, read-only requests
+   have nothing to flush.
+"""
+from datetime import date
+
+from flask import current_app
+from sqlalchemy import (Integer, bindparam, case, select, tuple_,
+                        type_coerce)
+from sqlalchemy.util import LRUCache
+
+from db import db
+from db.api.models import Datapoint, Point, Series
+
+_datapoint = Datapoint.__table__
+_series = Series.__table__
+
+# statements by shape, see _statement()
+_statements = {}
+# compiled statements kept by compiled_cache()
+COMPILED_CACHE_SIZE = 100
+
+
+class Selection:
+    """Point tuples read by points(), with count() and first()
+       like Query object."""
+
+    def __init__(self, points: list):
+        self.points = points
+
+    def __iter__(self):
+        return iter(self.points)
+
+    def __len__(self):
+        return len(self.points)
+
+    def count(self):
+        return len(self.points)
+
+    def first(self):
+        return self.points[0] if self.points else None
+
+
+def compiled_cache():
+    """Return cache of compiled SQL by statement of current app."""
+    cache = current_app.extensions.get('compiled_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            'compiled_cache', LRUCache(COMPILED_CACHE_SIZE))
+    return cache
+
+
+def connection():
+    """Return connection of current session with compiled cache."""
+    session = db.session()
+    # only writes of current transaction are flushed
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    return session.connection().execution_options(
+        compiled_cache=compiled_cache())
+
+
+def _datapoint_columns(kind):
+    if kind == 'points':
+        return [_series.c.name, _series.c.freq,
+                _datapoint.c.date, _datapoint.c.value]
+    # raw day number, not datetime.date
+    return [_series.c.name,
+            type_coerce(_datapoint.c.date, Integer),
+            _datapoint.c.value]
+
+
+def _build(kind, freq, names, start_date, end_date):
+    stmt = select(_datapoint_columns(kind)).select_from(
+        _datapoint.join(_series, _datapoint.c.series_id == _series.c.id))
+    if freq:
+        stmt = stmt.where(_series.c.freq == bindparam('freq'))
+    if names:
+        stmt = stmt.where(_series.c.name.in_(
+            bindparam('names', expanding=True)))
+    if start_date:
+        stmt = stmt.where(_datapoint.c.date >= bindparam('start_date'))
+    if end_date:
+        stmt = stmt.where(_datapoint.c.date <= bindparam('end_date'))
+    if kind == 'points':
+        stmt = stmt.order_by(_datapoint.c.date)
+    return stmt
+
+
+def _statement(kind, freq, names, start_date, end_date):
+    """Return statement and its parameters for datapoints query."""
+    params = dict(freq=freq, names=list(names or []),
+                  start_date=start_date, end_date=end_date)
+    shape = (kind,) + tuple(bool(params[key]) for key in
+                            ('freq', 'names', 'start_date', 'end_date'))
+    stmt = _statements.get(shape)
+    if stmt is None:
+        stmt = _statements.setdefault(shape, _build(*shape))
+    return stmt, {key: value for key, value in params.items() if value}
+
+
+def points(freq: str, names: list, start_date, end_date):
+    """Return Selection of Point tuples ordered by date."""
+    stmt, params = _statement('points', freq, names, start_date, end_date)
+    rows = connection().execute(stmt, params)
+    return Selection([Point._make(row) for row in rows])
+
+
+def stream(freq: str, names: list, start_date, end_date, batch_size: int):
+    """Return iterator of Point tuples ordered by date, fetched
+       *batch_size* rows at a time from server-side cursor where
+       database supports it. Statement is executed and first batch
+       fetched by this call, so database errors are raised here
+       rather than while iterating."""
+    stmt, params = _statement('points', freq, names, start_date, end_date)
+    result = connection().execution_options(stream_results=True) \
+        .execute(stmt, params)
+    try:
+        rows = result.fetchmany(batch_size)
+    except Exception:
+        result.close()
+        raise
+    return _iterate(result, rows, batch_size)
+
+
+def _iterate(result, rows, batch_size: int):
+    try:
+        while rows:
+            for row in rows:
+                yield Point._make(row)
+            rows = result.fetchmany(batch_size)
+    finally:
+        result.close()
+
+
+def columns(freq: str, names: list, start_date, end_date):
+    """Return unordered (name, day number, value) tuples."""
+    stmt, params = _statement('columns', freq, names, start_date, end_date)
+    return connection().execute(stmt, params).fetchall()
+
+
+# datapoints of several (name, freq) series, see key_points()
+_keys_in = tuple_(_series.c.name, _series.c.freq) \
+    .in_(bindparam('keys', expanding=True))
+_key_points = select(_datapoint_columns('points')).select_from(
+    _datapoint.join(_series, _datapoint.c.series_id == _series.c.id)) \
+    .where(_keys_in) \
+    .order_by(_datapoint.c.date)
+_key_points_between = _key_points \
+    .where(_datapoint.c.date >= bindparam('start_date')) \
+    .where(_datapoint.c.date <= bindparam('end_date'))
+
+
+def key_points(keys: list, start_date=None, end_date=None):
+    """Return Selection of Point tuples ordered by date for series
+       *keys*, list of (name, freq) tuples, in one query."""
+    if not keys:
+        return Selection([])
+    params = dict(keys=list(keys))
+    stmt = _key_points
+    if start_date or end_date:
+        stmt = _key_points_between
+        params.update(start_date=start_date or date.min,
+                      end_date=end_date or date.max)
+    rows = connection().execute(stmt, params)
+    return Selection([Point._make(row) for row in rows])
+
+
+# series with all datapoints deleted are kept in catalog with zero
+# count for their revisions, they are listed only by known_names()
+_stored = _series.c.count > 0
+_frequencies = select([_series.c.freq]).distinct() \
+    .where(_stored) \
+    .order_by(_series.c.freq)
+_frequencies_of_name = _frequencies.where(_series.c.name == bindparam('name'))
+_names = select([_series.c.name]).distinct() \
+    .where(_stored) \
+    .order_by(_series.c.name)
+_names_of_freq = _names.where(_series.c.freq == bindparam('freq'))
+_known_names_of_freq = select([_series.c.name]) \
+    .where(_series.c.freq == bindparam('freq')) \
+    .order_by(_series.c.name)
+_keys = select([_series.c.name, _series.c.freq]).where(_stored)
+_summary = select([_series.c.first_date,
+                   _series.c.last_date,
+                   _series.c.last_value]) \
+    .where(_stored) \
+    .where(_series.c.name == bindparam('name')) \
+    .where(_series.c.freq == bindparam('freq'))
+# datapoints before this date were not revised and are not expected
+# to change, see etags.cache_control()
+_stable_before = case(
+    [(_series.c.revised_from < _series.c.last_date,
+      _series.c.revised_from)],
+    else_=_series.c.last_date).label('stable_before')
+_versions = select([_series.c.name,
+                    _series.c.version,
+                    _stable_before]) \
+    .where(_series.c.freq == bindparam('freq')) \
+    .where(_series.c.name.in_(bindparam('names', expanding=True))) \
+    .order_by(_series.c.name)
+_key_versions = select([_series.c.name,
+                        _series.c.freq,
+                        _series.c.version,
+                        _stable_before]) \
+    .where(_keys_in) \
+    .order_by(_series.c.freq, _series.c.name)
+
+
+def frequencies(name: str = None):
+    """Return sorted list of frequencies, of series *name* if given."""
+    if name:
+        rows = connection().execute(_frequencies_of_name, dict(name=name))
+    else:
+        rows = connection().execute(_frequencies)
+    return [freq for freq, in rows]
+
+
+def names(freq: str = None):
+    """Return sorted list of names, of frequency *freq* if given."""
+    if freq:
+        rows = connection().execute(_names_of_freq, dict(freq=freq))
+    else:
+        rows = connection().execute(_names)
+    return [name for name, in rows]
+
+
+def known_names(freq: str):
+    """Return sorted list of names of frequency *freq*, including
+       series with all datapoints deleted, which may be read as of
+       an earlier vintage."""
+    rows = connection().execute(_known_names_of_freq, dict(freq=freq))
+    return [name for name, in rows]
+
+
+def keys():
+    """Return (name, freq) tuples for all series."""
+    return connection().execute(_keys).fetchall()
+
+
+def summary(name: str, freq: str):
+    """Return (first date, last date, last value) row of catalog
+       or None if series not found."""
+    return connection().execute(_summary,
+                                dict(name=name, freq=freq)).first()
+
+
+def versions(freq: str, names: list):
+    """Return (name, version, stable_before) rows for *names* ordered
+       by name. *stable_before* is last date of series or earliest date
+       revised by a write, whichever is earlier."""
+    if not names:
+        return []
+    return connection().execute(_versions,
+                                dict(freq=freq, names=list(names))).fetchall()
+
+
+def key_versions(keys: list):
+    """Return (name, freq, version, stable_before) rows for series *keys*,
+       list of (name, freq) tuples, ordered by freq and name."""
+    if not keys:
+        return []
+    return connection().execute(_key_versions,
+                                dict(keys=list(keys))).fetchall()
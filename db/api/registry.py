@@ -0,0 +1,84 @@
+"""In-memory registry of frequencies and variable names.
+
+   Request validation checks every frequency and name it gets, the
+   registry answers these checks from memory instead of querying
+   Series table on every request.
+
+   Registry is read from Series table on first use and read again
+   after commit of a write that changes series (see changes.py), each
+   reload increments version. Writes made by other processes are seen
+   after REGISTRY_MAX_AGE seconds.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+
+from db.api import changes, reads
+
+DEFAULT_MAX_AGE = 60
+
+Snapshot = namedtuple('Snapshot', 'version loaded_at frequencies names')
+
+
+def current():
+    """Return Registry of current app."""
+    return current_app.extensions.setdefault('registry', Registry())
+
+
+@changes.on_commit
+def _invalidate(keys):
+    registry = current_app.extensions.get('registry')
+    if registry is not None:
+        registry.invalidate()
+
+
+def _load(version):
+    names = {}
+    for name, freq in reads.keys():
+        names.setdefault(freq, set()).add(name)
+    return Snapshot(version=version,
+                    loaded_at=time.monotonic(),
+                    frequencies=sorted(names),
+                    names={freq: frozenset(found)
+                           for freq, found in names.items()})
+
+
+class Registry:
+    """Holds Snapshot of frequencies and sets of names by frequency."""
+
+    def __init__(self):
+        self.snapshot = None
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def _is_fresh(self, snapshot):
+        max_age = current_app.config.get('REGISTRY_MAX_AGE', DEFAULT_MAX_AGE)
+        return snapshot is not None and \
+            snapshot.version == self.version and \
+            time.monotonic() - snapshot.loaded_at < max_age
+
+    def get(self):
+        """Return current Snapshot, reading it if needed."""
+        snapshot = self.snapshot
+        if not self._is_fresh(snapshot):
+            with self.lock:
+                if not self._is_fresh(self.snapshot):
+                    self.snapshot = _load(self.version)
+                snapshot = self.snapshot
+        return snapshot
+
+    def invalidate(self):
+        with self.lock:
+            self.version += 1
+
+    def frequencies(self):
+        return self.get().frequencies
+
+    def names(self, freq: str):
+        """Return set of names for *freq*."""
+        return self.get().names.get(freq, frozenset())
+
+    def has(self, name: str, freq: str):
+        return name in self.names(freq)
@@ -0,0 +1,172 @@
+"""In-memory read replica of datapoints.
+
+   All series are loaded into per-series numpy arrays of day numbers
+   and values (see blobs.SeriesArrays) on first read. Reads slice the
+   arrays by binary search and make no database queries.
+
+   Snapshot of arrays is never changed in place. Series changed by a
+   write are reloaded after commit (see changes.py) into a copy of
+   snapshot, which then replaces the old one in a single assignment.
+   Readers see either data before upload or after it, never a part of
+   it. Rolled back writes are not reloaded.
+
+   Each process keeps its own replica and only sees writes made through
+   it, so enable it for a single process deployment or when writes go
+   to all processes.
+
+   Enabled by READ_REPLICA = True in config.
+"""
+import threading
+from datetime import date
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, type_coerce
+
+from db import db
+from db.api import changes
+from db.api.blobs import BlobSelection, SeriesArrays, decode, to_ordinal
+from db.api.models import Datapoint, Series, SeriesBlob
+
+
+def enabled():
+    return bool(current_app.config.get('READ_REPLICA'))
+
+
+def current():
+    """Return Replica of current app."""
+    return current_app.extensions.setdefault('replica', Replica())
+
+
+@changes.on_commit
+def _update(keys):
+    if enabled():
+        current().update(keys)
+
+
+def _split(series_ids, dates, values):
+    """Split columns ordered by series id into arrays by series id."""
+    starts = np.flatnonzero(np.diff(series_ids)) + 1
+    bounds = zip(np.concatenate([[0], starts]).tolist(),
+                 np.concatenate([starts, [len(series_ids)]]).tolist())
+    return {int(series_ids[i]): (dates[i:j], values[i:j]) for i, j in bounds}
+
+
+def _read_datapoints(connection, ids):
+    table = Datapoint.__table__
+    query = select([table.c.series_id,
+                    # raw day number, not datetime.date
+                    type_coerce(table.c.date, db.Integer),
+                    table.c.value]) \
+        .order_by(table.c.series_id, table.c.date)
+    if ids is not None:
+        query = query.where(table.c.series_id.in_(ids))
+    rows = connection.execute(query).fetchall()
+    if not rows:
+        return {}
+    series_ids, dates, values = zip(*rows)
+    return _split(np.array(series_ids, dtype='int64'),
+                  np.array(dates, dtype='int64'),
+                  np.array(values, dtype='float64'))
+
+
+def _read_blobs(connection, ids):
+    table = SeriesBlob.__table__
+    query = select([table]).order_by(table.c.series_id, table.c.year)
+    if ids is not None:
+        query = query.where(table.c.series_id.in_(ids))
+    found = {}
+    for row in connection.execute(query):
+        # row.values is a method of result row, not a column
+        blob = SeriesBlob(**dict(row))
+        found.setdefault(blob.series_id, []).append(decode(blob))
+    return {series_id: (np.concatenate([p[0] for p in pairs]),
+                        np.concatenate([p[1] for p in pairs]))
+            for series_id, pairs in found.items()}
+
+
+def read_series(keys=None):
+    """Return dictionary of SeriesArrays by (name, freq) for *keys*,
+       for all series if *keys* is None.
+
+       Uses own connection, so that it can be called after commit.
+    """
+    with db.engine.connect() as connection:
+        series = connection.execute(select([Series.__table__])).fetchall()
+        if keys is not None:
+            series = [s for s in series if (s.name, s.freq) in keys]
+        ids = None if keys is None else [s.id for s in series]
+        if current_app.config.get('STORAGE_ENGINE') == 'blob':
+            columns = _read_blobs(connection, ids)
+        else:
+            columns = _read_datapoints(connection, ids)
+    return {(s.name, s.freq): SeriesArrays(s.name, s.freq, *columns[s.id])
+            for s in series if s.id in columns}
+
+
+def _slice(arrays, start_date, end_date):
+    i, j = 0, len(arrays.dates)
+    if start_date:
+        i = np.searchsorted(arrays.dates, to_ordinal(start_date), 'left')
+    if end_date:
+        j = np.searchsorted(arrays.dates, to_ordinal(end_date), 'right')
+    return arrays._replace(dates=arrays.dates[i:j],
+                           values=arrays.values[i:j])
+
+
+class Replica:
+    """Holds snapshot, a dictionary of SeriesArrays by (name, freq)."""
+
+    def __init__(self):
+        self.snapshot = None
+        # serializes loads and updates, readers do not wait for it
+        self.lock = threading.Lock()
+
+    def arrays(self):
+        """Return current snapshot, loading it on first call."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            with self.lock:
+                if self.snapshot is None:
+                    self.snapshot = read_series()
+                snapshot = self.snapshot
+        return snapshot
+
+    def update(self, keys):
+        """Reload series with (name, freq) *keys*, all if *keys* is None."""
+        with self.lock:
+            if self.snapshot is None:
+                # not loaded yet, will be read in full on first use
+                return
+            if keys is None:
+                self.snapshot = read_series()
+                return
+            changed = read_series(keys)
+            snapshot = dict(self.snapshot)
+            for key in keys:
+                if key in changed:
+                    snapshot[key] = changed[key]
+                else:
+                    snapshot.pop(key, None)
+            self.snapshot = snapshot
+
+    def select(self, freq: str, names: list, start_date, end_date):
+        """Return BlobSelection, arguments are same as for
+           DatapointOperations.select_frame()."""
+        snapshot = self.arrays()
+        names = set(names) if names else None
+        keys = sorted(key for key in snapshot
+                      if (not freq or key[1] == freq)
+                      and (names is None or key[0] in names))
+        return BlobSelection([_slice(snapshot[key], start_date, end_date)
+                              for key in keys])
+
+    def summary(self, name: str, freq: str):
+        """Return (first date, last date, last value) of series,
+           None if series is not found."""
+        arrays = self.arrays().get((name, freq))
+        if arrays is None or not len(arrays.dates):
+            return None
+        return (date.fromordinal(int(arrays.dates[0])),
+                date.fromordinal(int(arrays.dates[-1])),
+                float(arrays.values[-1]))
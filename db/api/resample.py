@@ -0,0 +1,177 @@
+"""Series of lower frequency derived from stored series.
+
+   A series not stored at frequency asked for is made from the same
+   name at the highest stored frequency, eg monthly BRENT from daily
+   BRENT. Datapoints are grouped by period (week ending Sunday, month,
+   quarter, year) and each period gives one value dated by its last
+   day, like stored series:
+
+       eop - last value in period
+       avg - average
+       sum - sum
+       min, max - lowest and highest value
+
+   Grouping is done with numpy on sorted day numbers, no loop over
+   datapoints. Last period may be incomplete, use end_date to drop it.
+
+   Whole derived series is kept in memory by name, frequencies, method
+   and version of source series (Series.version), so it is made again
+   only after source series changes. Series made from a source series
+   are also dropped when a write to it is committed. Same cache keeps
+   series made by transform.py, keys of both start with (name, freq)
+   of source series.
+"""
+from datetime import date, datetime
+
+import numpy as np
+from flask import current_app
+
+import db.api.reads as reads
+import db.api.registry as registry
+from db.api import changes
+from db.api.blobs import EPOCH_ORDINAL
+from db.api.cache import LRUCache
+from db.api.models import Point
+from db.api.queries import DatapointOperations
+
+AGGREGATORS = ('eop', 'avg', 'sum', 'min', 'max')
+# highest frequency first
+FREQUENCIES = ('d', 'w', 'm', 'q', 'a')
+# months in period
+MONTHS = {'m': 1, 'q': 3, 'a': 12}
+# number of derived series kept in memory
+DEFAULT_CACHE_SIZE = 128
+
+
+def period_ends(days, freq: str):
+    """Return day numbers of last day of *freq* period for each of day
+       numbers *days*."""
+    days = np.asarray(days, dtype='int64')
+    if freq == 'd':
+        return days
+    if freq == 'w':
+        # day number 1 is a Monday
+        return days + 6 - (days - 1) % 7
+    months = (days - EPOCH_ORDINAL).astype('datetime64[D]') \
+        .astype('datetime64[M]').astype('int64')
+    # months are counted from January 1970, start of a year
+    step = MONTHS[freq]
+    next_start = ((months // step + 1) * step).astype('datetime64[M]')
+    return next_start.astype('datetime64[D]').astype('int64') \
+        - 1 + EPOCH_ORDINAL
+
+
+def resample(days, values, freq: str, how: str):
+    """Return day numbers and values of *freq* series made from day
+       numbers *days* and *values* with aggregator *how*."""
+    days = np.asarray(days, dtype='int64')
+    values = np.asarray(values, dtype='float64')
+    if not len(days):
+        return days, values
+    order = np.argsort(days, kind='mergesort')
+    days, values = days[order], values[order]
+    ends = period_ends(days, freq)
+    starts = np.flatnonzero(np.r_[True, ends[1:] != ends[:-1]])
+    stops = np.r_[starts[1:], len(days)]
+    if how == 'eop':
+        result = values[stops - 1]
+    elif how == 'avg':
+        result = np.add.reduceat(values, starts) / (stops - starts)
+    elif how == 'sum':
+        result = np.add.reduceat(values, starts)
+    elif how == 'min':
+        result = np.minimum.reduceat(values, starts)
+    elif how == 'max':
+        result = np.maximum.reduceat(values, starts)
+    else:
+        raise ValueError(f'Unknown aggregator {how}')
+    return ends[starts], result
+
+
+def source_frequency(name: str, freq: str):
+    """Return highest stored frequency of *name* above *freq*, None if
+       *name* cannot be resampled to *freq*."""
+    if freq not in FREQUENCIES:
+        return None
+    catalog = registry.current()
+    for source in FREQUENCIES[:FREQUENCIES.index(freq)]:
+        if catalog.has(name, source):
+            return source
+    return None
+
+
+def current_cache():
+    """Return cache of derived series of current app."""
+    cache = current_app.extensions.get('resample_cache')
+    if cache is None:
+        size = current_app.config.get('RESAMPLE_CACHE_SIZE',
+                                      DEFAULT_CACHE_SIZE)
+        cache = current_app.extensions.setdefault('resample_cache',
+                                                  LRUCache(size))
+    return cache
+
+
+@changes.on_commit
+def _invalidate(keys):
+    cache = current_app.extensions.get('resample_cache')
+    if cache is not None:
+        cache.drop(lambda key: keys is None or key[0] in keys)
+
+
+def _day(dt):
+    if isinstance(dt, str):
+        dt = datetime.strptime(dt, "%Y-%m-%d").date()
+    return dt.toordinal()
+
+
+def _derive(name, source, freq, how, as_of):
+    _, _, days, values = DatapointOperations.select_columns(
+        source, [name], None, None, as_of)
+    return resample(days, values, freq, how)
+
+
+def series(name: str, freq: str, how: str, as_of=None):
+    """Return day numbers and values of *name* resampled to *freq*."""
+    source = source_frequency(name, freq)
+    if as_of:
+        return _derive(name, source, freq, how, as_of)
+    versions = reads.versions(source, [name])
+    version = versions[0][1] if versions else None
+    return current_cache().get(
+        ((name, source), freq, how, version),
+        lambda: _derive(name, source, freq, how, None))
+
+
+def between(days, values, start_date=None, end_date=None):
+    """Return *days* and *values* with days between *start_date* and
+       *end_date*, dates or YYYY-MM-DD strings."""
+    keep = np.ones(len(days), dtype=bool)
+    if start_date:
+        keep &= days >= _day(start_date)
+    if end_date:
+        keep &= days <= _day(end_date)
+    return days[keep], values[keep]
+
+
+def to_points(freq: str, columns):
+    """Return Point tuples for *columns* of one series ordered by date."""
+    (name,), _, days, values = columns
+    return [Point(name, freq, date.fromordinal(day), value)
+            for day, value in zip(days.tolist(), values.tolist())]
+
+
+def select_columns(name: str, freq: str, how: str, start_date=None,
+                   end_date=None, as_of=None):
+    """Return columns like DatapointOperations.select_columns() for
+       *name* resampled to *freq*, periods ending between *start_date*
+       and *end_date*."""
+    days, values = between(*series(name, freq, how, as_of),
+                           start_date, end_date)
+    return [name], np.zeros(len(days), dtype='int64'), days, values
+
+
+def points(name: str, freq: str, how: str, start_date=None,
+           end_date=None, as_of=None):
+    """Return Point tuples ordered by date, see select_columns()."""
+    return to_points(freq, select_columns(name, freq, how, start_date,
+                                          end_date, as_of))
@@ -0,0 +1,130 @@
+"""Sparklines drawn without matplotlib.
+
+   Series is scaled to image pixels with numpy: x axis spans time range
+   of spline parameters (see image.spline_params()), y axis spans
+   values. SVG is a single polyline. PNG is rasterised by sampling
+   every line segment at pixel steps and written with zlib.
+
+   Output looks like image.create_png_from_dict() with axis off.
+"""
+import struct
+import zlib
+
+import numpy as np
+
+from db.api.image import get_data_for_spline, spline_params
+
+MIMETYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+# pixels between line and image border
+PAD = 2
+LINE_WIDTH = 1.5
+NAMED_COLORS = {'white': '#FFFFFF', 'black': '#000000'}
+
+
+def scale(data, params):
+    """Return x and y pixel coordinates of *data* dictionary points
+       and image width and height in pixels."""
+    width, height = pixel_size(params)
+    x = np.array([dt.toordinal() for dt in data['x']], dtype='float64')
+    y = np.array(data['y'], dtype='float64')
+    start, end = (dt.toordinal() for dt in params['timerange'])
+    if start >= end:
+        start, end = (x.min(), x.max()) if len(x) else (0, 1)
+    x_span = max(end - start, 1)
+    y_low, y_high = (y.min(), y.max()) if len(y) else (0, 1)
+    y_span = y_high - y_low or 1
+    px = PAD + (x - start) / x_span * (width - 2 * PAD - 1)
+    py = PAD + (y_high - y) / y_span * (height - 2 * PAD - 1)
+    if y_high == y_low:
+        py[:] = height / 2
+    return px, py, width, height
+
+
+def make_svg(data, params):
+    """Return svg image of *data* dictionary, see image.make_png()."""
+    px, py, width, height = scale(data, params)
+    points = ' '.join(f'{x:.1f},{y:.1f}' for x, y in zip(px.tolist(),
+                                                          py.tolist()))
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" '
+            f'width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}">'
+            f'<rect width="100%" height="100%" fill="{params["facecolor"]}"/>'
+            f'<polyline fill="none" stroke="{params["color"]}" '
+            f'stroke-width="{LINE_WIDTH}" points="{points}"/>'
+            '</svg>').encode('utf-8')
+
+
+def _segments(px, py):
+    """Return pixel columns and rows along lines between points."""
+    if len(px) == 1:
+        return px.round().astype('int64'), py.round().astype('int64')
+    dx, dy = np.diff(px), np.diff(py)
+    steps = np.ceil(np.maximum(np.abs(dx), np.abs(dy))).astype('int64') + 1
+    segment = np.repeat(np.arange(len(dx)), steps)
+    first = np.cumsum(steps) - steps
+    t = (np.arange(steps.sum()) - first[segment]) / \
+        np.maximum(steps - 1, 1)[segment]
+    columns = px[segment] + dx[segment] * t
+    rows = py[segment] + dy[segment] * t
+    return columns.round().astype('int64'), rows.round().astype('int64')
+
+
+def _rgb(color):
+    color = NAMED_COLORS.get(color, color).lstrip('#')
+    return [int(color[i:i + 2], 16) for i in (0, 2, 4)]
+
+
+def _chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + \
+        struct.pack('>I', zlib.crc32(kind + data))
+
+
+def encode_png(pixels):
+    """Return PNG image of *pixels* array of (height, width, 3) bytes."""
+    height, width, _ = pixels.shape
+    # filter type 0 before every row
+    rows = np.concatenate([np.zeros((height, 1), dtype='uint8'),
+                           pixels.reshape(height, width * 3)], axis=1)
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + \
+        _chunk(b'IHDR', header) + \
+        _chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)) + \
+        _chunk(b'IEND', b'')
+
+
+def draw(pixels, data, params):
+    """Draw *data* dictionary on *pixels* array of (height, width, 3)
+       bytes, size of array must match *params*."""
+    px, py, width, height = scale(data, params)
+    pixels[:, :] = _rgb(params['facecolor'])
+    if len(px):
+        columns, rows = _segments(px, py)
+        # line is two pixels thick
+        columns = np.concatenate([columns, columns])
+        rows = np.concatenate([rows, rows + 1])
+        inside = (columns >= 0) & (columns < width) & \
+            (rows >= 0) & (rows < height)
+        pixels[rows[inside], columns[inside]] = _rgb(params['color'])
+
+
+def pixel_size(params):
+    """Return width and height of image in pixels."""
+    return tuple(round(side * params['dpi']) for side in params['figsize'])
+
+
+def make_png(data, params):
+    """Return png image of *data* dictionary, see image.make_png()."""
+    width, height = pixel_size(params)
+    pixels = np.empty((height, width, 3), dtype='uint8')
+    draw(pixels, data, params)
+    return encode_png(pixels)
+
+
+def render(fmt: str, query_data, **options):
+    """Return *fmt* image of *query_data*, *options* are arguments of
+       image.spline_params()."""
+    data = get_data_for_spline(query_data)
+    params = spline_params(**options)
+    if fmt == 'svg':
+        return make_svg(data, params)
+    return make_png(data, params)
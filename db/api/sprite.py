@@ -0,0 +1,77 @@
+"""Sprite sheets: sparklines of many series in one response.
+
+   Series are given as (name, freq) keys. Datapoints of all series are
+   read together (DatapointOperations.select_keys()) and drawn without
+   matplotlib (see sparkline.py), every image of same size.
+
+   PNG sprite stacks images top to bottom in order of keys, image of
+   key number i is at x=0, y=i*height. JSON bundle has this offset map
+   and svg image of every series:
+
+       {"width": 200, "height": 60,
+        "images": {"GDP_yoy:q": {"x": 0, "y": 0, "svg": "<svg ..."}}}
+"""
+import json
+
+import numpy as np
+
+from db.api.image import spline_params
+from db.api.queries import DatapointOperations
+from db.api.sparkline import draw, encode_png, make_svg, pixel_size
+
+MIMETYPES = {'png': 'image/png', 'json': 'application/json'}
+
+
+def label(key):
+    """Return 'name:freq' string for (name, freq) *key*."""
+    return '{}:{}'.format(*key)
+
+
+def group(points, keys: list):
+    """Return dictionaries of dates and values of *points* for each of
+       *keys*, see image.get_data_for_spline()."""
+    data = {key: dict(x=[], y=[]) for key in keys}
+    for point in points:
+        series = data.get((point.name, point.freq))
+        if series is not None:
+            series['x'].append(point.date)
+            series['y'].append(point.value)
+    return data
+
+
+def offsets(keys: list, params):
+    """Return position of each image in sprite by label of key."""
+    _, height = pixel_size(params)
+    return {label(key): dict(x=0, y=i * height) for i, key in enumerate(keys)}
+
+
+def make_png(data: dict, keys: list, params):
+    """Return png sprite with image of each of *keys* in *data*."""
+    width, height = pixel_size(params)
+    pixels = np.empty((height * len(keys), width, 3), dtype='uint8')
+    for i, key in enumerate(keys):
+        draw(pixels[i * height:(i + 1) * height], data[key], params)
+    return encode_png(pixels)
+
+
+def make_bundle(data: dict, keys: list, params):
+    """Return json with offset map and svg image of each of *keys*."""
+    width, height = pixel_size(params)
+    images = offsets(keys, params)
+    for key in keys:
+        images[label(key)]['svg'] = make_svg(data[key], params).decode()
+    return json.dumps(dict(width=width, height=height, images=images),
+                      separators=(',', ':')).encode('utf-8')
+
+
+def render(fmt: str, keys: list, **options):
+    """Return *fmt* sprite of series *keys*, *options* are arguments
+       of image.spline_params()."""
+    points = DatapointOperations.select_keys(keys,
+                                             options.get('start_date'),
+                                             options.get('end_date'))
+    data = group(points, keys)
+    params = spline_params(**options)
+    if fmt == 'json':
+        return make_bundle(data, keys, params)
+    return make_png(data, keys, params)
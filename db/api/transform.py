@@ -0,0 +1,202 @@
+"""Rates of change and year-to-date series made from stored series.
+
+   A series not stored is made from a stored series of same frequency
+   when its name tells how (see db/helper/label.py):
+
+       GDP_rog   - percent of previous period, 100 * x[t] / x[t-1]
+       GDP_yoy   - percent of same period year ago (a, q and m only)
+       GDP_base  - index, 100 at first date of the query
+                   from level series, eg GDP_bln_rub, or CPI_base
+                   from CPI_rog if there is no level series
+       GOV_EXPENSE_ACCUM_FEDERAL_bln_rub
+                 - year-to-date sum of GOV_EXPENSE_FEDERAL_bln_rub
+       GOV_EXPENSE_FEDERAL_bln_rub
+                 - period values of GOV_EXPENSE_ACCUM_FEDERAL_bln_rub
+
+   Stored series is always used if there is one. Transforms are numpy
+   operations on whole series, the result is kept in memory by version
+   of source series and dropped when source series changes, same as
+   resampled series (see resample.py).
+"""
+from collections import namedtuple
+
+import numpy as np
+
+import db.api.reads as reads
+import db.api.registry as registry
+import db.api.resample as resample
+from db.api.blobs import EPOCH_ORDINAL
+from db.api.queries import DatapointOperations
+from db.helper import label
+
+RATES = ('rog', 'yoy', 'base')
+# word of name of year-to-date series
+ACCUM = 'ACCUM'
+# frequencies with periods ending on same day every year
+YEARLY_FREQUENCIES = ('a', 'q', 'm')
+
+Source = namedtuple('Source', 'name method')
+
+
+def _years(days):
+    return ((np.asarray(days) - EPOCH_ORDINAL).astype('datetime64[D]')
+            .astype('datetime64[Y]').astype('int64'))
+
+
+def _periods(days, freq: str):
+    """Return number of *freq* period in year, 0 for first period,
+       for each of period end day numbers *days*."""
+    months = (np.asarray(days) - EPOCH_ORDINAL).astype('datetime64[D]') \
+        .astype('datetime64[M]').astype('int64')
+    return months % 12 // resample.MONTHS[freq]
+
+
+def rog(days, values):
+    """Return percent of previous value for every value but first."""
+    return days[1:], 100 * values[1:] / values[:-1]
+
+
+def yoy(days, values):
+    """Return percent of value dated year before, for values that
+       have one. Dates are ends of months, quarters or years."""
+    months = (days - EPOCH_ORDINAL).astype('datetime64[D]') \
+        .astype('datetime64[M]')
+    # end of same month year ago
+    year_ago = ((months - 11).astype('datetime64[D]') - 1).astype('int64') \
+        + EPOCH_ORDINAL
+    position = np.minimum(np.searchsorted(days, year_ago), len(days) - 1)
+    found = days[position] == year_ago
+    return days[found], 100 * values[found] / values[position[found]]
+
+
+def level(days, values):
+    """Return index of rate of change to previous period *values*,
+       100 before first period."""
+    return days, 100 * np.cumprod(values / 100)
+
+
+def accumulate(days, values, freq: str):
+    """Return year-to-date sums of *freq* period *values*. Sums are
+       known for periods of a year up to first one missing, none for
+       a year which starts in the middle of data."""
+    totals = np.cumsum(values)
+    starts = np.flatnonzero(np.r_[True, np.diff(_years(days)) != 0])
+    before = np.r_[0.0, totals][starts]
+    sizes = np.diff(np.r_[starts, len(days)])
+    # no period is missing if number of period is its place in year
+    position = np.arange(len(days)) - np.repeat(starts, sizes)
+    known = _periods(days, freq) == position
+    return days[known], (totals - np.repeat(before, sizes))[known]
+
+
+def deaccumulate(days, values, freq: str):
+    """Return *freq* period values of year-to-date sums *values*.
+       Value is known for first period of year and for a period that
+       follows previous one, eg not for June if data starts in June,
+       the June sum includes January to May."""
+    periods = _periods(days, freq)
+    first_in_year = np.r_[True, np.diff(_years(days)) != 0]
+    result = np.r_[values[:1], np.diff(values)]
+    result[first_in_year] = values[first_in_year]
+    follows = np.r_[False, np.diff(periods) == 1] & ~first_in_year
+    known = (first_in_year & (periods == 0)) | follows
+    return days[known], result[known]
+
+
+def same(days, values):
+    """Return level series as is, it is rebased in select_columns()."""
+    return days, values
+
+
+METHODS = {'rog': rog, 'yoy': yoy, 'base': same, 'rog_to_base': level,
+           'accumulate': accumulate, 'deaccumulate': deaccumulate}
+# methods which also take frequency
+YEAR_TO_DATE = ('accumulate', 'deaccumulate')
+
+
+def _words(name):
+    return label.extract_varname(name).split(label.SEP)
+
+
+def _without_accum(name):
+    words = name.split(label.SEP)
+    words.remove(ACCUM)
+    return label.SEP.join(words)
+
+
+def source(name: str, freq: str):
+    """Return Source with name of stored series and method to make
+       series *name* from it, None if *name* is stored or cannot
+       be made."""
+    catalog = registry.current()
+    if catalog.has(name, freq):
+        return None
+    varname, unit = label.split_label(name)
+    names = sorted(catalog.names(freq))
+    if unit in RATES:
+        if unit == 'yoy' and freq not in YEARLY_FREQUENCIES:
+            return None
+        levels = [stored for stored in names
+                  if label.split_label(stored)[0] == varname and
+                  label.extract_unit(stored) not in RATES]
+        if levels:
+            return Source(levels[0], unit)
+        if unit == 'base' and catalog.has(f'{varname}_rog', freq):
+            return Source(f'{varname}_rog', 'rog_to_base')
+        return None
+    if freq not in YEARLY_FREQUENCIES:
+        return None
+    if ACCUM in _words(name):
+        plain = _without_accum(name)
+        if catalog.has(plain, freq):
+            return Source(plain, 'accumulate')
+        return None
+    for stored in names:
+        if ACCUM in _words(stored) and _without_accum(stored) == name:
+            return Source(stored, 'deaccumulate')
+    return None
+
+
+def _derive(name, freq, as_of):
+    origin = source(name, freq)
+    _, _, days, values = DatapointOperations.select_columns(
+        freq, [origin.name], None, None, as_of)
+    order = np.argsort(days, kind='mergesort')
+    days = np.asarray(days, dtype='int64')[order]
+    values = np.asarray(values, dtype='float64')[order]
+    if not len(days):
+        return days, values
+    if origin.method in YEAR_TO_DATE:
+        return METHODS[origin.method](days, values, freq)
+    return METHODS[origin.method](days, values)
+
+
+def series(name: str, freq: str, as_of=None):
+    """Return day numbers and values of series *name* made from stored
+       series, see source()."""
+    if as_of:
+        return _derive(name, freq, as_of)
+    origin = source(name, freq)
+    versions = reads.versions(freq, [origin.name])
+    version = versions[0][1] if versions else None
+    return resample.current_cache().get(
+        ((origin.name, freq), 'transform', name, version),
+        lambda: _derive(name, freq, None))
+
+
+def select_columns(name: str, freq: str, start_date=None, end_date=None,
+                   as_of=None):
+    """Return columns like DatapointOperations.select_columns() for
+       series *name* made from stored series."""
+    days, values = resample.between(*series(name, freq, as_of),
+                                    start_date, end_date)
+    if label.extract_unit(name) == 'base' and len(values):
+        values = 100 * values / values[0]
+    return [name], np.zeros(len(days), dtype='int64'), days, values
+
+
+def points(name: str, freq: str, start_date=None, end_date=None,
+           as_of=None):
+    """Return Point tuples ordered by date, see select_columns()."""
+    return resample.to_points(freq, select_columns(name, freq, start_date,
+                                                   end_date, as_of))
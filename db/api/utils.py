@@ -6,6 +6,8 @@
 """
 from datetime import datetime
 import collections
+import itertools
+from flask import json
 import db.api.queries as queries
 from db.api.errors import CustomError400
 from db.helper import label
@@ -57,6 +59,51 @@ def to_csv(dicts):
         return ''
 
 
+def stream_csv(datapoints, block_size=1000):
+    """Yield same csv as to_csv() for *datapoints* iterator in blocks
+       of *block_size* lines, without keeping all datapoints in memory.
+    """
+    datapoints = iter(datapoints)
+    first = next(datapoints, None)
+    if first is None:
+        return
+    lines = [',{}'.format(first.name)]
+    for datapoint in itertools.chain([first], datapoints):
+        lines.append('{},{}'.format(date_as_str(datapoint.date),
+                                    datapoint.value))
+        if len(lines) >= block_size:
+            yield ''.join(line + '\n' for line in lines)
+            lines = []
+    yield ''.join(line + '\n' for line in lines)
+
+
+def stream_json(datapoints, block_size=1000):
+    """Yield same json as jsonify() of list of serialized *datapoints*,
+       in blocks of *block_size* datapoints."""
+    items = []
+    separator = '['
+    for datapoint in datapoints:
+        items.append(separator + json.dumps(datapoint.serialized,
+                                            separators=(',', ':')))
+        separator = ','
+        if len(items) >= block_size:
+            yield ''.join(items)
+            items = []
+    yield ''.join(items) + ('[]\n' if separator == '[' else ']\n')
+
+
+def stream_ndjson(datapoints, block_size=1000):
+    """Yield serialized *datapoints* as json, one per line."""
+    lines = []
+    for datapoint in datapoints:
+        lines.append(json.dumps(datapoint.serialized,
+                                separators=(',', ':')) + '\n')
+        if len(lines) >= block_size:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
 def unique(seq):
     return sorted(list(set(seq)))
 
@@ -76,7 +123,7 @@ def variable_info(varname, freq):
     Returns dictionary with variable information. E.g.:
         "m": {
             "latest_date": "2016-12-31",
-            "latest_value": "reserved",
+            "latest_value": 101.2,
             "start_date": "2016-06-30"
             },
         "name": "CPI_NONFOOD_rog",
@@ -97,10 +144,13 @@ def variable_info(varname, freq):
                   var={'id': var, 'en': 'reserved', 'ru': 'reserved'},
                   unit={'id': unit, 'en': 'reserved', 'ru': 'reserved'}
                   )
-    dr = queries.DateRange(freq=freq, name=varname)
-    result[freq] = {'start_date': dr.min,
-                    'latest_date': dr.max,
-                    'latest_value': 'reserved'}
+    summary = queries.series_summary(varname, freq)
+    if summary is None:
+        raise queries.series_not_found(varname, freq)
+    first_date, last_date, last_value = summary
+    result[freq] = {'start_date': queries.date_as_str(first_date),
+                    'latest_date': queries.date_as_str(last_date),
+                    'latest_value': last_value}
     return result
 
 
@@ -1,18 +1,31 @@
-import json
-
-from flask import Blueprint, request, abort, jsonify, current_app, Response, make_response
+from flask import (Blueprint, request, abort, jsonify, current_app, Response,
+                   make_response, stream_with_context)
 from flask.views import MethodView
 
 import db.api.utils as utils
+import db.api.cache as cache
+import db.api.columnar as columnar
+import db.api.compression as compression
+import db.api.downsample as downsample
+import db.api.encoders as encoders
+import db.api.etags as etags
+import db.api.frame as frame
 import db.api.image as image
+import db.api.ingest as ingest
+import db.api.resample as resample
+import db.api.sparkline as sparkline
+import db.api.sprite as sprite
+import db.api.transform as transform
 from db import db
 from db.api.errors import CustomError400
 from db.api.parameters import (RequestArgs, RequestFrameArgs, 
-                               SimplifiedArgs, DescriptionArgs)
+                               SeriesArgs, SimplifiedArgs, SplineArgs,
+                               SpriteArgs, DescriptionArgs)
 from db.api.queries import (All, Allowed, DatapointOperations, 
-                            DescriptionOperations)
+                            DescriptionOperations, VintageOperations)
 
 api_bp = Blueprint('api_bp', __name__, url_prefix='/api')
+api_bp.after_request(compression.compress_response)
 
 
 @api_bp.errorhandler(422)
@@ -54,21 +67,139 @@ def no_download(csv_str):
 
 
 def publish_csv(data):
-    """Convert *data* iterator to csv string."""
-    csv_str = utils.to_csv([row.serialized for row in data])
-    return no_download(csv_str)
+    """Stream *data* iterator as csv."""
+    return no_download(stream_with_context(utils.stream_csv(data)))
 
 
 def publish_json(data):
-    """Convert *data* iterator to json."""
-    return jsonify([row.serialized for row in data])
+    """Stream *data* iterator as json."""
+    if current_app.config['JSONIFY_PRETTYPRINT_REGULAR'] or current_app.debug:
+        # indented json is not streamed
+        return jsonify([row.serialized for row in data])
+    return Response(stream_with_context(utils.stream_json(data)),
+                    mimetype=current_app.config['JSONIFY_MIMETYPE'])
+
+
+def publish_ndjson(data):
+    """Stream *data* iterator as json, one datapoint per line."""
+    return Response(stream_with_context(utils.stream_ndjson(data)),
+                    mimetype='application/x-ndjson')
+
+
+def publish_columns(data):
+    """Send *data* dictionary with numpy arrays as json."""
+    return Response(encoders.dumps(data),
+                    mimetype=current_app.config['JSONIFY_MIMETYPE'])
+
+
+def publish_table(fmt, columns, names, freq):
+    """Send *columns* from select_columns() as Arrow or Parquet table
+       with a column for each of *names*."""
+    data = frame.ArrayRepresentation(columns, names)
+    body = columnar.encode(fmt, data.date_index, data.matrix, names, freq)
+    return Response(body, mimetype=columnar.MIMETYPES[fmt])
+
+
+def response_format(requested):
+    """Return *requested* format or, if it is not given, the one
+       Accept header asks for, None for default format."""
+    return requested or columnar.from_accept(request.accept_mimetypes)
+
+
+def select_columns(params, max_points=None, agg=None):
+    """Return datapoints columns for RequestArgs query *params*,
+       resampled with aggregator *agg* and downsampled to *max_points*
+       if these are given. Series not stored is made by transform.py
+       if it can be."""
+    name, freq = params['name'], params['freq']
+    if agg:
+        columns = resample.select_columns(name, freq, agg,
+                                          params['start_date'],
+                                          params['end_date'],
+                                          params['as_of'])
+    elif transform.source(name, freq):
+        columns = transform.select_columns(name, freq,
+                                           params['start_date'],
+                                           params['end_date'],
+                                           params['as_of'])
+    else:
+        columns = DatapointOperations.select_columns(freq, [name],
+                                                     params['start_date'],
+                                                     params['end_date'],
+                                                     params['as_of'])
+    if max_points:
+        return downsample.columns(columns, max_points)
+    return columns
+
+
+def select_stream(params, max_points=None, agg=None):
+    """Return datapoints iterator for RequestArgs query *params*,
+       see select_columns()."""
+    name, freq = params['name'], params['freq']
+    if agg:
+        points = resample.points(name, freq, agg, params['start_date'],
+                                 params['end_date'], params['as_of'])
+    elif transform.source(name, freq):
+        points = transform.points(name, freq, params['start_date'],
+                                  params['end_date'], params['as_of'])
+    else:
+        points = DatapointOperations.select_stream(freq, [name],
+                                                   params['start_date'],
+                                                   params['end_date'],
+                                                   params['as_of'])
+    if max_points:
+        return downsample.points(points, max_points)
+    return points
+
+
+def derived_from(params, agg=None):
+    """Return (name, freq) of stored series that series of RequestArgs
+       query *params* is made from, None for stored series."""
+    name, freq = params['name'], params['freq']
+    if agg:
+        return name, resample.source_frequency(name, freq)
+    origin = transform.source(name, freq)
+    if origin:
+        return origin.name, freq
+    return None
+
+
+def series_query(params, agg=None):
+    """Return query arguments of etags.conditional() for RequestArgs
+       query *params*. Series made from other series has query of its
+       source series, so that ETag and cache follow changes of source."""
+    name, freq = derived_from(params, agg) or (params['name'],
+                                               params['freq'])
+    return (freq, name, params['start_date'], params['end_date'],
+            params['as_of'])
+
+
+def series_kind(fmt, params, max_points=None, agg=None):
+    """Return response kind of series query, see query_kind()."""
+    derived = None
+    if derived_from(params, agg):
+        derived = '{name}:{freq}'.format(**params)
+    return query_kind(fmt, max_points=max_points, agg=agg, derived=derived)
+
+
+def query_kind(kind, **options):
+    """Return response kind for ETag and cache with *options* that are
+       given, see etags.conditional()."""
+    given = [f'{key}={value}' for key, value in sorted(options.items())
+             if value]
+    return ' '.join([kind] + given)
 
 
 class DatapointsAPI(MethodView):
 
     def get(self):
         """
-        Select time series data as json.
+        Select time series data as json, or as json lines with
+        format=ndjson. With orient=columns json is a dictionary with
+        name, freq and lists of dates and values. format=arrow and
+        format=parquet or Accept header with their mime types return
+        a table, see columnar.py. max_points=N returns at most N
+        datapoints chosen to keep shape of the series, see downsample.py.
 
         Responses:
             422:
@@ -77,8 +208,34 @@ class DatapointsAPI(MethodView):
                 Sent json.
        """
         args = RequestArgs()
-        data = DatapointOperations.select(**args.get_query_parameters())
-        return publish_json(data)
+        params = args.get_query_parameters()
+        max_points = args.max_points
+        fmt = response_format(args.format) or 'json'
+        kind = fmt
+        query = (params['freq'], params['name'], params['start_date'],
+                 params['end_date'], params['as_of'])
+        if fmt in columnar.FORMATS:
+
+            def build():
+                return publish_table(fmt, select_columns(params, max_points),
+                                     [params['name']], params['freq'])
+        elif args.orient == 'columns':
+            kind = 'json-columns'
+
+            def build():
+                return publish_columns(frame.series_columns(
+                    select_columns(params, max_points),
+                    params['name'], params['freq']))
+        else:
+            publish = publish_ndjson if fmt == 'ndjson' else publish_json
+
+            def build():
+                return publish(select_stream(params, max_points))
+        kind = query_kind(kind, max_points=max_points)
+        return etags.conditional(
+            kind,
+            lambda: cache.cached_response(kind, build, *query),
+            *query)
 
     def delete(self):
         """Delete datapoints.
@@ -87,32 +244,48 @@ class DatapointsAPI(MethodView):
             403:
                 Failed to authenticate correctly.
             200:
-                Returns empty dictionary on success.
+                Returns number of datapoints deleted, like {"deleted": 10}.
         """
 
         authorise()
         args = SimplifiedArgs()
-        DatapointOperations.delete(**args.get_query_parameters())
-        return jsonify({})
+        count = DatapointOperations.delete(**args.get_query_parameters())
+        return jsonify(dict(deleted=count))
 
     def post(self):
         """Upload incoming data to database.
 
+        Body is a JSON array of datapoints or, with 'application/x-ndjson'
+        content type, one datapoint per line. Body is read as a stream and
+        written in batches, it is not loaded in memory as a whole.
+        Body may be compressed, with Content-Encoding gzip or zstd.
+
         Responses:
             400:
-                Something went wrong in during query.
+                Something went wrong in during query. Json with message
+                and index of datapoint is returned for malformed data.
             403:
                 Failed to authenticate correctly.
             200:
-                Returns empty dictionary on success.
+                Returns dictionary with number of datapoints inserted
+                and updated and id of vintage created by upload,
+                like {"inserted": 10, "updated": 2, "vintage": 5},
+                vintage is null if upload changed nothing.
         """
         authorise()
         try:
-            data = json.loads(request.data)
-            for datapoint in data:
-                DatapointOperations.upsert(datapoint)
+            stream = compression.decompress(
+                request.stream, request.headers.get('Content-Encoding'))
+            data = ingest.read_datapoints(stream, request.mimetype)
+            inserted, updated = DatapointOperations.upsert_many(data)
+            vintage = VintageOperations.current(create=False)
             db.session.commit()
-            return jsonify({})
+            return jsonify(dict(inserted=inserted, updated=updated,
+                                vintage=vintage and vintage.id))
+        except CustomError400:
+            # error message tells index of failing datapoint
+            db.session.rollback()
+            raise
         except BaseException:
             db.session.rollback()
             return abort(400)
@@ -150,7 +323,12 @@ api_bp.add_url_rule(
 @api_bp.route('/series', methods=['GET'])
 def get_series():
     """
-    Select time series data as csv.
+    Select time series data as csv, or as table with format=arrow
+    or format=parquet. max_points=N returns at most N datapoints,
+    see downsample.py. agg=eop (or avg, sum, min, max) makes series
+    from same name at higher frequency, see resample.py. Rates of
+    change and year-to-date series not stored are made from stored
+    series, see transform.py.
 
     Responses:
         422:
@@ -158,9 +336,26 @@ def get_series():
         200:
             Sent csv.
    """
-    args = RequestArgs()
-    data = DatapointOperations.select(**args.get_query_parameters())
-    return publish_csv(data)
+    args = SeriesArgs()
+    params = args.get_query_parameters()
+    max_points, agg = args.max_points, args.agg
+    query = series_query(params, agg)
+    fmt = response_format(args.format)
+    if fmt in columnar.FORMATS:
+
+        def build():
+            return publish_table(fmt, select_columns(params, max_points, agg),
+                                 [params['name']], params['freq'])
+    else:
+        fmt = 'csv'
+
+        def build():
+            return publish_csv(select_stream(params, max_points, agg))
+    kind = series_kind(fmt, params, max_points, agg)
+    return etags.conditional(
+        kind,
+        lambda: cache.cached_response(kind, build, *query),
+        *query)
 
 
 @api_bp.route('/frame', methods=['GET'])
@@ -172,12 +367,55 @@ def get_dataframe():
          api/frame?freq=a&names=GDP_yoy,CPI_rog&start_date=2013-12-31
          api/frame?freq=a&start_date=2013-12-31
          api/frame?freq=a
+         api/frame?freq=a&pivot=dict
+         api/frame?freq=a&orient=columns
 
+    Frame is built with numpy unless *pivot* parameter or FRAME_PIVOT
+    in config is 'dict' or 'stream', output is same for all of them.
+    'stream' sends rows as they are read.
+
+    With orient=columns frame is sent as json with freq, names, dates
+    and a list of values for each name, null for missing values.
+    format=arrow and format=parquet or Accept header with their mime
+    types return a table, see columnar.py.
     """
     args = RequestFrameArgs()
-    data = DatapointOperations.select_frame(**args.get_query_parameters())
-    csv_str = utils.DictionaryRepresentation(data, args.names).to_csv()
-    return no_download(csv_str)
+    params = args.get_query_parameters()
+    pivot = args.pivot or current_app.config.get('FRAME_PIVOT', 'numpy')
+    kind = 'frame'
+    fmt = response_format(args.format)
+    if fmt in columnar.FORMATS:
+        kind, pivot = fmt, fmt
+    elif args.orient == 'columns':
+        kind, pivot = 'frame-columns', 'columns'
+
+    def build():
+        if pivot in columnar.FORMATS:
+            columns = DatapointOperations.select_columns(**params)
+            return publish_table(pivot, columns, args.names, params['freq'])
+        if pivot == 'columns':
+            columns = DatapointOperations.select_columns(**params)
+            return publish_columns(frame.ArrayRepresentation(
+                columns, args.names).to_columns(params['freq']))
+        if pivot == 'stream':
+            points = DatapointOperations.select_stream(**params)
+            return no_download(stream_with_context(
+                frame.stream_csv(points, args.names)))
+        if pivot == 'numpy':
+            columns = DatapointOperations.select_columns(**params)
+            csv_str = frame.ArrayRepresentation(columns, args.names).to_csv()
+        else:
+            data = DatapointOperations.select_frame(**params)
+            csv_str = utils.DictionaryRepresentation(data,
+                                                     args.names).to_csv()
+        return no_download(csv_str)
+
+    query = (params['freq'], params['names'], params['start_date'],
+             params['end_date'], params['as_of'])
+    return etags.conditional(
+        kind,
+        lambda: cache.cached_response(kind, build, *query),
+        *query)
 
 
 @api_bp.route('/freq', methods=['GET'])
@@ -206,6 +444,16 @@ def get_all_variable_names_for_frequency(freq):
     return jsonify(Allowed.names(freq))
 
 
+@api_bp.route('/vintages', methods=['GET'])
+def get_vintages():
+    """Get list of uploads, usable as *as_of* parameter.
+
+    Responses:
+        200:  Returns a list like [{"id": 1, "created_at": "..."}]
+    """
+    return jsonify([v.serialized for v in VintageOperations.all()])
+
+
 @api_bp.route('/info', methods=['GET'])
 def info():
     # WONTFIX: can this method work without frequency? just by name?
@@ -217,10 +465,78 @@ def info():
 
 @api_bp.route('/spline', methods=['GET'])
 def spline():
-    args = RequestArgs()
-    data = DatapointOperations.select(**args.get_query_parameters())
-    png_output = image.make_png(data)
-    response = make_response(png_output)
-    response.headers['Content-Type'] = 'image/png'
-    return response
-
+    """Get png or svg image of one variable.
+
+    Optional *width* and *height* in inches and *dpi* set image size,
+    *start_date* and *end_date* also set time range of x axis.
+    format=svg or engine=fast draw image without matplotlib, see
+    sparkline.py. max_points=N draws at most N datapoints, see
+    downsample.py. Images are cached by series version and these
+    parameters.
+    """
+    args = SplineArgs()
+    params = args.get_query_parameters()
+    options = args.get_image_parameters()
+    fmt = args.format or 'png'
+    engine = 'fast' if fmt == 'svg' else args.engine or 'matplotlib'
+    max_points = args.max_points
+
+    def render():
+        data = DatapointOperations.select(**params)
+        if max_points:
+            data = downsample.points(data, max_points)
+        if engine == 'fast':
+            return sparkline.render(fmt, data, **options)
+        return image.make_png(data, **options)
+
+    def build():
+        if params['as_of']:
+            output = render()
+        else:
+            versions = etags.series_versions(params['freq'], [params['name']])
+            key = (params['freq'], params['name'],
+                   tuple(version for _, version, _ in versions),
+                   tuple(sorted(options.items())), fmt, engine, max_points)
+            output = image.current_cache().get(key, render)
+        response = make_response(output)
+        response.headers['Content-Type'] = sparkline.MIMETYPES[fmt]
+        return response
+
+    kind = query_kind(
+        '{} {} {width} {height} {dpi}'.format(fmt, engine, **options),
+        max_points=max_points)
+    return etags.conditional(kind, build,
+                             params['freq'], params['name'],
+                             params['start_date'], params['end_date'],
+                             params['as_of'])
+
+
+@api_bp.route('/sprite', methods=['GET'])
+def get_sprite():
+    """Get images of many variables in one response.
+
+    *series* lists variables as name:freq, eg series=BRENT:d,GDP_yoy:q.
+    Returns png sprite with images stacked top to bottom in order of
+    *series*, or format=json with offset of each image in the sprite
+    and its svg. *width*, *height*, *dpi*, *start_date* and *end_date*
+    are same as for api/spline. See sprite.py.
+    """
+    args = SpriteArgs()
+    keys = args.keys
+    options = args.get_image_parameters()
+    fmt = args.format or 'png'
+
+    def build():
+        versions = etags.key_versions(keys)
+        key = ('sprite', tuple(keys),
+               tuple(version for _, version, _ in versions),
+               tuple(sorted(options.items())), fmt)
+        output = image.current_cache().get(
+            key, lambda: sprite.render(fmt, keys, **options))
+        response = make_response(output)
+        response.headers['Content-Type'] = sprite.MIMETYPES[fmt]
+        return response
+
+    kind = 'sprite {} {width} {height} {dpi}'.format(fmt, **options)
+    return etags.conditional_keys(kind, build, keys,
+                                  options['start_date'], options['end_date'])
@@ -30,9 +30,13 @@
                 yoy - change to year ago
                 base - base index
 
-            aggregation command (agg):
+            aggregation command (agg), makes series from higher
+            frequency if it is stored (see db/api/resample.py):
                 eop - end of period
                 avg - average
+                sum - sum
+                min - lowest value
+                max - highest value
 """
 
 from datetime import date
@@ -48,12 +52,17 @@ ALLOWED_REAL_RATES = (
 )
 ALLOWED_AGGREGATORS = (
     'eop',
-    'avg'
+    'avg',
+    'sum',
+    'min',
+    'max'
 )
 ALLOWED_FINALISERS = (
     # 'info',  # resereved: retrun json with variable and url description
     'csv',   # to implement: return csv (default)
     'json',  # to implement: return list of dictionaries
+    'arrow',  # return Arrow IPC file
+    'parquet',  # return Parquet file
     # 'xlsx'   # resereved: return Excel file
 )
 
@@ -154,7 +163,6 @@ class Tokens(object):
     def rate(self):
         return self._rate
 
-    # not used
     @property
     def agg(self):
         return self._agg
@@ -1,16 +1,24 @@
 from flask import Blueprint, jsonify
+import db.api.cache as cache
+import db.api.columnar as columnar
+import db.api.compression as compression
+import db.api.etags as etags
+import db.api.registry as registry
+import db.api.resample as resample
+import db.api.transform as transform
 from db.api.errors import CustomError400
-from db.api.queries import DatapointOperations
 from db.api.utils import variable_info
-from db.api.views import publish_csv
+from db.api.views import (publish_csv, publish_table, select_columns,
+                          select_stream, series_kind, series_query)
 from db.custom_api.decomposer import Indicator
 
 custom_api_bp = Blueprint('custom_api', __name__, url_prefix='')
+custom_api_bp.after_request(compression.compress_response)
 
 
 @custom_api_bp.errorhandler(CustomError400)
 def handle_invalid_usage(error):
-    response = jsonify(error.to_dict())
+    response = jsonify(error.dict)
     response.status_code = error.status_code
     return response
 
@@ -18,16 +26,48 @@ def handle_invalid_usage(error):
 BASE_URL = '/<string:domain>/series/<string:varname>'
 
 
+def validate_name(name, freq):
+    if not registry.current().has(name, freq):
+        raise CustomError400(f'Variable <{name}> not found '
+                             f'at frequency <{freq}>')
+
+
 @custom_api_bp.route(f'{BASE_URL}/<string:freq>', strict_slashes=False)
 @custom_api_bp.route(f'{BASE_URL}/<string:freq>/<path:inner_path>')
 def time_series_api_interface(domain, varname, freq, inner_path=''):
     this_variable = Indicator(domain, varname, freq, inner_path)
-    data = DatapointOperations.select(**this_variable.query_param)
-    return publish_csv(data)
+    params = dict(this_variable.query_param, as_of=None)
+    # aggregator makes series from higher frequency if there is one,
+    # otherwise series stored at *freq* is used
+    agg = this_variable.token.agg
+    if not (agg and resample.source_frequency(params['name'], freq)):
+        agg = None
+        # rate or year-to-date series not stored is made from stored one
+        if not transform.source(params['name'], freq):
+            validate_name(this_variable.name, freq)
+    query = series_query(params, agg)
+    fmt = this_variable.token.fin
+    if fmt in columnar.FORMATS:
+
+        def build():
+            return publish_table(fmt, select_columns(params, agg=agg),
+                                 [params['name']], params['freq'])
+    else:
+        fmt = 'csv'
+
+        def build():
+            return publish_csv(select_stream(params, agg=agg))
+    # same cache entry and ETag as for api/series with these parameters
+    kind = series_kind(fmt, params, agg=agg)
+    return etags.conditional(
+        kind,
+        lambda: cache.cached_response(kind, build, *query),
+        *query)
 
 
 @custom_api_bp.route(f'{BASE_URL}/<string:freq>/info')
 @custom_api_bp.route(f'{BASE_URL}/<string:freq>/<path:inner_path>/info')
 def info(varname, freq, **kwargs):
+    validate_name(varname, freq)
     data = variable_info(varname, freq)
     return jsonify(data)
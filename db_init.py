@@ -19,6 +19,7 @@ from db import create_app
 from db.api import models
 from db.api.views import api_bp
 from db.api.utils import to_date
+from db.api.queries import DatapointOperations
 
 # this creates tables specified in db.api.models
 # the tables will be created in
@@ -38,10 +39,12 @@ for datapoint in data:
     datapoint['date'] = to_date(datapoint['date'])
 
 with app.app_context():
-    # delete everything as we will be unable to insert + commit
-    for item in models.Datapoint.query.all():
-        db.session.delete(item)
+    # delete everything as we will be unable to insert + commit,
+    # tables referring to series go first
+    for model in (models.Datapoint, models.Revision, models.SeriesBlob,
+                  models.Series, models.Vintage):
+        model.query.delete()
     db.session.commit()
-    # add from file
-    db.session.bulk_insert_mappings(models.Datapoint, data)
+    # add from file, catalog of series is updated along
+    DatapointOperations.bulk_insert(data)
     db.session.commit()
@@ -0,0 +1,157 @@
+"""Migrate database to series + datapoint layout.
+
+   Old layout keeps name and freq strings and a surrogate id on every
+   datapoint row:
+
+       datapoint(id, name, freq, date, value), unique (name, freq, date)
+
+   New layout moves name and freq to series table and keys datapoints
+   by (series_id, date as integer day number):
+
+       series(id, name, freq, <catalog fields>), unique (name, freq)
+       datapoint(series_id, date, value), primary key (series_id, date)
+
+   Usage:
+       python db_migrate.py config.DevelopmentConfig
+
+   Later versions add columns listed in ADDED_COLUMNS and vintage and
+   revision tables, migrate() adds them to existing database as well.
+
+   To fill blob storage (STORAGE_ENGINE = 'blob') from datapoint table:
+       python db_migrate.py config.DevelopmentConfig --blobs
+"""
+import sys
+
+from sqlalchemy import MetaData, Table, inspect, select
+
+from db import db
+from db import create_app
+# we need to import models here explicitly, otherwise the tables created
+# will be empty
+from db.api.models import Datapoint, Revision, Series, SeriesBlob, Vintage
+from db.api.queries import SeriesOperations
+import db.api.blobs as blobs
+
+LEGACY_TABLE = 'datapoint_legacy'
+CHUNK_SIZE = 10000
+
+
+def is_legacy(engine):
+    """Return True if datapoint table has name column (old layout)."""
+    inspector = inspect(engine)
+    if 'datapoint' not in inspector.get_table_names():
+        return False
+    columns = [c['name'] for c in inspector.get_columns('datapoint')]
+    return 'name' in columns
+
+
+def rename_legacy_table(connection):
+    connection.execute(f'ALTER TABLE datapoint RENAME TO {LEGACY_TABLE}')
+    if connection.dialect.name == 'postgresql':
+        # index names must be unique in postgres schema, free them up
+        # for new datapoint table
+        connection.execute('ALTER INDEX datapoint_pkey '
+                           f'RENAME TO {LEGACY_TABLE}_pkey')
+
+
+def copy_series(connection, legacy):
+    series = Series.__table__
+    keys = select([legacy.c.name, legacy.c.freq]).distinct()
+    connection.execute(series.insert().from_select(['name', 'freq'], keys))
+
+
+def copy_datapoints(connection, legacy):
+    series = Series.__table__
+    rows = select([series.c.id, legacy.c.date, legacy.c.value]) \
+        .select_from(legacy.join(series, (series.c.name == legacy.c.name) &
+                                         (series.c.freq == legacy.c.freq))) \
+        .order_by(series.c.id, legacy.c.date)
+    result = connection.execution_options(stream_results=True).execute(rows)
+    insert = Datapoint.__table__.insert()
+    while True:
+        chunk = result.fetchmany(CHUNK_SIZE)
+        if not chunk:
+            break
+        connection.execute(insert, [dict(series_id=series_id,
+                                         date=date,
+                                         value=value)
+                                    for series_id, date, value in chunk])
+
+
+# columns added after series + datapoint layout was introduced
+ADDED_COLUMNS = [
+    ('datapoint', 'vintage_id', 'INTEGER NOT NULL DEFAULT 0'),
+    ('series', 'version', 'INTEGER NOT NULL DEFAULT 0'),
+    ('series', 'revised_from', 'DATE'),
+]
+
+
+def has_column(engine, table, column):
+    columns = [c['name'] for c in inspect(engine).get_columns(table)]
+    return column in columns
+
+
+def add_columns(engine):
+    """Add missing columns and tables to database in new layout.
+       Returns list of columns added."""
+    added = []
+    with engine.begin() as connection:
+        for table, column, definition in ADDED_COLUMNS:
+            if not has_column(connection, table, column):
+                connection.execute(f'ALTER TABLE {table} '
+                                   f'ADD COLUMN {column} {definition}')
+                added.append(f'{table}.{column}')
+        db.metadata.create_all(connection)
+    return added
+
+
+def migrate(app):
+    with app.app_context():
+        engine = db.engine
+        if not is_legacy(engine):
+            added = add_columns(engine)
+            if added:
+                print('Added columns: ' + ', '.join(added))
+            else:
+                print('Database is already in new layout, '
+                      'nothing to migrate.')
+            return
+        with engine.begin() as connection:
+            rename_legacy_table(connection)
+            # series table with catalog fields only is rebuilt from scratch
+            Series.__table__.drop(connection, checkfirst=True)
+            db.metadata.create_all(connection)
+            legacy = Table(LEGACY_TABLE, MetaData(), autoload=True,
+                           autoload_with=connection)
+            copy_series(connection, legacy)
+            copy_datapoints(connection, legacy)
+            legacy.drop(connection)
+        if engine.dialect.name == 'postgresql':
+            # physically order rows by (series_id, date)
+            engine.execute('CLUSTER datapoint USING datapoint_pkey')
+        SeriesOperations.rebuild()
+        print('Migrated to series + datapoint layout.')
+
+
+def pack_blobs(app):
+    """Copy datapoint table to blob storage, one series at a time."""
+    with app.app_context():
+        db.create_all()
+        for series in Series.query.order_by(Series.id):
+            SeriesBlob.query.filter_by(series_id=series.id).delete()
+            rows = db.session.query(Datapoint.date, Datapoint.value) \
+                .filter(Datapoint.series_id == series.id) \
+                .all()
+            blobs.write(series,
+                        [dt.toordinal() for dt, _ in rows],
+                        [value for _, value in rows])
+            db.session.commit()
+        print('Packed datapoints to blob storage.')
+
+
+if __name__ == '__main__':
+    config = sys.argv[1] if len(sys.argv) > 1 else 'config.DevelopmentConfig'
+    app = create_app(config)
+    migrate(app)
+    if '--blobs' in sys.argv:
+        pack_blobs(app)
@@ -0,0 +1,87 @@
+"""Report where app startup time goes.
+
+   Lists modules with longest import time (python -X importtime),
+   then times creation of app and first and second request to a few
+   endpoints on a small in-memory database. Run as:
+
+       python startup_report.py [number of modules to list]
+"""
+import subprocess
+import sys
+import time
+from datetime import date
+
+ENDPOINTS = ['/api/freq',
+             '/api/series?name=BENCH&freq=m',
+             '/api/frame?freq=m&format=arrow',
+             '/api/spline?name=BENCH&freq=m',
+             '/api/spline?name=BENCH&freq=m&engine=fast',
+             '/apispec_1.json']
+
+
+class ReportConfig:
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    API_TOKEN = 'report'
+    SWAGGER_UI = True
+
+
+def import_times(statement='import db.api.views, db.custom_api.views'):
+    """Return (cumulative microseconds, module) tuples for modules
+       imported by *statement*, slowest first."""
+    result = subprocess.run([sys.executable, '-X', 'importtime',
+                             '-c', statement],
+                            stderr=subprocess.PIPE, universal_newlines=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), module.rstrip()))
+    return sorted(rows, reverse=True)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def get(client, url):
+    response = client.get(url)
+    return response.status_code, response.get_data()
+
+
+def main(top=20):
+    print('Slowest imports, cumulative ms:')
+    for microseconds, module in import_times()[:top]:
+        print(f'{microseconds / 1000:10.1f}  {module}')
+    print()
+
+    def create():
+        from db import db, make_app
+        from db.api.queries import DatapointOperations
+        app = make_app(ReportConfig)
+        with app.app_context():
+            db.create_all()
+            DatapointOperations.bulk_insert([
+                dict(name='BENCH', freq='m', date=date(2000 + i // 12,
+                                                       i % 12 + 1, 1),
+                     value=float(i)) for i in range(120)])
+            db.session.commit()
+        return app
+
+    app, ms = timed(create)
+    print(f'{ms:10.1f}  app created')
+    client = app.test_client()
+    with app.app_context():
+        for url in ENDPOINTS:
+            # body is read, streamed responses are made while read
+            (status, _), first = timed(lambda: get(client, url))
+            _, second = timed(lambda: get(client, url))
+            print(f'{first:10.1f}  first, {second:.1f} next request '
+                  f'to {url} ({status})')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -37,5 +37,27 @@ class Test_API_Info(TestCaseBase):
     # eg: 'oil/series/CPI_NONFOOD_rog/m/bln_rub/2016/info'
 
 
+class Test_API_Aggregation(TestCaseBase):
+    """Test custom API 'eop'/'avg' tokens on series not stored"""
+
+    def test_monthly_series_is_made_from_daily(self):
+        response = self.client.get('oil/series/BRENT/m/eop/2016/2016')
+        assert response.status_code == 200
+        lines = response.get_data().decode('utf-8').strip().split('\n')
+        data = self._subset_test_data('BRENT', 'd')
+        assert lines[-1] == f"2016-12-31,{data[-1]['value']}"
+        assert self.client.get('oil/series/BRENT/m/avg/2016/2016') \
+            .get_data() != response.get_data()
+
+    def test_aggregator_on_stored_series_reads_it(self):
+        response = self.client.get('ru/series/GDP/q/yoy/2016/2016')
+        aggregated = self.client.get('ru/series/GDP_yoy/q/eop/2016/2016')
+        assert aggregated.get_data() == response.get_data()
+
+    def test_series_without_source_is_error(self):
+        response = self.client.get('oil/series/BRENT/m/2016/2016')
+        assert response.status_code == 400
+
+
 if __name__ == '__main__':  # pragma: no cover
     pytest.main([__file__])
@@ -16,7 +16,7 @@ import os
 
 
 from db import get_app
-from db.api.models import Datapoint
+from db.api.queries import DatapointOperations
 from db.api import utils
 from db import db as fsa_db
 from db.api.views import api_bp as api_module
@@ -57,7 +57,8 @@ class TestCaseBase(unittest.TestCase):
         data = self._read_test_data()
         for datapoint in data:
             datapoint['date'] = utils.to_date(datapoint['date'])
-        fsa_db.session.bulk_insert_mappings(Datapoint, data)
+        DatapointOperations.bulk_insert(data)
+        fsa_db.session.commit()
 
     def _prepare_app(self):
         self.app = self._make_app()
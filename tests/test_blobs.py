@@ -0,0 +1,120 @@
+from datetime import date
+
+import numpy as np
+
+import db.api.blobs as blobs
+from db.api.models import SeriesBlob
+from db.api.queries import DatapointOperations, SeriesOperations
+from tests.test_basic import TestCaseBase
+
+
+def test_merge_prefers_new_values_and_counts_added_dates():
+    dates, values, added = blobs.merge(np.array([1, 3]), np.array([1.0, 3.0]),
+                                       np.array([3, 2, 2]),
+                                       np.array([30.0, 20.0, 21.0]))
+    assert dates.tolist() == [1, 2, 3]
+    assert values.tolist() == [1.0, 21.0, 30.0]
+    assert added == 1
+
+
+def test_years_splits_daily_series_only():
+    dates = [date(2016, 12, 31).toordinal(), date(2017, 1, 1).toordinal()]
+    assert blobs.years('d', dates).tolist() == [2016, 2017]
+    assert blobs.years('m', dates).tolist() == [0, 0]
+
+
+class TestCaseBlobs(TestCaseBase):
+
+    def _make_app(self):
+        app = super()._make_app()
+        app.config['STORAGE_ENGINE'] = 'blob'
+        return app
+
+
+class Test_BlobStorage(TestCaseBlobs):
+
+    def test_daily_series_is_stored_by_year(self):
+        series = SeriesOperations.get('BRENT', 'd')
+        blob = SeriesBlob.query.filter_by(series_id=series.id).one()
+        assert blob.year == 2016
+        assert blob.count == series.count
+
+    def test_select_returns_points_ordered_by_date(self):
+        data = DatapointOperations.select('m', 'CPI_NONFOOD_rog', None, None)
+        expected = self._subset_test_data('CPI_NONFOOD_rog', 'm')
+        assert [p.serialized for p in data] == expected
+        assert data.count() == len(expected)
+
+    def test_select_filters_by_dates(self):
+        data = DatapointOperations.select('d', 'BRENT',
+                                          '2016-06-02', '2016-06-03')
+        assert [p.value for p in data] == [49.05, 48.5]
+
+    def test_upsert_adds_and_updates_values(self):
+        point = dict(name='BRENT', freq='d', date='2017-01-02', value=55.0)
+        DatapointOperations.upsert(point)
+        DatapointOperations.upsert(dict(point, value=56.0))
+        data = DatapointOperations.select('d', 'BRENT', '2017-01-01', None)
+        assert [p.value for p in data] == [56.0]
+        series = SeriesOperations.get('BRENT', 'd')
+        assert series.last_date == date(2017, 1, 2)
+        assert series.count == 152
+
+    def test_upsert_many_counts_inserted_and_updated(self):
+        datapoints = [
+            dict(name='BRENT', freq='d', date='2016-12-30', value=1.0),
+            dict(name='BRENT', freq='d', date='2017-01-02', value=2.0),
+            dict(name='BRENT', freq='d', date='2017-01-02', value=3.0)]
+        assert DatapointOperations.upsert_many(datapoints) == (1, 1)
+        assert SeriesOperations.get('BRENT', 'd').last_value == 3.0
+        assert DatapointOperations.upsert_many(datapoints) == (0, 0)
+
+    def test_delete_updates_catalog(self):
+        count = DatapointOperations.delete('d', 'BRENT', '2016-12-01', None)
+        assert count == 21
+        series = SeriesOperations.get('BRENT', 'd')
+        assert series.last_date == date(2016, 11, 30)
+        DatapointOperations.delete('d', 'BRENT', None, None)
+        assert SeriesOperations.get('BRENT', 'd').count == 0
+
+    def test_float32_mode_stores_compact_values(self):
+        self.app.config['BLOB_FLOAT32'] = True
+        point = dict(name='X_rog', freq='a', date='2017-12-31', value=0.1)
+        DatapointOperations.upsert(point)
+        blob = SeriesBlob.query.filter_by(
+            series_id=SeriesOperations.get('X_rog', 'a').id).one()
+        assert blob.dtype == blobs.VALUE_DTYPE_COMPACT
+        assert len(blob.values) == 4
+
+
+class Test_BlobStorage_API(TestCaseBlobs):
+
+    def test_series_csv_is_same_as_for_rows_engine(self):
+        params = dict(freq='m', name='CPI_FOOD_rog',
+                      start_date='2016-11-01', end_date='2017-01-01')
+        response = self.client.get('api/series', query_string=params)
+        assert response.get_data().decode('utf-8') == \
+            ',CPI_FOOD_rog\n2016-11-30,100.8\n2016-12-31,100.6\n'
+
+    def test_frame_csv_is_same_as_for_rows_engine(self):
+        params = dict(freq='d', name='BRENT,USDRUR_CB',
+                      start_date='2016-06-01', end_date='2016-06-07')
+        response = self.client.get('api/frame', query_string=params)
+        assert response.get_data().decode('utf-8') == """,BRENT,USDRUR_CB
+2016-06-01,48.81,65.9962
+2016-06-02,49.05,66.6156
+2016-06-03,48.5,66.7491
+2016-06-04,,66.8529
+2016-06-06,48.94,
+2016-06-07,49.76,65.7894
+"""
+
+    def test_as_of_returns_error_before_streaming(self):
+        params = dict(freq='m', name='CPI_FOOD_rog', as_of='1')
+        for url in ('api/series', 'api/datapoints', 'api/frame'):
+            response = self.client.get(url, query_string=params)
+            assert response.status_code == 400
+            assert b'as_of' in response.get_data()
+        response = self.client.get('api/frame', query_string=dict(
+            params, pivot='stream'))
+        assert response.status_code == 400
@@ -0,0 +1,86 @@
+import json
+
+import db.api.cache as cache
+from tests.test_basic import TestCaseBase
+
+
+def test_cache_evicts_least_recently_used_over_budget():
+    responses = cache.ResponseCache(budget=10)
+    responses.put('a', [('A', 'd')], b'12345', 'text/plain', 0)
+    responses.put('b', [('B', 'd')], b'12345', 'text/plain', 0)
+    assert responses.get('a')
+    responses.put('c', [('C', 'd')], b'12345', 'text/plain', 0)
+    assert list(responses.entries) == ['a', 'c']
+    assert responses.size == 10
+    assert ('B', 'd') not in responses.index
+
+
+def test_invalidate_drops_entries_of_changed_series_only():
+    responses = cache.ResponseCache(budget=100)
+    responses.put('a', [('A', 'd')], b'1', 'text/plain', 0)
+    responses.put('ab', [('A', 'd'), ('B', 'd')], b'1', 'text/plain', 0)
+    responses.put('b', [('B', 'd')], b'1', 'text/plain', 0)
+    responses.invalidate([('A', 'd')])
+    assert list(responses.entries) == ['b']
+
+
+def test_put_after_invalidation_is_ignored():
+    responses = cache.ResponseCache(budget=100)
+    generation = responses.generation
+    responses.invalidate([('A', 'd')])
+    responses.put('a', [('A', 'd')], b'1', 'text/plain', generation)
+    assert not responses.entries
+
+
+def test_make_key_normalises_dates_and_names():
+    from datetime import date
+    assert cache.make_key('csv', 'd', 'BRENT', date(2017, 1, 1), None) == \
+        cache.make_key('csv', 'd', ['BRENT'], '2017-01-01', '')
+
+
+class Test_ResponseCache(TestCaseBase):
+
+    def _make_app(self):
+        app = super()._make_app()
+        app.config['RESPONSE_CACHE_BYTES'] = 1024 * 1024
+        return app
+
+    def get_text(self, url, **params):
+        response = self.client.get(url, query_string=params)
+        return response.get_data().decode('utf-8')
+
+    @property
+    def entries(self):
+        return cache.current().entries
+
+    def upload(self, datapoints):
+        return self.client.post('/api/datapoints',
+                                data=json.dumps(datapoints),
+                                headers=dict(API_TOKEN='token'))
+
+    def test_repeated_request_is_served_from_cache(self):
+        first = self.get_text('/api/frame', freq='q')
+        assert len(self.entries) == 1
+        assert self.get_text('/api/frame', freq='q') == first
+
+    def test_custom_api_shares_entry_with_series(self):
+        self.get_text('/api/series', name='GDP_yoy', freq='q',
+                      start_date='2016-01-01', end_date='2016-12-31')
+        self.get_text('/ru/series/GDP/q/yoy/2016/2016')
+        assert len(self.entries) == 1
+
+    def test_upload_invalidates_affected_series_only(self):
+        self.get_text('/api/datapoints', name='GDP_yoy', freq='q')
+        self.get_text('/api/series', name='BRENT', freq='d')
+        self.upload([dict(name='BRENT', freq='d',
+                          date='2017-01-02', value=55.0)])
+        assert [key[2] for key in self.entries] == [('GDP_yoy',)]
+        text = self.get_text('/api/series', name='BRENT', freq='d')
+        assert text.endswith('2017-01-02,55.0\n')
+
+    def test_failed_upload_keeps_cache(self):
+        self.get_text('/api/series', name='BRENT', freq='d')
+        self.upload([dict(name='BRENT', freq='d',
+                          date='2017-01-02', value=55.0),
+                     dict(name='BRENT')])
+        assert len(self.entries) == 1
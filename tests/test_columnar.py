@@ -0,0 +1,69 @@
+import io
+
+import pytest
+
+from tests.test_basic import TestCaseBase
+
+pyarrow = pytest.importorskip('pyarrow')
+import pyarrow.ipc  # noqa: E402
+import pyarrow.parquet  # noqa: E402
+
+
+def read_arrow(body):
+    return pyarrow.ipc.open_file(pyarrow.py_buffer(body)).read_all()
+
+
+def read_parquet(body):
+    return pyarrow.parquet.read_table(io.BytesIO(body))
+
+
+class Test_Columnar(TestCaseBase):
+
+    def get(self, url, headers=None, **params):
+        response = self.client.get(url, query_string=params,
+                                   headers=headers or {})
+        assert response.status_code == 200
+        return response
+
+    def test_series_as_arrow_has_typed_columns(self):
+        response = self.get('/api/series', name='CPI_NONFOOD_rog', freq='m',
+                            format='arrow')
+        assert response.mimetype == 'application/vnd.apache.arrow.file'
+        table = read_arrow(response.get_data())
+        assert table.schema.field('date').type == pyarrow.date32()
+        assert table.schema.field('CPI_NONFOOD_rog').type == \
+            pyarrow.float64()
+        expected = self._subset_test_data('CPI_NONFOOD_rog', 'm')
+        assert [dt.strftime('%Y-%m-%d')
+                for dt in table.column('date').to_pylist()] == \
+            [d['date'] for d in expected]
+        assert table.column('CPI_NONFOOD_rog').to_pylist() == \
+            [d['value'] for d in expected]
+
+    def test_datapoints_format_chosen_by_accept_header(self):
+        headers = {'Accept': 'application/vnd.apache.parquet'}
+        response = self.get('/api/datapoints', headers=headers,
+                            name='BRENT', freq='d')
+        assert response.mimetype == 'application/vnd.apache.parquet'
+        assert 'Accept' in response.vary
+        table = read_parquet(response.get_data())
+        assert table.schema.metadata[b'freq'] == b'd'
+
+    def test_frame_as_parquet_has_nulls_for_missing_values(self):
+        response = self.get('/api/frame', name='BRENT,USDRUR_CB', freq='d',
+                            format='parquet')
+        table = read_parquet(response.get_data())
+        assert table.column_names == ['date', 'BRENT', 'USDRUR_CB']
+        csv = self.get('/api/frame', name='BRENT,USDRUR_CB', freq='d')
+        assert table.num_rows == len(csv.get_data().splitlines()) - 1
+        assert table.column('BRENT').null_count > 0
+
+    def test_custom_api_finaliser(self):
+        response = self.get('/ru/series/BRENT/d/2016/arrow')
+        table = read_arrow(response.get_data())
+        assert table.column_names == ['date', 'BRENT']
+
+    def test_bad_frame_format_fails(self):
+        response = self.client.get('/api/frame', query_string=dict(
+            freq='d', format='ndjson'))
+        assert response.status_code == 422
@@ -0,0 +1,125 @@
+import gzip
+import io
+import json
+
+import pytest
+
+import db.api.cache as cache
+import db.api.compression as compression
+from tests.test_basic import TestCaseBase
+from werkzeug.datastructures import Accept
+
+
+def accept(value):
+    return Accept([(item, 1) for item in value.split(',')])
+
+
+def test_negotiate_prefers_zstd_on_tie():
+    pytest.importorskip('zstandard')
+    assert compression.negotiate(accept('gzip,zstd')) == 'zstd'
+    assert compression.negotiate(accept('gzip')) == 'gzip'
+    assert compression.negotiate(accept('br')) is None
+
+
+def test_compressed_chunks_are_same_as_compressed_body():
+    chunks = [b'2017-01-01,1.0\n' * 100, b'2017-01-02,2.0\n' * 100]
+    for encoding in compression.ENCODINGS:
+        stream = b''.join(compression.compress_chunks(iter(chunks),
+                                                      encoding))
+        decoder = compression.decompress(io.BytesIO(stream), encoding)
+        assert decoder.read() == b''.join(chunks)
+
+
+class Test_Compression(TestCaseBase):
+
+    params = dict(name='BRENT', freq='d')
+
+    def get(self, url='/api/series', encoding='gzip', etag=None, **params):
+        headers = {'Accept-Encoding': encoding}
+        if etag:
+            headers['If-None-Match'] = f'"{etag}"'
+        response = self.client.get(url,
+                                   query_string=dict(self.params, **params),
+                                   headers=headers)
+        # read streamed body, as server does
+        response.get_data()
+        return response
+
+    def test_gzip_response_is_same_as_plain_response(self):
+        for url in ['/api/series', '/api/datapoints', '/api/frame']:
+            plain = self.get(url, encoding='identity')
+            response = self.get(url)
+            assert plain.headers.get('Content-Encoding') is None
+            assert response.headers['Content-Encoding'] == 'gzip'
+            assert 'Accept-Encoding' in response.vary
+            assert gzip.decompress(response.get_data()) == plain.get_data()
+
+    def test_image_is_not_compressed(self):
+        response = self.get('/api/spline')
+        assert response.headers.get('Content-Encoding') is None
+
+    def test_compressed_response_etag_revalidates(self):
+        plain_etag = self.get(encoding='identity').get_etag()[0]
+        etag = self.get().get_etag()[0]
+        assert etag == plain_etag + '-gzip'
+        response = self.get(etag=etag)
+        assert response.status_code == 304
+        assert response.get_etag()[0] == etag
+
+    def test_post_gzip_body(self):
+        point = dict(name='BRENT', freq='d', date='2017-01-02', value=55.0)
+        body = gzip.compress(json.dumps([point]).encode('utf-8'))
+        response = self.client.post('/api/datapoints', data=body,
+                                    headers={'API_TOKEN': 'token',
+                                             'Content-Encoding': 'gzip'})
+        assert response.status_code == 200
+        result = json.loads(response.get_data().decode('utf-8'))
+        assert result['inserted'] == 1
+
+    def test_post_zstd_ndjson_body(self):
+        zstandard = pytest.importorskip('zstandard')
+        points = [dict(name='BRENT', freq='d', date=f'2017-01-0{day}',
+                       value=55.0) for day in (2, 3)]
+        text = '\n'.join(json.dumps(point) for point in points)
+        body = zstandard.ZstdCompressor().compress(text.encode('utf-8'))
+        response = self.client.post('/api/datapoints', data=body,
+                                    content_type='application/x-ndjson',
+                                    headers={'API_TOKEN': 'token',
+                                             'Content-Encoding': 'zstd'})
+        assert response.status_code == 200
+        result = json.loads(response.get_data().decode('utf-8'))
+        assert result['inserted'] == 2
+
+    def test_post_with_unknown_encoding_fails(self):
+        response = self.client.post('/api/datapoints', data=b'[]',
+                                    headers={'API_TOKEN': 'token',
+                                             'Content-Encoding': 'br'})
+        assert response.status_code == 400
+
+
+class Test_CachedCompression(Test_Compression):
+
+    def _make_app(self):
+        app = super()._make_app()
+        app.config['RESPONSE_CACHE_BYTES'] = 1024 * 1024
+        return app
+
+    def test_cached_variant_is_compressed_once(self):
+        calls = []
+        compress = compression.compress
+
+        def counting_compress(body, encoding):
+            calls.append(encoding)
+            return compress(body, encoding)
+
+        compression.compress = counting_compress
+        try:
+            plain = self.get(encoding='identity').get_data()
+            bodies = [self.get().get_data() for _ in range(3)]
+        finally:
+            compression.compress = compress
+        assert calls == ['gzip']
+        assert all(gzip.decompress(body) == plain for body in bodies)
+        entry = next(iter(cache.current().entries.values()))
+        assert cache.current().size == len(entry.body) + \
+            len(entry.variants['gzip'])
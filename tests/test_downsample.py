@@ -0,0 +1,81 @@
+import json
+from datetime import date
+
+import numpy as np
+
+import db.api.downsample as downsample
+from db.api.models import Point
+from tests.test_basic import TestCaseBase
+
+
+def test_lttb_keeps_all_points_if_there_are_few():
+    assert downsample.lttb([1, 2, 3], [1.0, 2.0, 3.0], 5).tolist() == [0, 1, 2]
+
+
+def test_lttb_keeps_ends_and_extremes():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    y[321], y[777] = 10.0, -10.0
+    index = downsample.lttb(x, y, 50)
+    assert len(index) == 50
+    assert index[0] == 0 and index[-1] == 999
+    assert (np.diff(index) > 0).all()
+    assert {321, 777} <= set(index.tolist())
+
+
+def test_lttb_chooses_largest_triangle_in_bucket():
+    y = [0.0, 1.0, 0.0, 5.0, 0.0, 1.0, 0.0, -4.0, 0.0, 1.0]
+    assert downsample.lttb(range(10), y, 5).tolist() == [0, 2, 3, 7, 9]
+
+
+def test_points_and_columns_choose_same_datapoints():
+    points = [Point('A', 'd', date.fromordinal(730000 + i), float(i % 7))
+              for i in range(100)]
+    chosen = downsample.points(iter(points), 10)
+    dates = np.array([p.date.toordinal() for p in points])[::-1]
+    values = np.array([p.value for p in points])[::-1]
+    columns = (['A'], np.zeros(100, dtype='int64'), dates, values)
+    _, _, dates, values = downsample.columns(columns, 10)
+    assert [p.date.toordinal() for p in chosen] == dates.tolist()
+    assert [p.value for p in chosen] == values.tolist()
+
+
+class Test_API_Max_Points(TestCaseBase):
+
+    params = dict(name='USDRUR_CB', freq='d')
+
+    def get(self, url, **params):
+        response = self.client.get(url, query_string=dict(self.params,
+                                                          **params))
+        response.get_data()
+        return response
+
+    def test_datapoints_json_has_at_most_max_points(self):
+        full = json.loads(self.get('/api/datapoints').get_data())
+        data = json.loads(self.get('/api/datapoints',
+                                   max_points=10).get_data())
+        assert len(full) > 10
+        assert len(data) == 10
+        assert data[0] == full[0] and data[-1] == full[-1]
+
+    def test_datapoints_columns_and_series_csv(self):
+        data = json.loads(self.get('/api/datapoints', orient='columns',
+                                   max_points=10).get_data())
+        assert len(data['dates']) == len(data['values']) == 10
+        csv = self.get('/api/series', max_points=10).get_data().decode()
+        # header and a line per datapoint
+        assert len(csv.strip().split('\n')) == 11
+
+    def test_max_points_changes_etag(self):
+        full = self.get('/api/datapoints').headers['ETag']
+        assert self.get('/api/datapoints',
+                        max_points=10).headers['ETag'] != full
+
+    def test_spline_with_max_points(self):
+        response = self.get('/api/spline', max_points=20)
+        assert response.status_code == 200
+        assert response.data != self.get('/api/spline').data
+
+    def test_too_small_max_points_returns_error(self):
+        assert self.get('/api/datapoints', max_points=2).status_code == 422
+        assert self.get('/api/spline', max_points=0).status_code == 422
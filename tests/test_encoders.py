@@ -0,0 +1,38 @@
+import json
+
+import numpy as np
+import pytest
+
+import db.api.encoders as encoders
+from tests.test_basic import TestCaseBase
+
+DATA = dict(name='A', dates=['2017-01-01', '2017-01-02'],
+            values=np.array([1.5, np.nan]),
+            matrix=np.array([[1.0, np.nan], [2.0, 3.0]]),
+            index=np.array([1, 2]))
+
+EXPECTED = dict(name='A', dates=['2017-01-01', '2017-01-02'],
+                values=[1.5, None], matrix=[[1.0, None], [2.0, 3.0]],
+                index=[1, 2])
+
+
+def test_json_encoder_writes_nan_as_null():
+    assert json.loads(encoders._dumps_json(DATA)) == EXPECTED
+
+
+def test_orjson_encoder_is_same_as_json():
+    pytest.importorskip('orjson')
+    assert json.loads(encoders._dumps_orjson(DATA)) == EXPECTED
+
+
+class Test_Encoders(TestCaseBase):
+
+    def test_encoder_is_chosen_by_config(self):
+        encoders.register('upper', lambda obj: 'UPPER')
+        self.app.config['JSON_ENCODER'] = 'upper'
+        try:
+            assert encoders.dumps(DATA) == 'UPPER'
+        finally:
+            del encoders._encoders['upper']
+        self.app.config['JSON_ENCODER'] = 'json'
+        assert json.loads(encoders.dumps(DATA)) == EXPECTED
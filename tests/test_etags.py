@@ -0,0 +1,89 @@
+import json
+
+from db.api.queries import DatapointOperations
+from tests.test_basic import TestCaseBase
+
+
+class Test_ETags(TestCaseBase):
+
+    params = dict(name='BRENT', freq='d')
+
+    def _make_app(self):
+        app = super()._make_app()
+        app.config['CLOSED_RANGE_MAX_AGE'] = 3600
+        return app
+
+    def get(self, url='/api/series', etag=None, **params):
+        headers = {'If-None-Match': f'"{etag}"'} if etag else {}
+        return self.client.get(url, query_string=dict(self.params, **params),
+                               headers=headers)
+
+    def upload(self, name):
+        point = dict(name=name, freq='d', date='2017-01-02', value=55.0)
+        self.client.post('/api/datapoints', data=json.dumps([point]),
+                         headers=dict(API_TOKEN='token'))
+
+    def test_matching_etag_returns_304_without_body(self):
+        etag = self.get().get_etag()[0]
+        response = self.get(etag=etag)
+        assert response.status_code == 304
+        assert response.get_data() == b''
+        assert response.get_etag()[0] == etag
+
+    def test_write_to_series_changes_etag(self):
+        etag = self.get().get_etag()[0]
+        self.upload('BRENT')
+        response = self.get(etag=etag)
+        assert response.status_code == 200
+        assert response.get_etag()[0] != etag
+
+    def test_write_to_other_series_keeps_etag(self):
+        etag = self.get().get_etag()[0]
+        self.upload('USDRUR_CB')
+        assert self.get(etag=etag).status_code == 304
+
+    def test_etag_changes_after_series_is_deleted_and_uploaded_again(self):
+        etag = self.get().get_etag()[0]
+        DatapointOperations.delete('d', 'BRENT', None, None)
+        self.client.post('/api/datapoints',
+                         data=json.dumps(self._subset_test_data('BRENT', 'd')),
+                         headers=dict(API_TOKEN='token'))
+        response = self.get(etag=etag)
+        assert response.status_code == 200
+        assert response.get_etag()[0] != etag
+
+    def test_etag_depends_on_query_and_format(self):
+        etags = {self.get().get_etag()[0],
+                 self.get(end_date='2016-06-02').get_etag()[0],
+                 self.get(url='/api/datapoints').get_etag()[0]}
+        assert len(etags) == 3
+
+    def test_closed_date_range_may_be_cached(self):
+        response = self.get(end_date='2016-06-02')
+        assert response.cache_control.public
+        assert response.cache_control.max_age == 3600
+
+    def test_revised_history_must_be_revalidated(self):
+        self.upload('BRENT')
+        assert self.get(end_date='2016-06-02').cache_control.public
+        point = dict(name='BRENT', freq='d', date='2016-06-01', value=1.0)
+        self.client.post('/api/datapoints', data=json.dumps([point]),
+                         headers=dict(API_TOKEN='token'))
+        assert self.get(end_date='2016-06-02').cache_control.no_cache
+        assert self.get(end_date='2016-05-31').cache_control.public
+
+    def test_deleted_history_must_be_revalidated(self):
+        DatapointOperations.delete('d', 'BRENT', '2016-09-01', '2016-09-30')
+        assert self.get(end_date='2016-10-31').cache_control.no_cache
+        assert self.get(end_date='2016-08-31').cache_control.public
+
+    def test_open_date_range_must_be_revalidated(self):
+        response = self.get(start_date='2016-06-02')
+        assert response.cache_control.no_cache
+
+    def test_frame_has_etag(self):
+        response = self.get(url='/api/frame', name='BRENT,USDRUR_CB')
+        etag = response.get_etag()[0]
+        response = self.get(url='/api/frame', etag=etag,
+                            name='BRENT,USDRUR_CB')
+        assert response.status_code == 304
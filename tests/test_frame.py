@@ -0,0 +1,110 @@
+import json
+
+import numpy as np
+import pytest
+
+import db.api.frame as frame
+from tests.test_basic import TestCaseBase
+from tests.test_blobs import TestCaseBlobs
+
+
+def test_pivot_fills_gaps_with_nan_and_repeats_columns():
+    dates, matrix = frame.pivot(['A', 'B'],
+                                np.array([0, 1, 0]),
+                                np.array([2, 1, 1]),
+                                np.array([20.0, 10.5, 10.0]),
+                                names=['B', 'A', 'B', 'C'])
+    assert dates.tolist() == [1, 2]
+    assert np.isnan(matrix[1, 0])
+    assert matrix[0].tolist()[:3] == [10.5, 10.0, 10.5]
+    assert np.isnan(matrix[:, 3]).all()
+
+
+def test_format_block_writes_empty_cells_for_nan():
+    dates = [frame.EPOCH_ORDINAL]
+    lines = frame.format_block(dates, np.array([[1.5, np.nan, 100.0]]))
+    assert lines == ['1970-01-01,1.5,,100.0']
+
+
+class FrameComparison:
+
+    queries = [
+        dict(freq='a'),
+        dict(freq='q'),
+        dict(freq='m'),
+        dict(freq='d'),
+        dict(freq='q', name='GDP_yoy,CPI_rog,GDP_yoy'),
+        dict(freq='d', name='USDRUR_CB,BRENT', start_date='2016-06-02',
+             end_date='2016-06-20'),
+    ]
+
+    def get_frame(self, **params):
+        response = self.client.get('/api/frame', query_string=params)
+        assert response.status_code == 200
+        return response.get_data()
+
+    def test_numpy_pivot_is_same_as_dict_pivot(self):
+        for params in self.queries:
+            assert self.get_frame(pivot='numpy', **params) == \
+                self.get_frame(pivot='dict', **params)
+
+    def test_streamed_frame_is_same_as_dict_pivot(self):
+        for params in self.queries:
+            assert self.get_frame(pivot='stream', **params) == \
+                self.get_frame(pivot='dict', **params)
+
+
+def test_stream_csv_yields_blocks_of_lines(monkeypatch):
+    from datetime import date
+    from db.api.models import Point
+    monkeypatch.setattr(frame, 'BLOCK_ROWS', 2)
+    points = [Point('A', 'd', date(2017, 1, day), float(day))
+              for day in range(1, 4)]
+    blocks = list(frame.stream_csv(iter(points), ['A']))
+    assert blocks == [',A\n2017-01-01,1.0\n',
+                      '2017-01-02,2.0\n2017-01-03,3.0\n',
+                      '']
+
+
+class Test_Frame(FrameComparison, TestCaseBase):
+
+    def test_streamed_frame_is_sent_as_stream(self):
+        response = self.client.get('/api/frame',
+                                   query_string=dict(freq='a',
+                                                     pivot='stream'))
+        assert response.is_streamed
+
+    def test_columns_frame_has_null_for_missing_values(self):
+        response = self.client.get('/api/frame', query_string=dict(
+            freq='d', name='BRENT,USDRUR_CB', orient='columns'))
+        data = json.loads(response.get_data().decode('utf-8'))
+        assert data['freq'] == 'd'
+        assert data['names'] == ['BRENT', 'USDRUR_CB']
+        csv_rows = self.get_frame(freq='d', name='BRENT,USDRUR_CB') \
+            .decode('utf-8').splitlines()[1:]
+        assert data['dates'] == [row.split(',')[0] for row in csv_rows]
+        brent = [row.split(',')[1] for row in csv_rows]
+        assert [str(v) if v is not None else '' for v in data['values'][0]] \
+            == brent
+        assert None in data['values'][0]
+
+    def test_bad_pivot_returns_error(self):
+        response = self.client.get('/api/frame',
+                                   query_string=dict(freq='a', pivot='xyz'))
+        assert response.status_code == 422
+
+
+class Test_FrameOfBlobs(FrameComparison, TestCaseBlobs):
+    pass
+
+
+class Test_FrameOfReplica(FrameComparison, TestCaseBase):
+
+    def _make_app(self):
+        app = super()._make_app()
+        app.config['READ_REPLICA'] = True
+        return app
+
+
+if __name__ == '__main__':  # pragma: no cover
+    pytest.main([__file__])
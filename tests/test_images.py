@@ -1,5 +1,10 @@
 #FIXME: msut use https://github.com/mini-kep/guidelines/blob/master/testing.md
 
+import json
+import struct
+import threading
+
+import matplotlib.pyplot as plt
 import pytest
 from datetime import date
 
@@ -77,6 +82,80 @@ class Test_Utils_Spline(TestCaseBase):
         assert response.data == png_output
 
 
+def png_size(png_output):
+    # width and height from IHDR chunk
+    return struct.unpack('>II', png_output[16:24])
+
+
+class Test_Spline_Renderer(TestCaseBase):
+
+    def query_spline(self, **params):
+        params = dict(dict(name='CPI_NONFOOD_rog', freq='m'), **params)
+        return self.client.get('/api/spline', query_string=params)
+
+    def test_rendering_leaves_no_pyplot_figures(self):
+        figures = plt.get_fignums()
+        self.query_spline()
+        assert plt.get_fignums() == figures
+
+    def test_size_and_dpi_set_image_size(self):
+        assert png_size(self.query_spline().data) == (200, 60)
+        response = self.query_spline(width=3, height=1, dpi=50)
+        assert png_size(response.data) == (150, 50)
+
+    def test_too_large_image_returns_error(self):
+        assert self.query_spline(width=100).status_code == 422
+
+    def test_renders_in_threads(self):
+        data = DatapointOperations.select('m', 'CPI_NONFOOD_rog', None, None)
+        data = list(data)
+        expected = image.make_png(data)
+        results = []
+
+        def render():
+            results.append(image.make_png(data))
+
+        threads = [threading.Thread(target=render) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [expected] * 8
+
+    def test_repeated_request_is_served_from_cache(self):
+        calls = []
+        make_png = image.make_png
+
+        def counting_make_png(*args, **kwargs):
+            calls.append(1)
+            return make_png(*args, **kwargs)
+
+        image.make_png = counting_make_png
+        try:
+            first = self.query_spline().data
+            assert self.query_spline().data == first
+            assert len(calls) == 1
+            point = dict(name='CPI_NONFOOD_rog', freq='m',
+                         date='2017-01-31', value=100.5)
+            self.client.post('/api/datapoints', data=json.dumps([point]),
+                             headers=dict(API_TOKEN='token'))
+            self.query_spline()
+            assert len(calls) == 2
+        finally:
+            image.make_png = make_png
+
+
+    def test_series_uploaded_again_is_not_served_from_cache(self):
+        first = self.query_spline().data
+        data = self._subset_test_data('CPI_NONFOOD_rog', 'm')
+        DatapointOperations.delete('m', 'CPI_NONFOOD_rog', None, None)
+        for i, datapoint in enumerate(data):
+            datapoint['value'] = float(i % 2)
+        self.client.post('/api/datapoints', data=json.dumps(data),
+                         headers=dict(API_TOKEN='token'))
+        assert self.query_spline().data != first
+
+
 # FIXME: more this to parameters.py testing of arg classes
 class Test_API_Spline_Errors(TestCaseBase):
 
@@ -0,0 +1,73 @@
+import io
+import json
+from datetime import date
+
+import pytest
+
+import db.api.ingest as ingest
+from db.api.errors import CustomError400
+
+DATAPOINTS = [
+    dict(name='BRENT', freq='d', date='2016-06-01', value=48.81),
+    dict(name='BRENT', freq='d', date='2016-06-02', value=49),
+    dict(name='GDP_yoy', freq='a', date='2016-12-31', value=99.8),
+]
+
+
+def as_stream(text):
+    return io.BytesIO(text.encode('utf-8'))
+
+
+def read(text, mimetype=None):
+    return list(ingest.read_datapoints(as_stream(text), mimetype))
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    # make values span several blocks
+    monkeypatch.setattr(ingest, 'BLOCK_SIZE', 7)
+
+
+def test_json_array_is_read_across_blocks(small_blocks):
+    result = read(json.dumps(DATAPOINTS, indent=2))
+    assert [d['value'] for d in result] == [48.81, 49.0, 99.8]
+    assert result[0]['date'] == date(2016, 6, 1)
+
+
+def test_empty_array_yields_nothing():
+    assert read(' [ ] ') == []
+
+
+def test_ndjson_is_read_line_by_line():
+    text = '\n'.join(json.dumps(d) for d in DATAPOINTS) + '\n\n'
+    result = read(text, mimetype='application/x-ndjson')
+    assert [d['name'] for d in result] == ['BRENT', 'BRENT', 'GDP_yoy']
+
+
+def test_ndjson_is_read_across_blocks(small_blocks):
+    text = '\n'.join(json.dumps(d) for d in DATAPOINTS)
+    result = read(text, mimetype='application/x-ndjson')
+    assert [d['value'] for d in result] == [48.81, 49.0, 99.8]
+
+
+@pytest.mark.parametrize('text, index', [
+    ('not json', 0),
+    ('[{"name": "BRENT"}]', 0),
+    ('[' + json.dumps(DATAPOINTS[0]) + ', {"broken": ]', 1),
+    (json.dumps(DATAPOINTS[:2] + [dict(DATAPOINTS[2], date='2016-13-01')]),
+     2),
+    (json.dumps(DATAPOINTS) + ' []', 3),
+])
+def test_error_reports_index_of_failing_datapoint(text, index, small_blocks):
+    with pytest.raises(CustomError400) as e:
+        read(text)
+    assert e.value.payload == dict(index=index)
+
+
+def test_reading_is_lazy():
+    # first datapoint is available before error further in stream
+    datapoints = ingest.read_datapoints(
+        as_stream('[' + json.dumps(DATAPOINTS[0]) + ', ]'))
+    assert next(datapoints)['name'] == 'BRENT'
+    with pytest.raises(CustomError400):
+        next(datapoints)
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+from db import get_app
+from db import db as fsa_db
+from db.api.queries import DatapointOperations, SeriesOperations, name_values
+import db_migrate
+
+LEGACY_SCHEMA = """CREATE TABLE datapoint (
+    id INTEGER NOT NULL,
+    name VARCHAR NOT NULL,
+    freq VARCHAR NOT NULL,
+    date DATE NOT NULL,
+    value FLOAT NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (name, freq, date))"""
+
+LEGACY_ROWS = [
+    (1, 'BRENT', 'd', '2016-06-01', 48.81),
+    (2, 'BRENT', 'd', '2016-06-02', 49.05),
+    (3, 'GDP_yoy', 'a', '2016-12-31', 99.8),
+]
+
+
+class Test_Migrate(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.app = get_app()
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + self.path
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        fsa_db.init_app(app=self.app)
+        with self.app.app_context():
+            fsa_db.engine.execute(LEGACY_SCHEMA)
+            for row in LEGACY_ROWS:
+                fsa_db.engine.execute(
+                    'INSERT INTO datapoint VALUES (?, ?, ?, ?, ?)', row)
+
+    def tearDown(self):
+        with self.app.app_context():
+            fsa_db.session.remove()
+            fsa_db.engine.dispose()
+        os.remove(self.path)
+
+    def test_migrate_moves_datapoints_and_builds_catalog(self):
+        db_migrate.migrate(self.app)
+        with self.app.app_context():
+            assert not db_migrate.is_legacy(fsa_db.engine)
+            assert name_values() == ['BRENT', 'GDP_yoy']
+            data = DatapointOperations.select('d', 'BRENT', None, None)
+            assert [d.value for d in data] == [48.81, 49.05]
+            series = SeriesOperations.get('BRENT', 'd')
+            assert series.count == 2
+            assert series.last_value == 49.05
+
+    def test_pack_blobs_copies_datapoints(self):
+        db_migrate.migrate(self.app)
+        db_migrate.pack_blobs(self.app)
+        self.app.config['STORAGE_ENGINE'] = 'blob'
+        with self.app.app_context():
+            data = DatapointOperations.select('d', 'BRENT', None, None)
+            assert [d.value for d in data] == [48.81, 49.05]
+
+    def test_migrate_adds_vintages_to_new_layout(self):
+        db_migrate.migrate(self.app)
+        with self.app.app_context():
+            # database in new layout before vintages were introduced
+            fsa_db.engine.execute('ALTER TABLE datapoint '
+                                  'DROP COLUMN vintage_id')
+            assert not db_migrate.has_column(fsa_db.engine,
+                                             'datapoint', 'vintage_id')
+        db_migrate.migrate(self.app)
+        with self.app.app_context():
+            assert db_migrate.has_column(fsa_db.engine,
+                                         'datapoint', 'vintage_id')
+            data = DatapointOperations.select('d', 'BRENT', None, None,
+                                              as_of=0)
+            assert [d.value for d in data] == [48.81, 49.05]
+
+    def test_migrate_twice_is_harmless(self):
+        db_migrate.migrate(self.app)
+        db_migrate.migrate(self.app)
+        with self.app.app_context():
+            assert name_values('a') == ['GDP_yoy']
+
+
+if __name__ == '__main__':  # pragma: no cover
+    unittest.main()
@@ -1,5 +1,10 @@
+import json
+
+import db.api.reads as reads
 from tests.test_basic import TestCaseBase
-from db.api.queries import DatapointOperations
+from db.api.models import Revision, Vintage
+from db.api.queries import (DatapointOperations, SeriesOperations,
+                            VintageOperations, name_values, date_as_str)
 from datetime import date
 
 
@@ -60,16 +65,180 @@ class TestUpsertDatapoint(TestCaseBase):
         assert datapoint.serialized == self.dp1_dict_updated
 
 
+class TestUpsertManyDatapoints(TestCaseBase):
+
+    def test_upsert_many_counts_inserted_and_updated(self):
+        datapoints = [
+            dict(date="2016-12-31", freq='q', name="CPI_rog", value=1.0),
+            dict(date="2017-03-31", freq='q', name="CPI_rog", value=2.0),
+            dict(date="2017-03-31", freq='q', name="NEW_rog", value=3.0)]
+        assert DatapointOperations.upsert_many(datapoints) == (2, 1)
+        series = SeriesOperations.get('NEW_rog', 'q')
+        assert series.last_value == 3.0
+
+    def test_upsert_many_uses_last_of_duplicates_in_batch(self):
+        datapoints = [
+            dict(date="2017-03-31", freq='q', name="CPI_rog", value=2.0),
+            dict(date="2017-03-31", freq='q', name="CPI_rog", value=4.0)]
+        assert DatapointOperations.upsert_many(datapoints) == (1, 0)
+        data = DatapointOperations.select('q', 'CPI_rog', '2017-01-01', None)
+        assert [d.value for d in data] == [4.0]
+        assert SeriesOperations.get('CPI_rog', 'q').last_value == 4.0
+
+    def test_upsert_many_does_not_count_unchanged_values(self):
+        datapoints = [
+            dict(date="2016-12-31", freq='q', name="CPI_rog", value=101.3),
+            dict(date="2016-09-30", freq='q', name="CPI_rog", value=1.0)]
+        assert DatapointOperations.upsert_many(datapoints) == (0, 1)
+        assert DatapointOperations.upsert_many(datapoints) == (0, 0)
+
+
+class TestVintages(TestCaseBase):
+
+    def revise(self, value):
+        datapoints = [dict(date="2016-12-31", freq='q', name="CPI_rog",
+                           value=value)]
+        vintage = VintageOperations.create()
+        DatapointOperations.upsert_many(datapoints, vintage)
+        return vintage.id
+
+    def values_as_of(self, vintage_id):
+        data = DatapointOperations.select('q', 'CPI_rog', '2016-12-31',
+                                          '2016-12-31', as_of=vintage_id)
+        return [d.value for d in data]
+
+    def test_changed_value_is_kept_as_revision(self):
+        first = self.revise(1.0)
+        second = self.revise(2.0)
+        assert Revision.query.count() == 2
+        assert self.values_as_of(first - 1) == [101.3]
+        assert self.values_as_of(first) == [1.0]
+        assert self.values_as_of(second) == [2.0]
+
+    def test_same_value_makes_no_revision(self):
+        self.revise(1.0)
+        self.revise(1.0)
+        assert Revision.query.count() == 1
+
+    def test_write_that_changes_nothing_makes_no_vintage(self):
+        point = dict(date="2016-12-31", freq='q', name="CPI_rog",
+                     value=101.3)
+        DatapointOperations.upsert(point)
+        DatapointOperations.upsert_many([point])
+        DatapointOperations.delete(freq='q', name='CPI_rog',
+                                   start_date='2017-01-01', end_date=None)
+        assert Vintage.query.count() == 0
+
+    def test_writes_of_transaction_share_vintage(self):
+        DatapointOperations.upsert(dict(date="2017-03-31", freq='q',
+                                        name="CPI_rog", value=1.0))
+        DatapointOperations.upsert_many([dict(date="2016-12-31", freq='q',
+                                              name="CPI_rog", value=2.0)])
+        DatapointOperations.delete(freq='q', name='CPI_rog',
+                                   start_date='2016-12-31', end_date=None)
+        assert Vintage.query.count() == 1
+        assert self.values_as_of(0) == [101.3]
+        self.revise(3.0)
+        assert Vintage.query.count() == 2
+
+    def test_resolve_date_before_first_vintage_is_zero(self):
+        self.revise(1.0)
+        assert VintageOperations.resolve('2000-01-01') == 0
+        assert VintageOperations.resolve('2100-01-01') == 1
+        assert VintageOperations.resolve('5') == 5
+
+
 class TestDeleteDatapoint(TestCaseBase):
 
     def test_delete(self):
         param = dict(freq='q', name='GDP_yoy', start_date=None, end_date=None)
         count_before_delete = DatapointOperations.select(**param).count()
         assert count_before_delete > 0
-        DatapointOperations.delete(**param)
+        deleted = DatapointOperations.delete(**param)
+        assert deleted == count_before_delete
         count_after_delete = DatapointOperations.select(**param).count()
         assert count_after_delete == 0
 
+class TestSeriesCatalog(TestCaseBase):
+
+    def series(self, name='CPI_rog', freq='q'):
+        return SeriesOperations.get(name, freq)
+
+    def test_catalog_matches_test_data_after_bulk_insert(self):
+        data = self._subset_test_data('CPI_rog', 'q')
+        series = self.series()
+        assert series.count == len(data)
+        assert date_as_str(series.first_date) == data[0]['date']
+        assert date_as_str(series.last_date) == data[-1]['date']
+        assert series.last_value == data[-1]['value']
+
+    def test_upsert_of_new_last_date_updates_catalog(self):
+        count = self.series().count
+        DatapointOperations.upsert(dict(date="2017-03-31", freq='q',
+                                        name="CPI_rog", value=100.5))
+        series = self.series()
+        assert series.count == count + 1
+        assert series.last_date == date(2017, 3, 31)
+        assert series.last_value == 100.5
+
+    def test_upsert_of_existing_datapoint_keeps_count(self):
+        count = self.series().count
+        DatapointOperations.upsert(dict(date="2016-12-31", freq='q',
+                                        name="CPI_rog", value=0.5))
+        series = self.series()
+        assert series.count == count
+        assert series.last_value == 0.5
+
+    def test_upsert_of_new_series_creates_catalog_entry(self):
+        DatapointOperations.upsert(dict(date="2016-04-21", freq='q',
+                                        name="NEW_rog", value=1.0))
+        assert 'NEW_rog' in name_values('q')
+        assert self.series('NEW_rog').count == 1
+
+    def test_partial_delete_refreshes_catalog(self):
+        DatapointOperations.delete(freq='q', name='CPI_rog',
+                                   start_date=date(2016, 12, 1),
+                                   end_date=None)
+        series = self.series()
+        assert series.last_date == date(2016, 9, 30)
+        assert series.last_value == 100.7
+
+    def test_delete_by_list_of_names(self):
+        count = DatapointOperations.delete(freq='q',
+                                           name=['CPI_rog', 'GDP_yoy'],
+                                           start_date=None, end_date=None)
+        assert count == 6
+        assert 'GDP_yoy' not in name_values('q')
+
+    def test_full_delete_keeps_empty_catalog_entry(self):
+        version = self.series().version
+        DatapointOperations.delete(freq='q', name='CPI_rog',
+                                   start_date=None, end_date=None)
+        series = self.series()
+        assert series.count == 0
+        assert series.last_date is None
+        assert series.version > version
+        assert 'CPI_rog' not in name_values('q')
+        assert 'CPI_rog' in reads.known_names('q')
+
+    def test_deleted_series_is_read_as_of_earlier_vintage(self):
+        count = len(self._subset_test_data('CPI_rog', 'q'))
+        DatapointOperations.delete(freq='q', name='CPI_rog',
+                                   start_date=None, end_date=None)
+        # test data is written before first vintage
+        points = DatapointOperations.select('q', 'CPI_rog', None, None,
+                                            as_of=0)
+        assert len(points) == count
+        response = self.client.get('/api/datapoints', query_string=dict(
+            name='CPI_rog', freq='q', as_of=0))
+        assert response.status_code == 200
+        assert len(json.loads(response.get_data())) == count
+        response = self.client.get('/api/datapoints', query_string=dict(
+            name='CPI_rog', freq='q'))
+        response.get_data()
+        assert response.status_code == 422
+
+
 # WONTFIX: we are skipping a check if datapoint exist in the original function
 #          (but the idea is good)
 #
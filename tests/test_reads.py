@@ -0,0 +1,71 @@
+import pytest
+
+import db.api.reads as reads
+from db import db as fsa_db
+from db.api.models import Datapoint, Point
+from db.api.queries import DatapointOperations
+from tests.test_basic import TestCaseBase
+
+
+class Test_Reads(TestCaseBase):
+
+    def test_points_are_same_as_orm_query(self):
+        query = Datapoint.query.join(Datapoint.series) \
+            .filter(Datapoint.date >= '2016-10-01') \
+            .order_by(Datapoint.date, Datapoint.series_id)
+        expected = [d.serialized for d in query]
+        data = reads.points(None, None, '2016-10-01', None)
+        assert sorted([p.serialized for p in data],
+                      key=lambda d: d['date']) == \
+            sorted(expected, key=lambda d: d['date'])
+        assert isinstance(data.first(), Point)
+
+    def test_read_does_not_fill_identity_map(self):
+        fsa_db.session.expunge_all()
+        data = DatapointOperations.select('d', 'BRENT', None, None)
+        assert data.count() > 0
+        assert len(fsa_db.session.identity_map) == 0
+
+    def test_statement_is_compiled_once_for_each_shape(self):
+        reads.points('d', ['BRENT'], '2016-06-01', None)
+        compiled = len(reads.compiled_cache())
+        for day in range(2, 10):
+            data = reads.points('d', ['BRENT', 'USDRUR_CB'],
+                                f'2016-06-0{day}', None)
+            assert data.count() > 0
+        assert len(reads.compiled_cache()) == compiled
+
+    def test_compiled_cache_is_kept_by_app(self):
+        reads.points('d', ['BRENT'], None, None)
+        cache = reads.compiled_cache()
+        assert 0 < len(cache) <= reads.COMPILED_CACHE_SIZE
+        assert self.app.extensions['compiled_cache'] is cache
+
+    def test_stream_is_same_as_points(self):
+        expected = list(reads.points('m', None, None, None))
+        streamed = list(reads.stream('m', None, None, None, batch_size=7))
+        assert streamed == expected
+
+    def test_stream_fetches_first_batch_on_call(self):
+        expected = list(reads.points('m', None, None, None))
+        rows = reads.stream('m', None, None, None, batch_size=1000)
+        Datapoint.query.delete()
+        assert list(rows) == expected
+
+    def test_pending_datapoint_is_read(self):
+        DatapointOperations.upsert(dict(name='BRENT', freq='d',
+                                        date='2017-01-02', value=55.0))
+        data = reads.points('d', ['BRENT'], '2017-01-02', None)
+        assert [p.value for p in data] == [55.0]
+
+    def test_catalog_reads(self):
+        assert reads.frequencies('BRENT') == ['d']
+        assert 'BRENT' in reads.names('d')
+        assert reads.summary('NO_SUCH_VAR', 'd') is None
+        assert reads.versions('d', []) == []
+        name, version, _ = reads.versions('d', ['BRENT'])[0]
+        assert name == 'BRENT'
+
+
+if __name__ == '__main__':  # pragma: no cover
+    pytest.main([__file__])
@@ -0,0 +1,52 @@
+import json
+
+from sqlalchemy import event
+
+import db.api.registry as registry
+from db import db as fsa_db
+from db.api.parameters import RequestArgs, RequestFrameArgs
+from tests.test_basic import TestCaseBase
+from tests.test_parameters import SimRequest
+
+
+class Test_Registry(TestCaseBase):
+
+    def count_queries(self, func):
+        statements = []
+
+        def before_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(fsa_db.engine, 'before_cursor_execute', before_execute)
+        try:
+            func()
+        finally:
+            event.remove(fsa_db.engine, 'before_cursor_execute',
+                         before_execute)
+        return len(statements)
+
+    def test_registry_lists_names_by_frequency(self):
+        assert registry.current().has('BRENT', 'd')
+        assert not registry.current().has('BRENT', 'q')
+        assert 'd' in registry.current().frequencies()
+
+    def test_validation_does_not_query_database(self):
+        registry.current().get()
+        request = SimRequest(name='GDP_yoy,CPI_rog', freq='a')
+        assert self.count_queries(lambda: RequestArgs(request)) == 0
+        assert self.count_queries(lambda: RequestFrameArgs(request)) == 0
+
+    def test_commit_of_new_series_reloads_registry(self):
+        version = registry.current().get().version
+        point = dict(name='NEW_rog', freq='d', date='2017-01-02', value=1.0)
+        self.client.post('/api/datapoints', data=json.dumps([point]),
+                         headers=dict(API_TOKEN='token'))
+        assert registry.current().get().version > version
+        response = self.client.get('/api/names/d')
+        assert 'NEW_rog' in json.loads(response.get_data().decode('utf-8'))
+
+    def test_custom_api_rejects_unknown_name(self):
+        response = self.client.get('/ru/series/NO_SUCH_VAR/m')
+        assert response.status_code == 400
+        response = self.client.get('/ru/series/NO_SUCH_VAR/m/info')
+        assert response.status_code == 400
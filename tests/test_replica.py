@@ -0,0 +1,79 @@
+import json
+
+import db.api.replica as replica
+from db import db as fsa_db
+from db.api.queries import DatapointOperations
+from tests.test_basic import TestCaseBase
+from tests.test_blobs import TestCaseBlobs
+
+
+class TestCaseReplica(TestCaseBase):
+
+    def _make_app(self):
+        app = super()._make_app()
+        app.config['READ_REPLICA'] = True
+        return app
+
+    def select_values(self, name, freq, start_date=None, end_date=None):
+        data = DatapointOperations.select(freq, name, start_date, end_date)
+        return [p.value for p in data]
+
+
+class Test_Replica(TestCaseReplica):
+
+    def test_select_matches_test_data(self):
+        data = DatapointOperations.select('m', 'CPI_NONFOOD_rog', None, None)
+        expected = self._subset_test_data('CPI_NONFOOD_rog', 'm')
+        assert [p.serialized for p in data] == expected
+
+    def test_select_slices_by_dates(self):
+        values = self.select_values('BRENT', 'd', '2016-06-02', '2016-06-03')
+        assert values == [49.05, 48.5]
+
+    def test_frame_selects_several_names(self):
+        data = DatapointOperations.select_frame('q', ['CPI_rog', 'GDP_yoy'],
+                                                None, None)
+        expected = self._subset_test_data('CPI_rog', 'q') + \
+            self._subset_test_data('GDP_yoy', 'q')
+        assert data.count() == len(expected)
+
+    def test_upsert_is_visible_after_commit_only(self):
+        self.select_values('BRENT', 'd')
+        point = dict(name='BRENT', freq='d', date='2017-01-02', value=55.0)
+        DatapointOperations.upsert_many([point])
+        assert self.select_values('BRENT', 'd', '2017-01-01') == []
+        fsa_db.session.commit()
+        assert self.select_values('BRENT', 'd', '2017-01-01') == [55.0]
+
+    def test_rolled_back_upsert_is_not_visible(self):
+        before = self.select_values('BRENT', 'd')
+        point = dict(name='BRENT', freq='d', date='2017-01-02', value=55.0)
+        DatapointOperations.upsert_many([point])
+        fsa_db.session.rollback()
+        assert self.select_values('BRENT', 'd') == before
+
+    def test_update_replaces_snapshot(self):
+        old = replica.current().arrays()
+        DatapointOperations.delete('q', 'GDP_yoy', None, None)
+        new = replica.current().arrays()
+        assert new is not old
+        assert ('GDP_yoy', 'q') in old
+        assert ('GDP_yoy', 'q') not in new
+
+    def test_info_uses_replica(self):
+        response = self.client.get('/api/info',
+                                   query_string=dict(name='CPI_NONFOOD_rog',
+                                                     freq='m'))
+        data = json.loads(response.get_data().decode('utf-8'))
+        assert data['m'] == {'start_date': '2016-06-30',
+                             'latest_date': '2016-12-31',
+                             'latest_value': 100.3}
+
+
+class Test_ReplicaOfBlobs(TestCaseBlobs):
+
+    def test_select_reads_blobs(self):
+        self.app.config['READ_REPLICA'] = True
+        data = DatapointOperations.select('m', 'CPI_NONFOOD_rog', None, None)
+        expected = self._subset_test_data('CPI_NONFOOD_rog', 'm')
+        assert [p.serialized for p in data] == expected
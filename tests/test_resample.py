@@ -0,0 +1,135 @@
+import json
+from datetime import date
+
+import numpy as np
+import pytest
+
+import db.api.resample as resample
+from db.api.queries import DatapointOperations
+from tests.test_basic import TestCaseBase
+
+
+def days(*dates):
+    return np.array([date(*dt).toordinal() for dt in dates])
+
+
+def test_period_ends():
+    source = days((2016, 2, 1), (2016, 6, 6), (2016, 12, 31))
+    expected = {'d': days((2016, 2, 1), (2016, 6, 6), (2016, 12, 31)),
+                'w': days((2016, 2, 7), (2016, 6, 12), (2017, 1, 1)),
+                'm': days((2016, 2, 29), (2016, 6, 30), (2016, 12, 31)),
+                'q': days((2016, 3, 31), (2016, 6, 30), (2016, 12, 31)),
+                'a': days((2016, 12, 31), (2016, 12, 31), (2016, 12, 31))}
+    for freq, ends in expected.items():
+        assert resample.period_ends(source, freq).tolist() == ends.tolist()
+
+
+@pytest.mark.parametrize('how, values', [('eop', [2.0, 4.0]),
+                                         ('avg', [1.5, 3.5]),
+                                         ('sum', [3.0, 7.0]),
+                                         ('min', [1.0, 3.0]),
+                                         ('max', [2.0, 4.0])])
+def test_resample_unordered_days(how, values):
+    source = days((2016, 2, 3), (2016, 1, 5), (2016, 1, 20), (2016, 2, 1))
+    ends, result = resample.resample(source, [4.0, 1.0, 2.0, 3.0], 'm', how)
+    assert ends.tolist() == days((2016, 1, 31), (2016, 2, 29)).tolist()
+    assert result.tolist() == values
+
+
+def test_resample_empty_series():
+    ends, result = resample.resample([], [], 'q', 'avg')
+    assert len(ends) == len(result) == 0
+
+
+def by_month(rows):
+    """Return values of datapoints *rows* by YYYY-MM."""
+    months = {}
+    for row in rows:
+        months.setdefault(row['date'][:7], []).append(row['value'])
+    return months
+
+
+class Test_Resample(TestCaseBase):
+
+    def test_source_frequency(self):
+        assert resample.source_frequency('BRENT', 'm') == 'd'
+        assert resample.source_frequency('CPI_rog', 'a') == 'm'
+        assert resample.source_frequency('BRENT', 'd') is None
+        assert resample.source_frequency('GDP_yoy', 'q') is None
+
+    def test_points_of_monthly_average(self):
+        points = resample.points('BRENT', 'm', 'avg')
+        months = by_month(self._subset_test_data('BRENT', 'd'))
+        assert len(points) == len(months)
+        for point in points:
+            values = months[point.date.isoformat()[:7]]
+            assert point.value == pytest.approx(sum(values) / len(values))
+            assert (point.name, point.freq) == ('BRENT', 'm')
+
+    def test_derived_series_is_kept_until_source_changes(self):
+        calls = []
+        derive = resample._derive
+
+        def counting_derive(*args):
+            calls.append(args)
+            return derive(*args)
+
+        resample._derive = counting_derive
+        try:
+            first = resample.points('BRENT', 'q', 'eop')
+            assert resample.points('BRENT', 'q', 'eop') == first
+            assert len(calls) == 1
+            point = dict(name='BRENT', freq='d', date='2016-12-30',
+                         value=100.0)
+            self.client.post('/api/datapoints', data=json.dumps([point]),
+                             headers=dict(API_TOKEN='token'))
+            assert resample.points('BRENT', 'q', 'eop')[-1].value == 100.0
+            assert len(calls) == 2
+        finally:
+            resample._derive = derive
+
+
+    def test_source_uploaded_again_is_resampled_again(self):
+        first = resample.points('BRENT', 'm', 'max')
+        data = self._subset_test_data('BRENT', 'd')
+        DatapointOperations.delete('d', 'BRENT', None, None)
+        assert len(resample.current_cache()) == 0
+        for datapoint in data:
+            datapoint['value'] += 1
+        self.client.post('/api/datapoints', data=json.dumps(data),
+                         headers=dict(API_TOKEN='token'))
+        assert [p.value for p in resample.points('BRENT', 'm', 'max')] == \
+            pytest.approx([p.value + 1 for p in first])
+
+
+class Test_API_Series_Agg(TestCaseBase):
+
+    def query_series(self, **params):
+        return self.client.get('/api/series', query_string=params)
+
+    def test_series_resampled_to_month_end(self):
+        response = self.query_series(name='BRENT', freq='m', agg='eop',
+                                     start_date='2016-10-01',
+                                     end_date='2016-11-30')
+        assert response.status_code == 200
+        lines = response.get_data().decode().strip().split('\n')
+        months = by_month(self._subset_test_data('BRENT', 'd'))
+        assert lines[1:] == [f'2016-10-31,{months["2016-10"][-1]}',
+                             f'2016-11-30,{months["2016-11"][-1]}']
+
+    def test_etag_follows_source_series(self):
+        params = dict(name='BRENT', freq='m', agg='avg')
+        etag = self.query_series(**params).headers['ETag']
+        assert self.query_series(name='BRENT', freq='m', agg='max') \
+            .headers['ETag'] != etag
+        point = dict(name='BRENT', freq='d', date='2016-12-30', value=1.0)
+        self.client.post('/api/datapoints', data=json.dumps([point]),
+                         headers=dict(API_TOKEN='token'))
+        assert self.query_series(**params).headers['ETag'] != etag
+
+    def test_invalid_agg_and_missing_source_return_error(self):
+        assert self.query_series(name='BRENT', freq='m',
+                                 agg='median').status_code == 422
+        assert self.query_series(name='GDP_yoy', freq='q',
+                                 agg='eop').status_code == 422
+        assert self.query_series(name='BRENT', freq='m').status_code == 422
@@ -0,0 +1,82 @@
+import struct
+import zlib
+from datetime import date
+
+import numpy as np
+import pytest
+
+import db.api.sparkline as sparkline
+from db.api.image import spline_params
+from tests.test_basic import TestCaseBase
+
+DATA = dict(x=[date(2000 + i, 1, 1) for i in range(10)],
+            y=[float(i % 3) for i in range(10)])
+
+
+def read_png(png_output):
+    """Return (height, width, 3) array of pixels of png made by
+       sparkline.encode_png()."""
+    assert png_output[:8] == b'\x89PNG\r\n\x1a\n'
+    width, height = struct.unpack('>II', png_output[16:24])
+    length, = struct.unpack('>I', png_output[33:37])
+    assert png_output[37:41] == b'IDAT'
+    rows = np.frombuffer(zlib.decompress(png_output[41:41 + length]),
+                         dtype='uint8').reshape(height, width * 3 + 1)
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape(height, width, 3)
+
+
+def test_encode_png_keeps_pixels():
+    pixels = np.arange(2 * 3 * 3, dtype='uint8').reshape(2, 3, 3)
+    assert (read_png(sparkline.encode_png(pixels)) == pixels).all()
+
+
+def test_png_has_line_of_given_color_on_white():
+    pixels = read_png(sparkline.make_png(DATA, spline_params()))
+    assert pixels.shape == (60, 200, 3)
+    colors = set(map(tuple, pixels.reshape(-1, 3).tolist()))
+    assert colors == {(255, 255, 255), (0xE2, 0x4A, 0x33)}
+
+
+def test_svg_has_point_for_every_datapoint():
+    svg = sparkline.make_svg(DATA, spline_params(width=3, dpi=50))
+    assert svg.startswith(b'<svg')
+    assert b'width="150"' in svg
+    points = svg.split(b'points="')[1].split(b'"')[0].split()
+    assert len(points) == len(DATA['x'])
+
+
+@pytest.mark.parametrize('data', [dict(x=[], y=[]),
+                                  dict(x=[date(2010, 1, 1)], y=[1.0])])
+def test_short_series_are_drawn(data):
+    params = spline_params()
+    assert sparkline.make_svg(data, params).endswith(b'</svg>')
+    assert read_png(sparkline.make_png(data, params)).shape == (60, 200, 3)
+
+
+class Test_API_Sparkline(TestCaseBase):
+
+    def query_spline(self, **params):
+        params = dict(dict(name='CPI_NONFOOD_rog', freq='m'), **params)
+        return self.client.get('/api/spline', query_string=params)
+
+    def test_svg_format(self):
+        response = self.query_spline(format='svg')
+        assert response.status_code == 200
+        assert response.mimetype == 'image/svg+xml'
+        assert b'<polyline' in response.data
+
+    def test_fast_png_engine(self):
+        response = self.query_spline(engine='fast', width=1, height=1)
+        assert response.mimetype == 'image/png'
+        assert read_png(response.data).shape == (100, 100, 3)
+
+    def test_formats_have_different_etags(self):
+        etags = {self.query_spline(**params).get_etag()[0]
+                 for params in [dict(), dict(engine='fast'),
+                                dict(format='svg')]}
+        assert len(etags) == 3
+
+    def test_bad_engine_returns_error(self):
+        assert self.query_spline(engine='gnuplot').status_code == 422
+        assert self.query_spline(format='gif').status_code == 422
@@ -0,0 +1,144 @@
+import json
+from datetime import date
+
+import db.api.sparkline as sparkline
+import db.api.sprite as sprite
+from db.api import reads
+from db.api.image import spline_params
+from db.api.models import Point
+from db.api.parameters import convert_series_string_to_keys
+from db.api.queries import DatapointOperations
+from tests.test_basic import TestCaseBase
+from tests.test_blobs import TestCaseBlobs
+from tests.test_replica import TestCaseReplica
+from tests.test_sparkline import read_png
+
+KEYS = [('BRENT', 'd'), ('GDP_yoy', 'q'), ('CPI_rog', 'm')]
+SERIES = 'BRENT:d,GDP_yoy:q,CPI_rog:m'
+
+
+def test_convert_series_string_to_keys():
+    assert convert_series_string_to_keys(SERIES) == KEYS
+    assert convert_series_string_to_keys('BRENT:d,BRENT:d') == [('BRENT', 'd')]
+    assert convert_series_string_to_keys('BRENT') == [None]
+    assert convert_series_string_to_keys(None) == []
+
+
+def test_group_keeps_points_of_requested_keys():
+    points = [Point('A', 'q', date(2000, 3, 31), 1.0),
+              Point('A', 'a', date(2000, 12, 31), 2.0),
+              Point('B', 'q', date(2000, 3, 31), 3.0)]
+    data = sprite.group(points, [('B', 'q'), ('A', 'q')])
+    assert data == {('B', 'q'): dict(x=[date(2000, 3, 31)], y=[3.0]),
+                    ('A', 'q'): dict(x=[date(2000, 3, 31)], y=[1.0])}
+
+
+def test_png_sprite_stacks_images_of_same_size():
+    params = spline_params()
+    data = {('A', 'q'): dict(x=[date(2000, 1, 1), date(2010, 1, 1)],
+                             y=[1.0, 2.0]),
+            ('B', 'q'): dict(x=[], y=[])}
+    pixels = read_png(sprite.make_png(data, [('A', 'q'), ('B', 'q')], params))
+    assert pixels.shape == (120, 200, 3)
+    single = read_png(sparkline.make_png(data[('A', 'q')], params))
+    assert (pixels[:60] == single).all()
+    assert (pixels[60:] == 255).all()
+
+
+class Test_Reads(TestCaseBase):
+
+    def test_key_points_reads_series_of_different_frequencies(self):
+        points = reads.key_points(KEYS)
+        assert {(p.name, p.freq) for p in points} == set(KEYS)
+        dates = [p.date for p in points]
+        assert dates == sorted(dates)
+
+    def test_key_points_between_dates(self):
+        points = reads.key_points(KEYS, date(2016, 9, 1), date(2016, 10, 31))
+        assert points.count() > 0
+        assert all(date(2016, 9, 1) <= p.date <= date(2016, 10, 31)
+                   for p in points)
+
+    def test_key_versions(self):
+        rows = reads.key_versions(KEYS)
+        assert [(name, freq) for name, freq, _, _ in rows] == \
+            [('BRENT', 'd'), ('CPI_rog', 'm'), ('GDP_yoy', 'q')]
+
+
+class Test_API_Sprite(TestCaseBase):
+
+    def query_sprite(self, **params):
+        params = dict(dict(series=SERIES), **params)
+        return self.client.get('/api/sprite', query_string=params)
+
+    def test_png_sprite_has_image_for_each_series(self):
+        response = self.query_sprite()
+        assert response.status_code == 200
+        assert response.headers['Content-Type'] == 'image/png'
+        assert read_png(response.data).shape == (180, 200, 3)
+
+    def test_json_bundle_has_offsets_and_svg(self):
+        response = self.query_sprite(format='json', width=3, dpi=50)
+        assert response.status_code == 200
+        bundle = json.loads(response.get_data())
+        assert (bundle['width'], bundle['height']) == (150, 30)
+        assert list(bundle['images']) == SERIES.split(',')
+        assert bundle['images']['CPI_rog:m']['y'] == 60
+        assert bundle['images']['BRENT:d']['svg'].startswith('<svg')
+
+    def test_etag_changes_with_any_series(self):
+        etag = self.query_sprite().headers['ETag']
+        response = self.client.get('/api/sprite',
+                                   query_string=dict(series=SERIES),
+                                   headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        point = dict(name='GDP_yoy', freq='q', date='2017-12-31', value=1.5)
+        self.client.post('/api/datapoints', data=json.dumps([point]),
+                         headers=dict(API_TOKEN='token'))
+        assert self.query_sprite().headers['ETag'] != etag
+
+    def test_unknown_series_returns_error(self):
+        assert self.query_sprite(series='BRENT:q').status_code == 422
+        assert self.query_sprite(series='BRENT').status_code == 422
+        assert self.query_sprite(series='').status_code == 422
+
+    def test_invalid_format_and_size_return_error(self):
+        assert self.query_sprite(format='svg').status_code == 422
+        series = ','.join(f'{name}:{freq}' for name, freq in reads.keys())
+        assert self.query_sprite(series=series,
+                                 width=10, height=5).status_code == 422
+
+
+class SelectKeys:
+    """Same tests for every storage engine."""
+
+    def test_select_keys_reads_every_series(self):
+        points = DatapointOperations.select_keys(KEYS, date(2016, 9, 1),
+                                                 date(2016, 10, 31))
+        expected = [row for name, freq in KEYS
+                    for row in self._subset_test_data(name, freq)
+                    if '2016-09-01' <= row['date'] <= '2016-10-31']
+
+        def order(row):
+            return row['name'], row['freq'], row['date']
+        assert sorted([p.serialized for p in points], key=order) == \
+            sorted(expected, key=order)
+
+    def test_png_sprite_draws_every_series(self):
+        response = self.client.get('/api/sprite',
+                                   query_string=dict(series=SERIES))
+        pixels = read_png(response.data)
+        for i in range(len(KEYS)):
+            assert (pixels[i * 60:(i + 1) * 60] != 255).any()
+
+
+class Test_Select_Keys(SelectKeys, TestCaseBase):
+    pass
+
+
+class Test_Select_Keys_Blobs(SelectKeys, TestCaseBlobs):
+    pass
+
+
+class Test_Select_Keys_Replica(SelectKeys, TestCaseReplica):
+    pass
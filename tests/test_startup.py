@@ -0,0 +1,41 @@
+import subprocess
+import sys
+
+import pytest
+
+from db import make_app
+
+
+class StartupConfig:
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    API_TOKEN = 'token'
+
+
+def imported_after(statement, modules):
+    """Return those of *modules* found in sys.modules after *statement*
+       is run in a new interpreter."""
+    code = (f'import sys; {statement}; '
+            f'print(" ".join(m for m in {modules!r} if m in sys.modules))')
+    output = subprocess.check_output([sys.executable, '-c', code])
+    return output.decode().split()
+
+
+def test_views_import_does_not_load_plotting_or_arrow():
+    modules = ['matplotlib', 'pyarrow', 'zstandard', 'flasgger']
+    assert imported_after('import db.api.views, db.custom_api.views',
+                          modules) == []
+
+
+def test_make_app_registers_blueprints():
+    class Config(StartupConfig):
+        SWAGGER_UI = False
+    app = make_app(Config)
+    assert {'api_bp', 'custom_api'} <= set(app.blueprints)
+    assert 'flasgger' not in app.blueprints
+
+
+def test_make_app_adds_swagger_ui():
+    pytest.importorskip('flasgger')
+    app = make_app(StartupConfig)
+    assert 'flasgger' in app.blueprints
@@ -0,0 +1,156 @@
+import json
+from datetime import date
+
+import numpy as np
+import pytest
+
+import db.api.resample as resample
+import db.api.transform as transform
+from db.api.queries import DatapointOperations
+from db.api.transform import Source
+from tests.test_basic import TestCaseBase
+
+
+def days(*dates):
+    return np.array([date(*dt).toordinal() for dt in dates])
+
+
+MONTHS = days((2015, 11, 30), (2015, 12, 31), (2016, 1, 31), (2016, 2, 29))
+
+
+def test_rog():
+    values = np.array([1.0, 2.0, 3.0, 3.0])
+    result_days, values = transform.rog(MONTHS, values)
+    assert result_days.tolist() == MONTHS[1:].tolist()
+    assert values.tolist() == [200.0, 150.0, 100.0]
+
+
+def test_yoy_skips_dates_without_year_ago_value():
+    quarters = days((2015, 3, 31), (2015, 6, 30), (2016, 3, 31),
+                    (2016, 6, 30), (2016, 9, 30))
+    values = np.array([10.0, 20.0, 11.0, 30.0, 40.0])
+    result_days, result = transform.yoy(quarters, values)
+    assert result_days.tolist() == quarters[2:4].tolist()
+    assert result.tolist() == pytest.approx([110.0, 150.0])
+
+
+def test_level_of_rog():
+    rog = np.array([100.0, 110.0, 50.0, 100.0])
+    _, values = transform.level(MONTHS, rog)
+    assert values.tolist() == pytest.approx([100.0, 110.0, 55.0, 55.0])
+
+
+def test_accumulate_and_deaccumulate_restart_every_year():
+    values = np.array([1.0, 2.0, 3.0, 4.0])
+    # data starts in November, 2015 sums are not known
+    result_days, totals = transform.accumulate(MONTHS, values, 'm')
+    assert result_days.tolist() == MONTHS[2:].tolist()
+    assert totals.tolist() == [3.0, 7.0]
+    result_days, restored = transform.deaccumulate(result_days, totals, 'm')
+    assert result_days.tolist() == MONTHS[2:].tolist()
+    assert restored.tolist() == [3.0, 4.0]
+
+
+def test_deaccumulate_skips_first_period_of_data_started_mid_year():
+    quarters = days((2016, 6, 30), (2016, 9, 30), (2016, 12, 31),
+                    (2017, 3, 31), (2017, 9, 30))
+    totals = np.array([30.0, 45.0, 60.0, 10.0, 40.0])
+    result_days, values = transform.deaccumulate(quarters, totals, 'q')
+    # 2016-06-30 is first half of year, 2017-06-30 is missing
+    assert result_days.tolist() == quarters[1:4].tolist()
+    assert values.tolist() == [15.0, 15.0, 10.0]
+
+
+def test_accumulate_stops_at_missing_period():
+    quarters = days((2016, 3, 31), (2016, 9, 30), (2017, 3, 31))
+    result_days, totals = transform.accumulate(quarters,
+                                               np.array([1.0, 2.0, 3.0]), 'q')
+    assert result_days.tolist() == quarters[[0, 2]].tolist()
+    assert totals.tolist() == [1.0, 3.0]
+
+
+class Test_Transform(TestCaseBase):
+
+    def values(self, name, freq):
+        return [row['value'] for row in self._subset_test_data(name, freq)]
+
+    def test_source(self):
+        assert transform.source('GDP_yoy', 'q') is None
+        assert transform.source('GDP_rog', 'q') == \
+            Source('GDP_bln_rub', 'rog')
+        assert transform.source('CPI_base', 'm') == \
+            Source('CPI_rog', 'rog_to_base')
+        assert transform.source('GOV_EXPENSE_FEDERAL_bln_rub', 'm') == \
+            Source('GOV_EXPENSE_ACCUM_FEDERAL_bln_rub', 'deaccumulate')
+        assert transform.source('BRENT_yoy', 'd') is None
+        assert transform.source('NOTHING_rog', 'q') is None
+
+    def test_rog_of_level_series(self):
+        points = transform.points('GDP_rog', 'q')
+        levels = self.values('GDP_bln_rub', 'q')
+        assert [p.value for p in points] == pytest.approx(
+            [100 * b / a for a, b in zip(levels, levels[1:])])
+        assert points[0].name == 'GDP_rog'
+
+    def test_base_is_100_at_start_date(self):
+        points = transform.points('CPI_base', 'm', start_date='2016-09-01')
+        assert points[0].date == date(2016, 9, 30)
+        assert points[0].value == pytest.approx(100)
+        rog = self.values('CPI_rog', 'm')[-len(points) + 1:]
+        assert [100 * b.value / a.value for a, b in
+                zip(points, points[1:])] == pytest.approx(rog)
+
+    def test_year_to_date_is_restored(self):
+        points = transform.points('GOV_EXPENSE_FEDERAL_bln_rub', 'm')
+        totals = self.values('GOV_EXPENSE_ACCUM_FEDERAL_bln_rub', 'm')
+        # test data starts in June, June value is not known
+        assert points[0].date == date(2016, 7, 31)
+        assert len(points) == len(totals) - 1
+        assert sum(p.value for p in points) == \
+            pytest.approx(totals[-1] - totals[0])
+
+    def test_source_uploaded_again_is_transformed_again(self):
+        transform.points('GDP_rog', 'q')
+        data = self._subset_test_data('GDP_bln_rub', 'q')
+        DatapointOperations.delete('q', 'GDP_bln_rub', None, None)
+        assert len(resample.current_cache()) == 0
+        for datapoint in data:
+            datapoint['value'] = 100.0
+        self.client.post('/api/datapoints', data=json.dumps(data),
+                         headers=dict(API_TOKEN='token'))
+        points = transform.points('GDP_rog', 'q')
+        assert [p.value for p in points] == [100.0] * (len(data) - 1)
+
+
+class Test_API_Transform(TestCaseBase):
+
+    def get(self, url, **params):
+        response = self.client.get(url, query_string=params)
+        # streamed body is read before next request
+        response.get_data()
+        return response
+
+    def test_series_not_stored_is_made(self):
+        response = self.client.get('/api/series',
+                                   query_string=dict(name='GDP_rog',
+                                                     freq='q'))
+        assert response.status_code == 200
+        lines = response.get_data().decode().strip().split('\n')
+        assert lines[0] == ',GDP_rog'
+        assert len(lines) == len(transform.points('GDP_rog', 'q')) + 1
+
+    def test_custom_api_rate_token(self):
+        response = self.get('ru/series/GDP/q/rog/2016')
+        assert response.status_code == 200
+        assert response.get_data().decode().startswith(',GDP_rog\n2016-')
+
+    def test_etag_differs_from_source_series(self):
+        derived = self.get('/api/series', name='GDP_rog', freq='q')
+        source = self.get('/api/series', name='GDP_bln_rub', freq='q')
+        assert derived.headers['ETag'] != source.headers['ETag']
+
+    def test_series_that_cannot_be_made_is_error(self):
+        response = self.client.get('/api/series',
+                                   query_string=dict(name='NOTHING_rog',
+                                                     freq='q'))
+        assert response.status_code == 422
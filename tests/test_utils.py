@@ -70,6 +70,29 @@ class Test_DictionaryRepresentation(TestCaseBase):
         self.assertEqual(transformed, self.sorted_datapoints_result)
 
 
+class Test_Streams(TestCaseBase):
+
+    def select(self, name='BRENT', freq='d'):
+        return queries.DatapointOperations.select(freq, name, None, None)
+
+    def test_stream_csv_is_same_as_to_csv(self):
+        expected = utils.to_csv([d.serialized for d in self.select()])
+        for block_size in (1, 2, 1000):
+            blocks = utils.stream_csv(self.select(), block_size)
+            assert ''.join(blocks) == expected
+
+    def test_stream_csv_of_no_datapoints_is_empty(self):
+        assert ''.join(utils.stream_csv([])) == utils.to_csv([])
+
+    def test_stream_json_is_same_as_jsonify(self):
+        from flask import jsonify
+        for data in (self.select(), []):
+            expected = jsonify([d.serialized for d in data]).get_data()
+            for block_size in (1, 1000):
+                blocks = utils.stream_json(data, block_size)
+                assert ''.join(blocks).encode('utf-8') == expected
+
+
 if __name__ == '__main__':
     import pytest
     pytest.main([__file__, '--maxfail=1'])
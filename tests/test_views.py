@@ -51,6 +51,11 @@ class Test_API_Info(TestCaseBase):
         assert result['m']['start_date'] == dates[0]
         assert result['m']['latest_date'] == dates[-1]
 
+    def test_unknown_series_returns_error(self):
+        response = self.query_get_start_and_end_date('NOPE', 'd')
+        assert response.status_code == 400
+        assert 'NOPE' in response.get_json()['message']
+
 
 class Test_API_Frame(TestCaseBase):
     API_FRAME_URL = 'api/frame'
@@ -56,6 +56,45 @@ class Test_POST(TestDatapoints):
         response = self.post(data="___broken_json_data__")
         assert response.status_code == 400
 
+    def test_on_upload_returns_inserted_and_updated_counts(self):
+        new_datapoint = dict(name='BRENT', freq='d',
+                             date='2017-01-02', value=55.0)
+        changed_datapoint = dict(self.test_data[0], value=1.0)
+        # values already stored are neither inserted nor updated
+        upload_json = json.dumps(self.test_data[1:10] +
+                                 [changed_datapoint, new_datapoint])
+        response = self.post(data=upload_json)
+        result = json.loads(response.get_data().decode('utf-8'))
+        assert result['inserted'] == 1
+        assert result['updated'] == 1
+
+    def test_on_ndjson_upload_successfull_with_code_200(self):
+        upload = '\n'.join(json.dumps(d) for d in self.test_data[0:10])
+        response = self.client.post(ENDPOINT, data=upload,
+                                    headers=self.token_dict,
+                                    content_type='application/x-ndjson')
+        result = json.loads(response.get_data().decode('utf-8'))
+        assert result['inserted'] == 0
+        assert result['updated'] == 0
+
+    def test_on_broken_datapoint_error_tells_index(self):
+        upload_json = json.dumps(self.test_data[0:2] + [dict(name='BRENT')])
+        response = self.post(data=upload_json)
+        assert response.status_code == 400
+        result = json.loads(response.get_data().decode('utf-8'))
+        assert result['index'] == 2
+
+    def test_on_upload_with_bad_datapoint_nothing_is_written(self):
+        new_datapoint = dict(name='BRENT', freq='d',
+                             date='2017-01-02', value=55.0)
+        bad_datapoint = dict(name='BRENT', freq='d',
+                             date='not a date', value=55.0)
+        upload_json = json.dumps([new_datapoint, bad_datapoint])
+        response = self.post(data=upload_json)
+        assert response.status_code == 400
+        param = dict(name='BRENT', freq='d', start_date='2017-01-01')
+        assert json.loads(self.get(param).get_data().decode('utf-8')) == []
+
 
 class Test_GET(TestDatapoints):
 
@@ -82,6 +121,35 @@ class Test_GET(TestDatapoints):
         expected_data = self._subset_test_data('CPI_NONFOOD_rog', 'm')
         assert data == expected_data
 
+    def test_get_is_streamed(self):
+        response = self.query_on_name_and_freq()
+        assert response.is_streamed
+
+    def test_get_ndjson_returns_datapoint_per_line(self):
+        params = dict(name='CPI_NONFOOD_rog', freq='m', format='ndjson')
+        response = self.get(params)
+        assert response.mimetype == 'application/x-ndjson'
+        lines = response.get_data().decode('utf-8').splitlines()
+        data = [json.loads(line) for line in lines]
+        assert data == self._subset_test_data('CPI_NONFOOD_rog', 'm')
+
+    def test_get_columns_returns_dates_and_values(self):
+        params = dict(name='CPI_NONFOOD_rog', freq='m', orient='columns')
+        data = json.loads(self.get(params).get_data().decode('utf-8'))
+        expected = self._subset_test_data('CPI_NONFOOD_rog', 'm')
+        assert data == dict(name='CPI_NONFOOD_rog', freq='m',
+                            dates=[d['date'] for d in expected],
+                            values=[d['value'] for d in expected])
+
+    def test_get_columns_as_ndjson_fails(self):
+        params = dict(name='CPI_NONFOOD_rog', freq='m', orient='columns',
+                      format='ndjson')
+        assert self.get(params).status_code == 422
+
+    def test_get_with_bad_format_fails(self):
+        params = dict(name='CPI_NONFOOD_rog', freq='m', format='xml')
+        assert self.get(params).status_code == 422
+
     def test_on_name_parameter_not_specified_fails(self):
         params = dict(freq='m', format='json')
         response = self.client.get('/api/datapoints', query_string=params)
@@ -92,6 +160,57 @@ class Test_GET(TestDatapoints):
         response = self.client.get('/api/datapoints', query_string=params)
         assert response.status_code == 422
 
+
+class Test_GET_as_of(TestDatapoints):
+
+    params = dict(name='CPI_NONFOOD_rog', freq='m', end_date='2016-06-30')
+
+    def get_values(self, **kwargs):
+        response = self.get(dict(self.params, **kwargs))
+        data = json.loads(response.get_data().decode('utf-8'))
+        return [d['value'] for d in data]
+
+    def upload_revision(self):
+        revised = dict(name='CPI_NONFOOD_rog', freq='m',
+                       date='2016-06-30', value=101.0)
+        response = self.post(data=json.dumps([revised]))
+        return json.loads(response.get_data().decode('utf-8'))['vintage']
+
+    def test_upload_returns_vintage(self):
+        assert self.upload_revision() == 1
+        response = self.client.get('/api/vintages')
+        data = json.loads(response.get_data().decode('utf-8'))
+        assert [v['id'] for v in data] == [1]
+
+    def test_upload_that_changes_nothing_makes_no_vintage(self):
+        assert self.upload_revision() == 1
+        assert self.upload_revision() is None
+        response = self.client.get('/api/vintages')
+        assert len(json.loads(response.get_data().decode('utf-8'))) == 1
+
+    def test_as_of_earlier_vintage_returns_value_before_revision(self):
+        vintage = self.upload_revision()
+        assert self.get_values() == [101.0]
+        assert self.get_values(as_of=vintage) == [101.0]
+        assert self.get_values(as_of=vintage - 1) == [100.5]
+
+    def test_as_of_date_returns_latest_values(self):
+        self.upload_revision()
+        assert self.get_values(as_of='2100-01-01') == [101.0]
+        assert self.get_values(as_of='2000-01-01') == [100.5]
+
+    def test_as_of_before_delete_returns_deleted_value(self):
+        vintage = self.upload_revision()
+        self.delete(dict(name='CPI_NONFOOD_rog', freq='m',
+                         start_date='2016-06-30', end_date='2016-06-30'))
+        assert self.get_values() == []
+        assert self.get_values(as_of=vintage) == [101.0]
+
+    def test_bad_as_of_returns_error(self):
+        response = self.get(dict(self.params, as_of='yesterday'))
+        assert response.status_code == 422
+
+
 # FIXME: this should not be a separate testing class
 
 
@@ -145,6 +264,24 @@ class Test_DELETE(TestDatapoints):
         response = self.delete(param)
         assert response.status_code == 200
 
+    def test_on_several_names_delete_returns_count(self):
+        param = dict(name="BRENT,USDRUR_CB", freq='d',
+                     start_date='2016-06-01', end_date='2016-06-03')
+        response = self.delete(param)
+        result = json.loads(response.get_data().decode('utf-8'))
+        assert result == dict(deleted=6)
+        response = self.get(dict(name='BRENT', freq='d',
+                                 end_date='2016-06-03'))
+        assert json.loads(response.get_data().decode('utf-8')) == []
+
+    def test_on_freq_delete_removes_names(self):
+        response = self.delete(dict(freq='d'))
+        result = json.loads(response.get_data().decode('utf-8'))
+        assert result['deleted'] == len(
+            [d for d in self.test_data if d['freq'] == 'd'])
+        response = self.client.get('/api/names/d')
+        assert json.loads(response.get_data().decode('utf-8')) == []
+
 
 if __name__ == '__main__':  # pragma no cover
     pytest.main([__file__, '--maxfail=1'])
@@ -50,3 +50,14 @@ class Test_Api_Series(TestCaseBase):
             API_SERIES_URL,
             query_string=sample_invalid_params_start_date_gt_end_date)
         assert response.status_code == BAD_PARAMETERS_STATUS_CODE
+
+    def test_csv_format_is_accepted(self):
+        response = self.client.get(API_SERIES_URL, query_string=dict(
+            sample_valid_params, format='csv'))
+        assert response.get_data().decode('utf-8') == expected_output
+
+    def test_datapoints_formats_are_rejected(self):
+        for fmt in ('json', 'ndjson'):
+            response = self.client.get(API_SERIES_URL, query_string=dict(
+                sample_valid_params, format=fmt))
+            assert response.status_code == BAD_PARAMETERS_STATUS_CODE